@@ -0,0 +1,147 @@
+"""
+ai_manager
+
+This module runs the enemies (see objects.Enemy) of the active map regions. Instead of each enemy
+handling tick events, every enemy of a region is updated in one pass per AI step:
+- perception: the distance to the player;
+- state transitions: idle, chasing the player, attacking them;
+- movement: chasing enemies take one step along their path (see pathfinding) every move-interval;
+- attacks: attacking enemies post a CHARACTER_ATTACKED event every attack-interval.
+
+A region is only updated while its scene is active and nothing is stacked on top of it, so that
+other regions cost nothing. AI steps run on their own timer, every "tick-rate" milliseconds of the
+"ai-properties" section, independently from the audio interval of the scenes.
+"""
+
+# *-* coding: utf8 *-*
+
+import math
+
+import constants
+import core
+import event_manager
+import gameconfig
+import logger
+import occupancy
+import timer_manager
+
+# Global AI manager instance
+_INSTANCE = None
+
+
+class AIManager():
+    """Updates the enemies of the active regions."""
+
+    def __init__(self, config):
+        self.tick_rate = gameconfig.get_value(config, "tick-rate", int, {"defaultValue": constants.AI_TICK_RATE, "minValue": 1})
+        # region name -> scene.
+        self.regions = {}
+        self.timer = None
+        self.steps = 0
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "ai_manager"
+
+    def activate(self, my_scene):
+        """Starts updating the enemies of the given region."""
+        self.regions[my_scene.name] = my_scene
+        if self.timer is None:
+            self.timer = timer_manager.call_every(self.tick_rate, self.update)
+
+    def deactivate(self, my_scene):
+        """Stops updating the enemies of the given region."""
+        self.regions.pop(my_scene.name, None)
+        if len(self.regions) == 0 and self.timer is not None:
+            timer_manager.cancel(self.timer)
+            self.timer = None
+
+    def update(self):
+        """Runs one AI step for every active region."""
+        self.steps += 1
+        now = core.get_current_ticks()
+        for my_scene in list(self.regions.values()):
+            self.update_region(my_scene, now)
+
+    def update_region(self, my_scene, now):
+        """Runs one AI step for the enemies of a region."""
+        target = my_scene.playerPosition
+        enemies = my_scene.getEnemies()
+        if target is None or len(enemies) == 0:
+            return
+        px = target[0]
+        py = target[1]
+        for enemy in enemies:
+            if enemy.health <= 0:
+                continue
+            distance = math.hypot(enemy.position[0] - px, enemy.position[1] - py)
+            if distance <= enemy.attackDistance:
+                state = constants.ENEMY_STATE_ATTACK
+            elif distance <= enemy.perceptionDistance:
+                state = constants.ENEMY_STATE_CHASE
+            else:
+                state = constants.ENEMY_STATE_IDLE
+            if state != enemy.state:
+                logger.debug(self, "{enemy}: state {previous} -> {state} at {distance}".format(enemy=enemy, previous=enemy.state, state=state, distance=distance))
+                enemy.state = state
+            if state == constants.ENEMY_STATE_CHASE and now >= enemy.nextMove:
+                enemy.nextMove = now + enemy.moveInterval
+                self.step(my_scene, enemy, target)
+            elif state == constants.ENEMY_STATE_ATTACK and now >= enemy.nextAttack:
+                enemy.nextAttack = now + enemy.attackInterval
+                event_manager.post(event_manager.CHARACTER_ATTACKED, event_manager.CharacterAttackData(enemy, my_scene.player, enemy.damage))
+
+    def step(self, my_scene, enemy, target):
+        """Moves an enemy one cell towards the target, unless the cell is taken."""
+        path = my_scene.findPath(enemy.position, target)
+        # the last cell of the path is the target's.
+        if path is None or len(path) < 2:
+            return False
+        cell = path[0]
+        grid = my_scene.occupancy
+        if grid.get(cell) != occupancy.FREE or grid.get_object(cell) not in (None, enemy):
+            return False
+        my_scene.moveObject(enemy, [cell[0], cell[1]])
+        return True
+
+    def terminate(self):
+        """Stops updating every region."""
+        timer_manager.cancel(self.timer)
+        self.timer = None
+        self.regions = {}
+        logger.info(self, "{steps} AI steps".format(steps=self.steps))
+
+
+def initialize(config):
+    """Initializes the AI manager."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        try:
+            _INSTANCE = AIManager(config)
+        except Exception as ex:
+            logger.exception("ai_manager", "Failed to initialize the AI manager", ex)
+            return False
+    return True
+
+def activate(my_scene):
+    """Starts updating the enemies of the given region."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.activate(my_scene)
+
+def deactivate(my_scene):
+    """Stops updating the enemies of the given region."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.deactivate(my_scene)
+
+def terminate():
+    """Stops the AI manager."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.terminate()
+    _INSTANCE = None
@@ -5,6 +5,7 @@ import constants
 import core
 import gameconfig
 import event_manager
+import loader
 import pygame
 import os
 
@@ -25,15 +26,20 @@ class AudioManager():
     """Manages all audio resources (sfx, bgm)"""
     soundMap = {}
     musicMap = {}
+    musicRefs = {}
     fmod = None
 
         
-    def __init__(self, config):
-        """Initializes the AudioManager with the help of L{GameConfig} object."""
+    def __init__(self, config, headless=False):
+        """Initializes the AudioManager with the help of L{GameConfig} object. When headless, FMOD
+        renders to no sound device, mixing only when updated."""
         event_manager.add_listener(self)
         try:
             from . import pyfmodex
             self.fmod = pyfmodex.System()
+            if headless:
+                from .pyfmodex.enums import OUTPUTTYPE
+                self.fmod.output = OUTPUTTYPE.NOSOUND_NRT
             self.fmod.init()
             self.listener = self.fmod.listener()
             self.listener.position = [0.0, 0.0, 0.0]
@@ -44,17 +50,21 @@ class AudioManager():
         self.fadeTicks = 0
         self.stereoWidth = gameconfig.get_value(config, "stereo-field-width", int, {"defaultValue": constants.AUDIO_STEREO_FIELD_WIDTH, "minValue": 30, "maxValue": 100})
         self.stereoWidth /= 100
-        for s in gameconfig.get_sound_resources():
-            logger.info(self, "Loading {name} ({file})".format(name=s["name"], file=s["file"]))
-            try:
-                snd = sound.Sound(self.fmod, s["name"], s["file"])
-                self.soundMap[s["name"]] = snd
-            except Exception as e:
+        # sounds are opened concurrently; FMOD API calls are thread-safe.
+        resources = gameconfig.get_sound_resources() or []
+        for s, (snd, e) in zip(resources, loader.map(self.loadSound, resources)):
+            if e is not None:
                 logger.exception(self, "Failed to load {file}: {exception}".format(file=s["file"], exception=e), e)
+                continue
+            self.soundMap[s["name"]] = snd
         global _instance
 
         _instance = self
 
+    def loadSound(self, config):
+        logger.info(self, "Loading {name} ({file})".format(name=config["name"], file=config["file"]))
+        return sound.Sound(self.fmod, config["name"], config["file"])
+
     def loadMusic(self, config):
         name = gameconfig.get_value(config, "name", str)
         file = gameconfig.get_value(config, "file", str)
@@ -69,15 +79,44 @@ class AudioManager():
             raise RuntimeError("Missing name or file property for music")
         loaded = self.musicMap.get(name, None)
         if loaded is not None:
+            self.musicRefs[name] += 1
             return True
         try:
             logger.info(self, "Loading music {name} ({file}, {volume})".format(name=name, file=file, volume=volume))
+            memory = self.getMemoryUsed()
             snd = sound.Music(self.fmod, name, file, loops=loop, volume=volume)
+            # musics are only loaded and released on the main thread, so the difference is this stream's.
+            snd.memory = max(0, self.getMemoryUsed() - memory)
         except Exception as e:
             logger.error(self, "Cannot load music {name} ({file}): {exception}".format(name=name, file=file, exception=e))
             return False
         self.musicMap[name] = snd
+        self.musicRefs[name] = 1
         return True
+
+    def releaseMusic(self, name):
+        """Releases a reference to the given music, freeing it once no scene uses it anymore."""
+        count = self.musicRefs.get(name, 0) - 1
+        if count > 0:
+            self.musicRefs[name] = count
+            return
+        self.musicRefs.pop(name, None)
+        music = self.musicMap.pop(name, None)
+        if music is not None:
+            logger.info(self, "Releasing music {name}".format(name=name))
+            music.release()
+
+    def getMemoryUsed(self):
+        """Returns the memory currently allocated by FMOD, in bytes."""
+        try:
+            from . import pyfmodex
+            return pyfmodex.get_memory_stats(False).current
+        except Exception:
+            return 0
+
+    def getMusicMemory(self):
+        """Returns the memory FMOD allocated for the loaded musics, in bytes."""
+        return sum([getattr(music, "memory", 0) for music in self.musicMap.values()])
         
     def play(self, name, volume, pan=0.0, pitch=1.0):
         snd = self.soundMap.get(name, None)
@@ -247,10 +286,10 @@ class AudioManager():
                 logger.exception(self, "Error updating fMOD: {e}".format(e=e), e)
                 
                 
-def initialize(config):
+def initialize(config, headless=False):
     if _instance is None:
         try:
-            am = AudioManager(config)
+            am = AudioManager(config, headless)
             return True
         except Exception as e:
             logger.exception("audio", "Error initializing audio: {exception}".format(exception=e), e)
@@ -273,6 +312,26 @@ def loadMusic(config):
 
         return _instance.loadMusic(config)
 
+def releaseMusic(name):
+        global _instance
+
+        if _instance is not None:
+                _instance.releaseMusic(name)
+
+def getMusicMemory():
+        global _instance
+
+        if _instance is None:
+                return 0
+        return _instance.getMusicMemory()
+
+def isMusicLoaded(name):
+        global _instance
+
+        if _instance is None:
+                return False
+        return _instance.musicMap.get(name, None) is not None
+
 def stopMusic(name):
         global _instance
 
@@ -137,6 +137,13 @@ class Sound(object):
 			self.channel = None
 			return True
 		return False
+	def release(self):
+		"""Stops the sound and frees its FMOD resources."""
+		self.stop()
+		if self.snd is not None:
+			self.snd.release()
+			self.snd = None
+
 	def isPlaying(self):
 		if self.channel is None:
 			return False
@@ -0,0 +1,88 @@
+"""
+clock
+
+This module provides the time source used by the main loop and the log system. The real clock
+follows the wall clock, while the virtual clock only advances when the engine sleeps, letting a
+headless engine run as fast as the CPU allows with the same timings as in real time.
+"""
+
+# *-* coding: utf8 *-*
+
+import time
+
+
+class RealClock():
+    """Wall clock time source."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    def now(self):
+        """Returns the current time, in seconds."""
+        return time.perf_counter()
+
+    def sleep(self, duration):
+        """Waits for duration seconds."""
+        time.sleep(duration)
+
+    def get_ticks(self):
+        """Returns the milliseconds elapsed since this clock was created."""
+        return int((time.perf_counter() - self.start) * 1000)
+
+    def is_virtual(self):
+        """Returns whether this clock is virtual."""
+        return False
+
+
+class VirtualClock():
+    """Time source that only advances when sleeping: sleeping returns immediately."""
+
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self):
+        """Returns the current time, in seconds."""
+        return self.time
+
+    def sleep(self, duration):
+        """Advances the clock by duration seconds."""
+        self.time += duration
+
+    def get_ticks(self):
+        """Returns the milliseconds elapsed since this clock was created."""
+        return int(self.time * 1000)
+
+    def is_virtual(self):
+        """Returns whether this clock is virtual."""
+        return True
+
+
+_INSTANCE = RealClock()
+
+def use_virtual_clock():
+    """Switches to a virtual clock starting at 0."""
+    global _INSTANCE
+
+    _INSTANCE = VirtualClock()
+
+def use_real_clock():
+    """Switches back to the wall clock."""
+    global _INSTANCE
+
+    _INSTANCE = RealClock()
+
+def now():
+    """Returns the current time, in seconds."""
+    return _INSTANCE.now()
+
+def sleep(duration):
+    """Waits (or advances the virtual clock) for duration seconds."""
+    _INSTANCE.sleep(duration)
+
+def get_ticks():
+    """Returns the milliseconds elapsed since the clock was started."""
+    return _INSTANCE.get_ticks()
+
+def is_virtual():
+    """Returns whether the virtual clock is used."""
+    return _INSTANCE.is_virtual()
@@ -15,7 +15,42 @@ CAMERA_SUBJECTIVE = 2
 # global configuration
 CONFIG_RESOURCE_DIR = "res"
 CONFIG_DATA_DIR = "data"
-INTERVAL_TICK_RESOLUTION = 0.01
+SCENE_CACHE_FILE = CONFIG_DATA_DIR + "/scenes.cache"
+INTERVAL_TICK_RESOLUTION = 0.01 # simulation step, in seconds
+FRAME_RATE = 100 # frames per second
+MAX_SIMULATION_STEPS = 10 # per frame, remaining steps are dropped
+FRAME_STATISTICS_SIZE = 1000 # frames kept to compute frame-time percentiles
+
+# Event constants
+EVENT_PUMP_MAX_EVENTS = 256 # events dispatched per pump, 0 for unlimited
+EVENT_PUMP_TIME_BUDGET = 8 # milliseconds spent dispatching per pump, 0 for unlimited
+EVENT_LATE_THRESHOLD = 16 # milliseconds; events older than one frame when dispatched are late
+EVENT_LANE_WEIGHTS = [8, 4, 2, 1] # input, gameplay, audio, background lanes (weighted mode)
+EVENT_LANE_MAX_WAIT = 16 # milliseconds a lane may wait before being served, 0 to disable
+EVENT_FREE_LIST_SIZE = 256 # dispatched events kept for reuse
+
+# Loading constants
+LOADING_WORKERS = 4 # threads opening sounds and parsing scene files at startup
+LOADING_PROGRESS_STEP = 25 # percents between spoken progress reports
+
+# Scene prefetcher constants
+PREFETCH_DEPTH = 1 # region-links followed from the active scene
+PREFETCH_MEMORY_CAP = 16384 # kilobytes of music files opened ahead of time per prefetch
+PREFETCH_POLL_INTERVAL = 50 # milliseconds between hand-overs of prefetched scenes
+
+# Scene residency constants
+RESIDENCY_MEMORY_BUDGET = 65536 # kilobytes used by created scenes and their musics, 0 for unlimited
+
+# Spatial index constants
+SPATIAL_CELL_SIZE = 8 # width and height of the grid cells indexing map objects
+
+# Hot reload constants
+HOT_RELOAD_POLL_INTERVAL = 500 # milliseconds between checks of the scene files
+
+# Profiler constants
+PROFILER_HISTOGRAM_BUCKETS = 24 # power-of-two microsecond buckets, the last one up to 8s
+PROFILER_SLOWEST_FRAMES = 5 # frames whose breakdown is reported
+PROFILER_REPORT_FILE = "profile.txt"
 
 # Audio constants
 AUDIO_FX_VOLUME = 0.8
@@ -46,7 +81,27 @@ HERO_WALK_TIME = 500
 HERO_RUN_TIME = 300
 OBJECT_ECHO_TIME = 1000
 OBJECT_MAX_DISTANCE = 10
+# world maps: size of a chunk side in cells, and number of chunks loaded around the player's.
+WORLD_CHUNK_SIZE = 32
+WORLD_VIEW_DISTANCE = 1
+# below this many objects, echoes are computed without NumPy.
+ECHO_NUMPY_MIN_OBJECTS = 32
+# paths cached per region, and cells explored at most by a path search.
+PATHFINDING_CACHE_SIZE = 256
+PATHFINDING_MAX_NODES = 4096
 CHARACTER_STAMINA_RECOVERY_TIME = 50
 # Peckables
 LOCKSTATE_LOCKED = 100
 LOCKSTATE_UNLOCKED = 101
+# Enemies
+ENEMY_DEFAULT_HEALTH = 100
+ENEMY_DEFAULT_DAMAGE = 5
+ENEMY_PERCEPTION_DISTANCE = 8.0
+ENEMY_ATTACK_DISTANCE = 1.0
+ENEMY_MOVE_INTERVAL = 500
+ENEMY_ATTACK_INTERVAL = 1000
+ENEMY_STATE_IDLE = 0
+ENEMY_STATE_CHASE = 1
+ENEMY_STATE_ATTACK = 2
+# milliseconds between two updates of the enemies.
+AI_TICK_RATE = 100
@@ -5,6 +5,8 @@ Core module
 Description: This modules contains the PyGame loop, responsible for managing input events (UI)
 as well as the global game timer.
 """
+import collections
+import math
 import os
 import time
 
@@ -12,25 +14,90 @@ import pygame
 from pygame.locals import *
 
 
+import ai_manager
+import clock
 import constants
 import gameconfig
+import hot_reload
+import inputHandler
 import speech
+import loader
 import logger
+import pathfinding
+import prefetcher
 import audio
 import event_manager
+import profiler
+import replay
+import residency
+import scene_cache
 import scene_manager
+import timer_manager
 
 _INSTANCE = None
 
 
+class FrameStatistics():
+    """Keeps the duration of the latest frames (time spent working, sleep excluded) and reports
+their percentiles."""
+
+    def __init__(self, size=constants.FRAME_STATISTICS_SIZE):
+        self.durations = collections.deque(maxlen=size)
+        self.frames = 0
+        self.overruns = 0
+        self.steps = 0
+        self.dropped_steps = 0
+        self.idle = 0.0
+
+    def add(self, duration, budget):
+        """Records a frame duration (in milliseconds) against the frame budget."""
+        self.durations.append(duration)
+        self.frames += 1
+        if duration > budget:
+            self.overruns += 1
+
+    def percentile(self, value):
+        """Returns the given percentile (0-100) of the recorded frame durations."""
+        if len(self.durations) == 0:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * value / 100))]
+
+    def as_dict(self):
+        """Returns the frame statistics as a dictionary."""
+        return {"frames": self.frames,
+                "steps": self.steps,
+                "dropped_steps": self.dropped_steps,
+                "overruns": self.overruns,
+                "idle": self.idle,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "p99": self.percentile(99),
+                "max": max(self.durations) if len(self.durations) > 0 else 0.0}
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "core"
+
+
 class AGE():
     """Audio Game Engine base class"""
 
     current_ticks = 0
     in_animation = True
 
-    def __init__(self):
+    def __init__(self, headless=False, duration=None, speed=1.0, profile=False):
+        """When headless, the engine runs without display, sound device nor screen reader, on a
+        virtual clock. duration is the game time (in seconds) after which the engine exits, speed
+        the game time elapsed per second of clock time. When profile is True, the profiler is
+        enabled from the first frame."""
         self.pygame_initialized = False
+        self.frame_statistics = FrameStatistics()
+        self.headless = headless
+        self.max_ticks = int(duration * 1000) if duration is not None else None
+        self.speed = speed
+        if profile:
+            profiler.enable()
 
 
     def start_animation(self):
@@ -51,6 +118,13 @@ class AGE():
 
     def init_pygame(self):
         """Initializes the Pygame engine."""
+        if self.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+            pygame.init()
+            pygame.display.set_mode((1, 1))
+            self.pygame_initialized = True
+            return
         pygame.init()
         myscreen = pygame.display.Info()
         screen = pygame.display.set_mode((myscreen.current_w, myscreen.current_h),
@@ -75,61 +149,176 @@ class AGE():
         The main method, where everything happens.
         """
 
+        if self.headless:
+            clock.use_virtual_clock()
         logger.initialize()
         if gameconfig.initialize("age.json") is False:
             logger.error("main", "Invalid configuration.")
             return
-        if speech.initialize() is False:
+        if event_manager.initialize(gameconfig.get_event_properties()) is False:
+            logger.error("main", "Invalid event properties.")
+            return
+        if replay.initialize(gameconfig.get_start_scene()) is False:
+            logger.error("main", "Failed to initialize session recording or replay.")
+            return
+        if self.headless or replay.is_recording() or replay.is_replaying():
+            event_manager.set_deterministic(True)
+        if speech.initialize(self.headless) is False:
             logger.error("main", "Failed to start due to a lack of speech support.")
             return
         speech.cancelSpeech()
         speech.speak("Chargement en cours...")
         self.start_animation()
+        if loader.initialize(gameconfig.get_loading_properties()) is False:
+            logger.error("main", "Failed to initialize the loader.")
+            return
+        loader.expect(len(gameconfig.get_sound_resources() or []) + len(scene_manager.list_scene_files()))
 
-        if audio.initialize(gameconfig.get_global_audio_properties()) is False:
+        if audio.initialize(gameconfig.get_global_audio_properties(), self.headless) is False:
             logger.error("main", "Failed to initialize sound support.")
             return
+        timer_manager.initialize()
+        if pathfinding.initialize(gameconfig.get_pathfinding_properties()) is False:
+            logger.error("main", "Failed to initialize the pathfinder.")
+            return
+        if ai_manager.initialize(gameconfig.get_ai_properties()) is False:
+            logger.error("main", "Failed to initialize the AI manager.")
+            return
+        if residency.initialize(gameconfig.get_residency_properties()) is False:
+            logger.error("main", "Failed to initialize the scene residency manager.")
+            return
         if scene_manager.initialize() is False:
             logger.error("main", "Unable to initialize scenes.")
             print("Unable to initialize scenes: Check the logfile for more details.")
             return
+        loader.terminate()
+        scene_cache.save()
+        if prefetcher.initialize(gameconfig.get_prefetch_properties()) is False:
+            logger.error("main", "Failed to initialize the scene prefetcher.")
+            return
+        hot_reload.initialize()
         logger.info(self, "Initializing Pygame")
         self.init_pygame()
-        now = time.time()
-        old_time = now
+        if inputHandler.initialize(gameconfig.get_keybindings()) is False:
+            logger.error("main", "Invalid keybindings.")
+            return
 
         if scene_manager.load_scene(gameconfig.get_start_scene()) is False:
             print("Failed to load first scene {name}".format(name=gameconfig.get_start_scene()))
             return
         self.stop_animation()
         logger.info("core", "Engine initialization complete")
-        while 1:
-            event = pygame.event.poll()
-            if event.type == QUIT:
-                break
-            if event.type == pygame.KEYDOWN and self.is_in_animation() is False:
-                scene_manager.on_key_down(event)
-            elif event.type == pygame.KEYUP and self.is_in_animation() is False:
-                scene_manager.on_key_up(event)
-            # check our own events
-
-            event_manager.pump()
-
-            now = time.time()
-            # logger.info('main', "Tick is {time}".format(time=now))
-            if now - old_time > constants.INTERVAL_TICK_RESOLUTION:
-                self.current_ticks = pygame.time.get_ticks()
-                event_manager.post(event_manager.SCENE_INTERVAL_TICK, {"time": self.current_ticks})
-                old_time = now
-            time.sleep(0.01)
+        self.main_loop()
         logger.info("main", "Exiting game.")
+        self.log_statistics()
+        event_manager.log_statistics()
+        pathfinding.log_statistics()
+        profiler.dump()
+        ai_manager.terminate()
+        hot_reload.terminate()
+        prefetcher.terminate()
+        replay.terminate()
         speech.terminate()
         pygame.quit()
 
-def initialize():
+    def main_loop(self):
+        """Runs frames until the game quits.
+Each frame handles every pending input event, then advances the game time by fixed simulation
+steps (constants.INTERVAL_TICK_RESOLUTION) for the time elapsed since the previous frame, each
+step running the due timers and posting a SCENE_INTERVAL_TICK event, and finally sleeps for what
+remains of the frame. At most constants.MAX_SIMULATION_STEPS steps are run per frame, times the
+speed factor, so that faster runs are not capped; steps beyond are dropped."""
+        frame_time = 1.0 / constants.FRAME_RATE
+        step = int(constants.INTERVAL_TICK_RESOLUTION * 1000)
+        max_steps = constants.MAX_SIMULATION_STEPS * max(1, math.ceil(self.speed))
+        accumulator = 0.0
+        previous = clock.now()
+        running = True
+        while running:
+            # frame durations are always measured on the wall clock, even when running headless.
+            work_start = time.perf_counter()
+            frame_start = clock.now()
+            accumulator += (frame_start - previous) * 1000 * self.speed
+            previous = frame_start
+            replaying = replay.is_replaying()
+            profiling = profiler.ENABLED
+            if profiling:
+                profiler.begin_frame()
+                section = profiler.start()
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    running = False
+                    break
+                if replaying:
+                    # only the replayed session drives the game.
+                    continue
+                if event.type == pygame.KEYDOWN and self.is_in_animation() is False:
+                    scene_manager.on_key_down(event)
+                elif event.type == pygame.KEYUP and self.is_in_animation() is False:
+                    scene_manager.on_key_up(event)
+            if profiling:
+                profiler.stop("input", section)
+                section = profiler.start()
+            # input feedback is dispatched before any simulation work.
+            event_manager.pump()
+            if profiling:
+                profiler.stop("events", section)
+            steps = 0
+            while accumulator >= step and steps < max_steps:
+                if replaying and self.is_in_animation() is False:
+                    if replay.update(self.current_ticks) is False:
+                        logger.info("core", "Replayed session is over.")
+                        running = False
+                        break
+                    event_manager.pump()
+                self.current_ticks += step
+                if profiling:
+                    section = profiler.start()
+                timer_manager.update(self.current_ticks)
+                if profiling:
+                    profiler.stop("timers", section)
+                    section = profiler.start()
+                event_manager.post(event_manager.SCENE_INTERVAL_TICK, event_manager.TickData(self.current_ticks))
+                event_manager.pump()
+                if profiling:
+                    profiler.stop("tick", section)
+                accumulator -= step
+                steps += 1
+            if accumulator >= step:
+                # too far behind: drop the remaining steps rather than spiraling.
+                self.frame_statistics.dropped_steps += int(accumulator / step)
+                accumulator %= step
+            self.frame_statistics.steps += steps
+            self.frame_statistics.add((time.perf_counter() - work_start) * 1000, frame_time * 1000)
+            if profiling:
+                profiler.end_frame()
+            if self.max_ticks is not None and self.current_ticks >= self.max_ticks:
+                logger.info("core", "Run duration elapsed.")
+                break
+            duration = clock.now() - frame_start
+            if duration < frame_time:
+                self.frame_statistics.idle += frame_time - duration
+                clock.sleep(frame_time - duration)
+
+    def log_statistics(self):
+        """Writes the frame-time statistics to the log file."""
+        stats = self.frame_statistics.as_dict()
+        logger.info(self.frame_statistics, "{frames} frames, {steps} simulation steps ({dropped} dropped), "
+                    "{overruns} frames over budget, {idle:.1f}s idle".format(
+                        frames=stats["frames"], steps=stats["steps"], dropped=stats["dropped_steps"],
+                        overruns=stats["overruns"], idle=stats["idle"]))
+        logger.info(self.frame_statistics, "Frame time p50 {p50:.2f}ms, p95 {p95:.2f}ms, p99 {p99:.2f}ms, "
+                    "max {max:.2f}ms".format(**stats))
+
+    def get_frame_statistics(self):
+        """Returns the frame-time statistics as a dictionary."""
+        return self.frame_statistics.as_dict()
+
+
+def initialize(headless=False, duration=None, speed=1.0, profile=False):
     global _INSTANCE
 
-    _INSTANCE = AGE()
+    _INSTANCE = AGE(headless, duration, speed, profile)
 
 def run():
     global _INSTANCE
@@ -154,3 +343,7 @@ def get_current_ticks():
 
     return _INSTANCE.current_ticks
 
+def get_frame_statistics():
+    global _INSTANCE
+
+    return _INSTANCE.get_frame_statistics()
@@ -0,0 +1,68 @@
+"""
+echo
+
+This module computes, in one pass, how the objects surrounding the player sound: their volume
+fades with the distance, their pan follows their horizontal offset and their pitch their vertical
+offset. Inaudible objects are dropped before anything is handed to the audio layer.
+
+NumPy is used when it is installed and there are enough objects for it to pay off; otherwise the
+same computation runs in plain Python.
+"""
+
+# *-* coding: utf8 *-*
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import audio
+import constants
+
+
+def get_audible_radius(max_distance):
+    """Returns the distance from which objects cannot be heard anymore."""
+    return max_distance * constants.AUDIO_FX_VOLUME
+
+def compute(position, objects, max_distance):
+    """Returns the audible objects among the given ones, as (object, volume, pan, pitch) tuples,
+nearest first."""
+    if len(objects) == 0 or max_distance <= 0:
+        return []
+    if numpy is not None and len(objects) >= constants.ECHO_NUMPY_MIN_OBJECTS:
+        return compute_numpy(position, objects, max_distance)
+    return compute_python(position, objects, max_distance)
+
+def compute_python(position, objects, max_distance):
+    """Plain Python version of compute()."""
+    px = position[0]
+    py = position[1]
+    echoes = []
+    for obj in objects:
+        dx = obj.position[0] - px
+        dy = obj.position[1] - py
+        distance = math.hypot(dx, dy)
+        volume = constants.AUDIO_FX_VOLUME - distance / max_distance
+        if volume <= 0:
+            continue
+        pan = min(max(dx / 100 * 8, -0.8), 0.8)
+        pitch = audio.computePitch(0.7, 1.3, min(max(dy, -5), 5))
+        echoes.append((distance, obj, volume, pan, pitch))
+    echoes.sort(key=lambda echo: echo[0])
+    return [echo[1:] for echo in echoes]
+
+def compute_numpy(position, objects, max_distance):
+    """NumPy version of compute()."""
+    positions = numpy.array([obj.position for obj in objects], dtype=float)
+    dx = positions[:, 0] - position[0]
+    dy = positions[:, 1] - position[1]
+    distances = numpy.hypot(dx, dy)
+    volumes = constants.AUDIO_FX_VOLUME - distances / max_distance
+    audible = numpy.flatnonzero(volumes > 0)
+    audible = audible[numpy.argsort(distances[audible], kind="stable")]
+    pans = numpy.clip(dx[audible] / 100 * 8, -0.8, 0.8)
+    pitches = audio.computePitch(0.7, 1.3, numpy.clip(dy[audible], -5, 5))
+    return [(objects[index], float(volume), float(pan), float(pitch))
+            for index, volume, pan, pitch in zip(audible.tolist(), volumes[audible], pans, pitches)]
@@ -1,7 +1,13 @@
 # *-* coding utf8 *-*
 
-import queue
+import collections
+import collections.abc
+import threading
+import time
+
+import constants
 import logger
+import profiler
 
 # general game events
 
@@ -31,6 +37,7 @@ CHARACTER_ATTRIBUTE_CHANGE = 52
 CHARACTER_HIT = 53
 CHARACTER_TIRED = 54
 CHARACTER_DIED = 55
+CHARACTER_ATTACKED = 56
 
 
 # object specific events
@@ -48,18 +55,479 @@ AUDIO_CAMERA_CHANGE = 102
 
 
 
+class Event():
+    """A queued event. Instances are recycled through a free list once dispatched, so they must not
+be kept by listeners (which only receive the event data)."""
+    __slots__ = ("type", "data", "target", "time", "key")
+
+    def __init__(self):
+        self.type = None
+        self.data = None
+        self.target = None
+        self.time = 0.0
+        self.key = None
+
+    def __repr__(self):
+        return "Event({name}, {data})".format(name=EVENT_NAMES.get(self.type, self.type), data=self.data)
+
+
+# Dispatched events ready to be reused by post().
+_FREE_EVENTS = []
+# Called with each event about to be dispatched, see set_trace().
+_TRACE = None
+
+
+def _new_event(type, data, target, key):
+    """Returns an event taken from the free list, or a new one if the list is empty."""
+    event = _FREE_EVENTS.pop() if len(_FREE_EVENTS) > 0 else Event()
+    event.type = type
+    event.data = data
+    event.target = target
+    event.time = time.perf_counter()
+    event.key = key
+    return event
+
+
+def _release_event(event):
+    """Gives a dispatched event back to the free list."""
+    event.data = None
+    event.target = None
+    event.key = None
+    if len(_FREE_EVENTS) < constants.EVENT_FREE_LIST_SIZE:
+        _FREE_EVENTS.append(event)
+
+
+class EventData(collections.abc.Mapping):
+    """Base class of slotted event payloads. Fields are read as attributes by new handlers, while
+handlers written for dictionary payloads keep working through the read-only mapping interface
+(evt.get("scene"), evt["direction"], ...). Subclasses list their fields in __slots__."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key, default)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        return "{cls}({fields})".format(cls=self.__class__.__name__,
+                                        fields=", ".join("%s=%s" % (key, self.get(key)) for key in self.__slots__))
+
+
+class TickData(EventData):
+    """SCENE_INTERVAL_TICK payload: time (int, game ticks in milliseconds)."""
+    __slots__ = ("time",)
+
+    def __init__(self, time):
+        self.time = time
+
+
+class SceneData(EventData):
+    """Payload of events concerning a single scene: scene (Scene)."""
+    __slots__ = ("scene",)
+
+    def __init__(self, scene):
+        self.scene = scene
+
+
+class CharacterSpawnData(EventData):
+    """CHARACTER_SPAWN payload: scene (Scene), position (list of 2 ints)."""
+    __slots__ = ("scene", "position")
+
+    def __init__(self, scene, position):
+        self.scene = scene
+        self.position = position
+
+
+class CharacterMoveData(EventData):
+    """CHARACTER_MOVE payload: direction (one of constants.DIRECTION_*), type ("walk" or "run")."""
+    __slots__ = ("direction", "type")
+
+    def __init__(self, direction, type="walk"):
+        self.direction = direction
+        self.type = type
+
+
+class ObjectHitData(EventData):
+    """OBJECT_HIT payload: character (Object) hitting obj (Object)."""
+    __slots__ = ("character", "obj")
+
+    def __init__(self, character, obj):
+        self.character = character
+        self.obj = obj
+
+
+class CharacterAttackData(EventData):
+    """CHARACTER_ATTACKED payload: attacker (Object) attacking target (Object) for damage (int)."""
+    __slots__ = ("attacker", "target", "damage")
+
+    def __init__(self, attacker, target, damage):
+        self.attacker = attacker
+        self.target = target
+        self.damage = damage
+
+
+class AudioRenderData(EventData):
+    """AUDIO_RENDER payload: scene (Scene), listener (list of 2 numbers, listener position),
+directionVector (list of 2 floats)."""
+    __slots__ = ("scene", "listener", "directionVector")
+
+    def __init__(self, scene, listener, directionVector):
+        self.scene = scene
+        self.listener = listener
+        self.directionVector = directionVector
+
+
+# Event queue lanes, from the highest priority to the lowest.
+LANE_INPUT = 0
+LANE_GAMEPLAY = 1
+LANE_AUDIO = 2
+LANE_BACKGROUND = 3
+LANE_NAMES = ["input", "gameplay", "audio", "background"]
+
+# Maps event types to their lane; types not listed here use the gameplay lane.
+EVENT_LANES = {
+    CHARACTER_MOVE: LANE_INPUT,
+    MENU_OPTION_CHANGE: LANE_INPUT,
+    MENU_SELECT: LANE_INPUT,
+    MENU_ITEM_CHANGE: LANE_INPUT,
+    AUDIO_RENDER: LANE_AUDIO,
+    AUDIO_PLAY_3D: LANE_AUDIO,
+    AUDIO_CAMERA_CHANGE: LANE_AUDIO,
+    SCENE_INTERVAL_TICK: LANE_BACKGROUND,
+}
+
+
+class LaneStatistics():
+    """Counters of a single event queue lane."""
+
+    def __init__(self):
+        self.posted = 0
+        self.dispatched = 0
+        self.high_water = 0
+        self.starved = 0
+
+    def as_dict(self):
+        """Returns the counters as a dictionary."""
+        return {"posted": self.posted, "dispatched": self.dispatched,
+                "high_water": self.high_water, "starved": self.starved}
+
+
+class EventQueue():
+    """A multi-lane event queue.
+In strict mode, an event is only taken from a lane when all higher priority lanes are empty. In
+weighted mode, each lane may deliver up to its weight in events before lower priority lanes get
+their turn. In both modes, a lane whose oldest event waited longer than max_wait milliseconds is
+served first, so that low priority events such as ticks keep flowing under load; this depends on
+the wall clock, so it is disabled when the dispatch order must be deterministic."""
+
+    def __init__(self, mode="strict", weights=None, max_wait=constants.EVENT_LANE_MAX_WAIT):
+        self.lanes = [collections.deque() for name in LANE_NAMES]
+        self.statistics = [LaneStatistics() for name in LANE_NAMES]
+        self.lock = threading.Lock()
+        self.size = 0
+        self.deterministic = False
+        self.configure(mode, weights, max_wait)
+
+    def configure(self, mode, weights=None, max_wait=constants.EVENT_LANE_MAX_WAIT):
+        """Sets the scheduling mode, lane weights and maximum wait time (0 disables it)."""
+        if mode not in ["strict", "weighted"]:
+            raise RuntimeError("Event queue mode {mode} should be either 'strict' or 'weighted'".format(mode=mode))
+        if weights is None:
+            weights = constants.EVENT_LANE_WEIGHTS
+        if len(weights) != len(LANE_NAMES) or min(weights) < 1:
+            raise RuntimeError("One positive weight is expected per event queue lane")
+        self.mode = mode
+        self.weights = list(weights)
+        self.credits = list(weights)
+        self.max_wait = max_wait / 1000
+
+    def put(self, event):
+        """Queues the given event in its lane."""
+        lane_index = EVENT_LANES.get(event.type, LANE_GAMEPLAY)
+        with self.lock:
+            lane = self.lanes[lane_index]
+            lane.append(event)
+            self.size += 1
+            stats = self.statistics[lane_index]
+            stats.posted += 1
+            if len(lane) > stats.high_water:
+                stats.high_water = len(lane)
+
+    def get(self):
+        """Returns the next event to dispatch, or None when the queue is empty."""
+        with self.lock:
+            if self.size == 0:
+                return None
+            lane_index = self._starved_lane()
+            if lane_index is not None:
+                self.statistics[lane_index].starved += 1
+            elif self.mode == "strict":
+                lane_index = self._first_lane()
+            else:
+                lane_index = self._weighted_lane()
+            self.size -= 1
+            self.statistics[lane_index].dispatched += 1
+            return self.lanes[lane_index].popleft()
+
+    def _starved_lane(self):
+        """Returns the lane whose oldest event waited the most beyond max_wait, if any."""
+        if self.max_wait <= 0 or self.deterministic:
+            return None
+        oldest = time.perf_counter() - self.max_wait
+        ret = None
+        for lane_index, lane in enumerate(self.lanes):
+            if len(lane) > 0 and lane[0].time < oldest:
+                oldest = lane[0].time
+                ret = lane_index
+        return ret
+
+    def _first_lane(self):
+        """Returns the highest priority lane holding an event."""
+        for lane_index, lane in enumerate(self.lanes):
+            if len(lane) > 0:
+                return lane_index
+
+    def _weighted_lane(self):
+        """Returns the highest priority lane holding an event and having some credit left,
+refilling credits once every non-empty lane used them up."""
+        for attempt in range(2):
+            for lane_index, lane in enumerate(self.lanes):
+                if len(lane) > 0 and self.credits[lane_index] > 0:
+                    self.credits[lane_index] -= 1
+                    return lane_index
+            self.credits = list(self.weights)
+        return self._first_lane()
+
+    def qsize(self):
+        """Returns the number of queued events, all lanes included."""
+        return self.size
+
+    def empty(self):
+        """Returns whether no event is queued."""
+        return self.size == 0
+
+    def get_lane_statistics(self):
+        """Returns per-lane counters, keyed by lane name."""
+        return {name: stats.as_dict() for name, stats in zip(LANE_NAMES, self.statistics)}
+
+    def reset_statistics(self):
+        """Clears the per-lane counters."""
+        self.statistics = [LaneStatistics() for name in LANE_NAMES]
+
+
 # List objects receiving custom game events.
 EVENT_LISTENERS = []
-EVENT_QUEUE = queue.Queue()
+EVENT_QUEUE = EventQueue()
 
-def pump():
-    global EVENT_QUEUE
+# Pump budget: maximum number of events and time (in milliseconds) spent dispatching per pump()
+# call. 0 means unlimited.
+_PUMP_MAX_EVENTS = constants.EVENT_PUMP_MAX_EVENTS
+_PUMP_TIME_BUDGET = constants.EVENT_PUMP_TIME_BUDGET
+# When set, the dispatch order only depends on the posted events, not on the wall clock.
+_DETERMINISTIC = False
+
+
+class EventStatistics():
+    """Collects queue depth, dispatch counts and event ages (time between post and dispatch)."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clears all collected values."""
+        self.high_water = 0
+        self.pumps = 0
+        self.budget_exhausted = 0
+        self.dispatched = {}
+        self.age_total = {}
+        self.age_max = {}
+        self.late = 0
+        self.coalesced = {}
+
+    def on_post(self, depth):
+        """Updates the queue high-water mark."""
+        if depth > self.high_water:
+            self.high_water = depth
+
+    def on_coalesce(self, event_type):
+        """Records a pending event superseded by a newer one."""
+        self.coalesced[event_type] = self.coalesced.get(event_type, 0) + 1
+
+    def on_dispatch(self, event_type, age):
+        """Records an event dispatch and its age in milliseconds."""
+        self.dispatched[event_type] = self.dispatched.get(event_type, 0) + 1
+        self.age_total[event_type] = self.age_total.get(event_type, 0.0) + age
+        if age > self.age_max.get(event_type, 0.0):
+            self.age_max[event_type] = age
+        if age > constants.EVENT_LATE_THRESHOLD:
+            self.late += 1
+
+    def as_dict(self):
+        """Returns the collected values, with per-event-type entries keyed by event name."""
+        types = {}
+        for event_type, count in self.dispatched.items():
+            types[EVENT_NAMES.get(event_type, str(event_type))] = {
+                "count": count,
+                "average_age": self.age_total[event_type] / count,
+                "max_age": self.age_max[event_type],
+                "coalesced": self.coalesced.get(event_type, 0)}
+        return {"high_water": self.high_water,
+                "pumps": self.pumps,
+                "budget_exhausted": self.budget_exhausted,
+                "dispatched": sum(self.dispatched.values()),
+                "late": self.late,
+                "coalesced": sum(self.coalesced.values()),
+                "types": types}
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "event_manager"
+
+
+STATISTICS = EventStatistics()
+
+# Coalescible event types: type -> data key. A newly posted event of such a type replaces the data
+# of the pending event of the same type whose data has the same value for this key, instead of
+# being queued. A None key means any pending event of the type is superseded.
+COALESCED_EVENTS = {}
+# Pending coalescible events: (type, key value) -> queued event.
+_PENDING = {}
 
+
+def set_coalescing(type, key=None):
+    """Declares the given event type coalescible by the given data key (see COALESCED_EVENTS)."""
+    COALESCED_EVENTS[type] = key
+
+
+def remove_coalescing(type):
+    """Pending events of the given type will not be superseded anymore."""
+    COALESCED_EVENTS.pop(type, None)
+
+
+def initialize(config):
+    """Configures the pump budget from the "event-properties" configuration section."""
+    global _PUMP_MAX_EVENTS
+    global _PUMP_TIME_BUDGET
+
+    import gameconfig
     try:
-        e = EVENT_QUEUE.get(block=False)
-    except queue.Empty:
-        return
-    dispatch(e)
+        max_events = gameconfig.get_value(config, "pump-max-events", int,
+                                          {"defaultValue": constants.EVENT_PUMP_MAX_EVENTS, "minValue": 0})
+        time_budget = gameconfig.get_value(config, "pump-time-budget", int,
+                                           {"defaultValue": constants.EVENT_PUMP_TIME_BUDGET, "minValue": 0})
+        mode = gameconfig.get_value(config, "lane-mode", str, {"defaultValue": "strict"})
+        weights = gameconfig.get_value(config, "lane-weights", list,
+                                       {"defaultValue": constants.EVENT_LANE_WEIGHTS,
+                                        "elements": len(LANE_NAMES)})
+        max_wait = gameconfig.get_value(config, "lane-max-wait", int,
+                                        {"defaultValue": constants.EVENT_LANE_MAX_WAIT, "minValue": 0})
+        EVENT_QUEUE.configure(mode, weights, max_wait)
+    except RuntimeError as ex:
+        logger.error("event_manager", "Invalid event properties: {exception}".format(exception=ex))
+        return False
+    _PUMP_MAX_EVENTS = max_events
+    _PUMP_TIME_BUDGET = time_budget
+    return True
+
+
+def set_deterministic(enabled):
+    """Makes the dispatch order independent from the wall clock (needed when running headless or
+recording and replaying sessions): lane starvation and the pump time budget are disabled, only the
+event budget applies."""
+    global _DETERMINISTIC
+
+    _DETERMINISTIC = enabled
+    EVENT_QUEUE.deterministic = enabled
+
+
+def pump(max_events=None, time_budget=None):
+    """Dispatches pending events until the queue is empty or the budget is used up.
+The budget is either a number of events or a time in milliseconds; when not given, the configured
+budget is used. Returns the number of dispatched events."""
+    global EVENT_QUEUE
+
+    if max_events is None:
+        max_events = _PUMP_MAX_EVENTS
+    if time_budget is None:
+        time_budget = _PUMP_TIME_BUDGET
+    deadline = None
+    if time_budget > 0 and _DETERMINISTIC is False:
+        deadline = time.perf_counter() + time_budget / 1000
+    STATISTICS.pumps += 1
+    count = 0
+    while True:
+        e = EVENT_QUEUE.get()
+        if e is None:
+            return count
+        if e.key is not None:
+            # From now on, events of the same kind are queued again instead of replacing this one.
+            _PENDING.pop(e.key, None)
+        now = time.perf_counter()
+        STATISTICS.on_dispatch(e.type, (now - e.time) * 1000)
+        if _TRACE is not None:
+            _TRACE(e)
+        dispatch(e)
+        _release_event(e)
+        count += 1
+        if (max_events > 0 and count >= max_events) \
+           or (deadline is not None and time.perf_counter() >= deadline):
+            if EVENT_QUEUE.empty() is False:
+                STATISTICS.budget_exhausted += 1
+            return count
+
+
+def set_trace(callback):
+    """Sets the function called with each event about to be dispatched, None to disable tracing."""
+    global _TRACE
+
+    _TRACE = callback
+
+
+def get_statistics():
+    """Returns the event queue statistics as a dictionary."""
+    ret = STATISTICS.as_dict()
+    ret["lanes"] = EVENT_QUEUE.get_lane_statistics()
+    return ret
+
+
+def reset_statistics():
+    """Clears the event queue statistics."""
+    STATISTICS.reset()
+    EVENT_QUEUE.reset_statistics()
+
+
+def log_statistics():
+    """Writes the event queue statistics to the log file."""
+    stats = STATISTICS.as_dict()
+    logger.info(STATISTICS, "Queue high-water mark: {hw}, {count} events dispatched in {pumps} pumps, "
+                "{late} late, {coalesced} coalesced, budget exhausted {exhausted} times".format(
+                    hw=stats["high_water"], count=stats["dispatched"], pumps=stats["pumps"],
+                    late=stats["late"], coalesced=stats["coalesced"],
+                    exhausted=stats["budget_exhausted"]))
+    for name, values in sorted(stats["types"].items()):
+        logger.info(STATISTICS, "{name}: {count} events, age avg {avg:.2f}ms, max {max:.2f}ms, "
+                    "{coalesced} coalesced".format(name=name, count=values["count"],
+                                                   avg=values["average_age"], max=values["max_age"],
+                                                   coalesced=values["coalesced"]))
+    for name, values in EVENT_QUEUE.get_lane_statistics().items():
+        logger.info(STATISTICS, "Lane {name}: {posted} posted, {dispatched} dispatched, high-water mark "
+                    "{hw}, {starved} served after waiting too long".format(
+                        name=name, posted=values["posted"], dispatched=values["dispatched"],
+                        hw=values["high_water"], starved=values["starved"]))
 
 # Maps event constants to strings to ease event handler executions.
 EVENT_NAMES = {
@@ -85,6 +553,7 @@ EVENT_NAMES = {
     CHARACTER_HIT: "character_hit",
     CHARACTER_TIRED: "character_tired",
     CHARACTER_DIED: "character_died",
+    CHARACTER_ATTACKED: "character_attacked",
 
     OBJECT_TAKE: "object_take",
     OBJECT_DROP: "object_drop",
@@ -98,68 +567,157 @@ EVENT_NAMES = {
 
 }
 
+# Only the latest tick and listener orientation of a scene are worth processing after a stall.
+set_coalescing(SCENE_INTERVAL_TICK)
+set_coalescing(AUDIO_RENDER, "scene")
+
+# Handler chains per event type: type -> (will_chain, do_chain, did_chain), each chain being a tuple
+# of (method, listener, log message, source) entries. A type's chains are resolved on its first
+# dispatch and then kept up to date by add_listener() and remove_listener() only.
+_HANDLERS = {}
+_REGISTERED = set()
+# Topic subscriptions: listener id -> (event types, source). Listeners registered with
+# add_listener() have no entry and receive every event type.
+_TOPICS = {}
+
+
+def _resolve(listener, event_type):
+    """Returns the (will, do, did) handlers implemented by listener for the given event type."""
+    name = EVENT_NAMES.get(event_type, None)
+    return (getattr(listener, "event_will_%s" % name, None),
+            getattr(listener, "event_%s" % name, None),
+            getattr(listener, "event_did_%s" % name, None))
+
+
+def _build_chains(listeners, event_type, topics=True):
+    """Builds the will/do/did handler chains of the given listeners for an event type. When topics
+is False, subscriptions are ignored (direct delivery)."""
+    chains = ([], [], [])
+    for listener in listeners:
+        types, source = _TOPICS.get(id(listener), (None, None)) if topics else (None, None)
+        if types is not None and event_type not in types:
+            continue
+        for chain, method in zip(chains, _resolve(listener, event_type)):
+            if method is not None:
+                message = None
+                if "interval" not in method.__name__:
+                    message = "{obj}.{script}".format(obj=listener.__class__.__name__, script=method.__name__)
+                chain.append((method, listener, message, source))
+    return tuple(tuple(chain) for chain in chains)
+
+
+def _matches(data, source):
+    """Returns whether the event data concerns source, as its "scene" or "obj" value."""
+    if data is None:
+        return False
+    return data.get("scene", None) is source or data.get("obj", None) is source
+
+
+def _get_chains(event_type):
+    """Returns the handler chains for the given event type, building them if needed."""
+    chains = _HANDLERS.get(event_type, None)
+    if chains is None:
+        chains = _build_chains(EVENT_LISTENERS, event_type)
+        _HANDLERS[event_type] = chains
+    return chains
+
+
 def add_listener(obj):
     """Adds obj as a listener who will be notified when events occur, if the corresponding method
 is found within obj's implementation."""
     global EVENT_LISTENERS
 
-    if obj is not None:
-        logger.debug("event_manager", "addListener({name})".format(name=getattr(obj, "name", obj.__class__.__name__)))
-        EVENT_LISTENERS.append(obj)
+    if obj is None or id(obj) in _REGISTERED:
+        return
+    logger.debug("event_manager", "addListener({name})".format(name=getattr(obj, "name", obj.__class__.__name__)))
+    EVENT_LISTENERS.append(obj)
+    _REGISTERED.add(id(obj))
+    # chains are replaced rather than modified, so that an ongoing dispatch is not affected.
+    for event_type, chains in _HANDLERS.items():
+        added = _build_chains([obj], event_type)
+        if added != ((), (), ()):
+            _HANDLERS[event_type] = tuple(chain + new for chain, new in zip(chains, added))
 
 def remove_listener(obj):
     """Removes a registered object"""
     global EVENT_LISTENERS
 
-    if obj is None:
+    if obj is None or id(obj) not in _REGISTERED:
         return
     EVENT_LISTENERS.remove(obj)
+    _REGISTERED.discard(id(obj))
+    _TOPICS.pop(id(obj), None)
+    for event_type, chains in _HANDLERS.items():
+        _HANDLERS[event_type] = tuple(tuple(entry for entry in chain if entry[1] is not obj)
+                                      for chain in chains)
+
+def subscribe(obj, types, source=None):
+    """Adds obj as a listener who will only be notified of the given event types. When source is
+given (a scene or an object), only events whose "scene" or "obj" data is source are delivered."""
+    if obj is None:
+        return
+    remove_listener(obj)
+    _TOPICS[id(obj)] = (frozenset(types), source)
+    add_listener(obj)
+
+def unsubscribe(obj):
+    """Removes a subscribed object."""
+    remove_listener(obj)
 
 def post(type, data=None, target=None):
     """Posts an event to all listeners. the type argument must be one of the defined event_manager
-constants above. The data argument is a dict which may contain any useful data for listeners.
+constants above. The data argument is a dict or an EventData instance which may contain any
+useful data for listeners.
+When target is given (an object or a list of objects), the event is only delivered to it,
+whether it is a registered listener or not.
 """
     if isinstance(type, int) is False:
         raise RuntimeError("Event type parameter has to be integer.")
     global EVENT_QUEUE
     global EVENT_NAMES
 
-    EVENT_QUEUE.put({"type": type, "data": data, "target": None})
+    key = None
+    if target is None and type in COALESCED_EVENTS:
+        data_key = COALESCED_EVENTS[type]
+        key = (type, data.get(data_key, None) if data_key is not None and data is not None else None)
+        pending = _PENDING.get(key, None)
+        if pending is not None:
+            pending.data = data
+            STATISTICS.on_coalesce(type)
+            return
+    event = _new_event(type, data, target, key)
+    if key is not None:
+        _PENDING[key] = event
+    EVENT_QUEUE.put(event)
+    STATISTICS.on_post(EVENT_QUEUE.qsize())
     if type not in [SCENE_INTERVAL_TICK]:
         logger.debug("event_manager", "Posted event {evt}".format(evt=EVENT_NAMES.get(type, "UNKNOWN")))
 
 def dispatch(event):
     """Dispatches incoming event to listeners that implement the appropriate method."""
-    global EVENT_NAMES
-    global EVENT_LISTENERS
-    
-    script = "event_%s" % EVENT_NAMES.get(event.get("type", 'unknown'), None)
-    will_script = "event_will_%s" % EVENT_NAMES.get(event.get("type", 'unknown'), None)
-    did_script = "event_did_%s" % EVENT_NAMES.get(event.get("type", 'unknown'), None)
-    target = event.get("target", None)
-    targets = []
+    event_type = event.type
+    target = event.target
     if target is not None:
-        target.append(target)
+        chains = _build_chains(target if isinstance(target, (list, tuple)) else [target], event_type,
+                               topics=False)
     else:
-        targets.extend(EVENT_LISTENERS)
-    will_chain = []
-    do_chain = []
-    did_chain = []
-    for listener in targets:
-        method = getattr(listener, script, None)
-        will_method = getattr(listener, will_script, None)
-        did_method = getattr(listener, did_script, None)
-        if will_method:
-            will_chain.append((will_method, listener))
-        if method:
-            do_chain.append((method, listener))
-        if did_method:
-            did_chain.append((did_method, listener))
-    for list in [will_chain, do_chain, did_chain]:
-        for method, listener in list:
-            ret = logger.debug("event_manager", "{obj}.{script}".format(obj=listener.__class__.__name__, script=method.__name__)) if not "interval" in method.__name__ else None
+        chains = _get_chains(event_type)
+    data = event.data
+    for chain in chains:
+        for method, listener, message, source in chain:
+            if source is not None and _matches(data, source) is False:
+                continue
+            if message is not None:
+                logger.debug("event_manager", message)
             try:
-                ret = method(event.get('data', None))
+                if profiler.ENABLED:
+                    start = profiler.start()
+                    try:
+                        ret = method(data)
+                    finally:
+                        profiler.stop("%s.%s" % (listener.__class__.__name__, method.__name__), start)
+                else:
+                    ret = method(data)
             except Exception as e:
                 logger.exception("event_manager", "Failed to execute {name}.{script}({event}): {exception}".format(name=listener.__class__.__name__, script=method.__name__, event=event, exception=e), e)
                 ret = False
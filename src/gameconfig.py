@@ -4,13 +4,13 @@ gameconfig
 Interface to read and extract values from a engine configuration
 """
 
-import io
+import json
 import os
 import platform
 import sys
-import json
 import logger
 import constants
+import scene_cache
 
 _INSTANCE = None
 
@@ -25,10 +25,7 @@ class GameConfig():
     def init(self):
         """Initializes configuration"""
         try:
-            file_object = io.FileIO(self.file)
-            data = file_object.readall()
-            file_object.close()
-            self.config = json.loads(data)
+            self.config = scene_cache.load_json(self.file)
             return True
         except Exception as ex:
             logger.error(self, "failed to load file: %s" %(ex))
@@ -65,14 +62,31 @@ class GameConfig():
         """Loads a configuration file"""
         file = os.path.join(os.path.abspath("."), "data", "scenes", json_file)
         try:
-            conf = io.FileIO(file)
-            json_config = json.load(conf)
+            json_config = scene_cache.load_json(file)
         except Exception as ex:
             logger.error(self, "Failed to load {file}: {exception}".format(file=json_file, exception=ex))
             return None
         scenes = json_config.get('scenes', [json_config])
         return scenes
 
+    def load_chunk_configuration(self, directory, x, y):
+        """Loads a chunk of a world map from data/chunks/<directory>/<x>_<y>.json. Chunks are not
+        kept in the scene cache, so that memory use does not grow with the explored part of the
+        world. A missing file is an empty chunk."""
+        file = os.path.join(os.path.abspath("."), constants.CONFIG_DATA_DIR, "chunks", directory, "{x}_{y}.json".format(x=x, y=y))
+        try:
+            with open(file, "rb") as chunk_file:
+                chunk_config = json.loads(chunk_file.read())
+        except FileNotFoundError:
+            return {}
+        except Exception as ex:
+            logger.error(self, "Failed to load chunk {x}_{y} of {directory}: {exception}".format(x=x, y=y, directory=directory, exception=ex))
+            return None
+        if isinstance(chunk_config, dict) is False:
+            logger.error(self, "Chunk {x}_{y} of {directory} is not a JSON object".format(x=x, y=y, directory=directory))
+            return None
+        return chunk_config
+
     def get_start_scene(self):
         """Returns the scene defined as a start scene"""
         return self.config.get('start-scene', 'main')
@@ -85,6 +99,34 @@ class GameConfig():
         """Returns the global audio properties"""
         return self.config.get("audio-properties", {})
 
+    def get_event_properties(self):
+        """Returns the event manager properties"""
+        return self.config.get("event-properties", {})
+
+    def get_prefetch_properties(self):
+        """Returns the scene prefetcher properties"""
+        return self.config.get("prefetch-properties", {})
+
+    def get_keybindings(self):
+        """Returns the key name to action map"""
+        return self.config.get("keybindings", {})
+
+    def get_loading_properties(self):
+        """Returns the loading properties"""
+        return self.config.get("loading-properties", {})
+
+    def get_ai_properties(self):
+        """Returns the enemy AI properties"""
+        return self.config.get("ai-properties", {})
+
+    def get_pathfinding_properties(self):
+        """Returns the pathfinding properties"""
+        return self.config.get("pathfinding-properties", {})
+
+    def get_residency_properties(self):
+        """Returns the scene residency properties"""
+        return self.config.get("residency-properties", {})
+
     def get_control_resources(self):
         """Returns the control (input) resources"""
         try:
@@ -108,6 +150,7 @@ def initialize(file):
     
     if _INSTANCE is not None:
         return True
+    scene_cache.initialize()
     _INSTANCE = GameConfig(file)
     if _INSTANCE and _INSTANCE.init() is True:
         return True
@@ -143,6 +186,12 @@ def get_scene_configuration(name):
         return _INSTANCE.get_scene_configuration(name)
     return None
 
+def load_chunk_configuration(directory, x, y):
+    """Loads a chunk of a world map"""
+    if _INSTANCE is not None:
+        return _INSTANCE.load_chunk_configuration(directory, x, y)
+    return None
+
 def get_start_scene():
     """Retrieves the start scene"""
     if _INSTANCE is not None:
@@ -194,3 +243,46 @@ def get_global_audio_properties():
     if _INSTANCE is not None:
         return _INSTANCE.get_global_audio_properties()
     return {}
+
+
+def get_event_properties():
+    """Returns a dictionary containing event manager properties."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_event_properties()
+    return {}
+
+def get_keybindings():
+    """Returns a dictionary mapping key names to action names."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_keybindings()
+    return {}
+
+def get_loading_properties():
+    """Returns a dictionary containing loading properties."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_loading_properties()
+    return {}
+
+def get_ai_properties():
+    """Returns a dictionary containing enemy AI properties."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_ai_properties()
+    return {}
+
+def get_pathfinding_properties():
+    """Returns a dictionary containing pathfinding properties."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_pathfinding_properties()
+    return {}
+
+def get_residency_properties():
+    """Returns a dictionary containing scene residency properties."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_residency_properties()
+    return {}
+
+def get_prefetch_properties():
+    """Returns a dictionary containing scene prefetcher properties."""
+    if _INSTANCE is not None:
+        return _INSTANCE.get_prefetch_properties()
+    return {}
@@ -0,0 +1,96 @@
+"""
+hot_reload
+
+This module watches the scene files under data/scenes while the game runs. When a file is
+modified, only this file is parsed again and its scenes are updated in place (see Scene.reload):
+the player keeps their position and the musics that did not change keep playing.
+"""
+
+# *-* coding: utf8 *-*
+
+import os
+
+import constants
+import gameconfig
+import logger
+import scene_cache
+import speech
+import timer_manager
+
+# Set from the command line, read by initialize().
+_enabled = False
+# Global hot reloader instance
+_INSTANCE = None
+
+
+class HotReloader():
+    """Polls the modification time of the scene files."""
+
+    def __init__(self):
+        self.mtimes = {}
+        self.poll(silent=True)
+        self.timer = timer_manager.call_every(constants.HOT_RELOAD_POLL_INTERVAL, self.poll)
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "hot_reload"
+
+    def poll(self, silent=False):
+        """Reloads the scene files modified since the previous poll."""
+        import scene_manager
+
+        for file in scene_manager.list_scene_files():
+            try:
+                mtime = os.stat(os.path.join("data", "scenes", file)).st_mtime_ns
+            except OSError:
+                continue
+            if self.mtimes.get(file, None) == mtime:
+                continue
+            self.mtimes[file] = mtime
+            if silent is False:
+                self.reload(file)
+
+    def reload(self, file):
+        """Parses the given scene file again and applies it to the scenes it defines."""
+        import scene_manager
+
+        logger.info(self, "{file} modified, reloading".format(file=file))
+        configs = gameconfig.load_scene_configuration(file)
+        if configs is None:
+            speech.speak("Erreur dans {file}".format(file=file))
+            return False
+        failed = scene_manager.reload_scene_file(file, configs)
+        scene_cache.save()
+        if failed > 0:
+            speech.speak("{file} rechargé, {count} erreurs".format(file=file, count=failed))
+        else:
+            speech.speak("{file} rechargé".format(file=file))
+        return failed == 0
+
+    def terminate(self):
+        """Stops watching."""
+        timer_manager.cancel(self.timer)
+
+
+def configure(enabled):
+    """Sets whether scene files are watched."""
+    global _enabled
+
+    _enabled = enabled
+
+def initialize():
+    """Starts watching the scene files, if enabled."""
+    global _INSTANCE
+
+    if _enabled and _INSTANCE is None:
+        _INSTANCE = HotReloader()
+        logger.info(_INSTANCE, "Watching scene files")
+    return True
+
+def terminate():
+    """Stops watching the scene files."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.terminate()
+    _INSTANCE = None
@@ -13,27 +13,65 @@ keyboardMap = {
 	pygame.K_TAB: "tab"
 }
 
+# modifiers taking part in action names, in the order their prefixes are added.
+modifierPrefixes = [
+	(pygame.KMOD_SHIFT, "shift_"),
+	(pygame.KMOD_CTRL, "control_"),
+	(pygame.KMOD_ALT, "alt_"),
+	(pygame.KMOD_META, "windows_")
+]
+modifierMask = pygame.KMOD_SHIFT | pygame.KMOD_CTRL | pygame.KMOD_ALT | pygame.KMOD_META
+
+# (key, modifiers) -> action name, filled as keys are used.
+actionTable = {}
+
 lastKeyPressed = None
 
+def initialize(config):
+		"""Adds the "keybindings" section of the configuration, mapping pygame key names to
+		action names, to the default key to action map. Keys which cannot be resolved keep their
+		default action; resolving key names needs pygame 2."""
+		global keyboardMap
+
+		if config is None or len(config) == 0:
+				return True
+		if getattr(pygame.key, "key_code", None) is None:
+				logger.warning("inputHandler", "Key names cannot be resolved with pygame {version}, using the default keybindings".format(version=pygame.version.ver))
+				return True
+		bindings = dict(keyboardMap)
+		for name, actionName in config.items():
+				try:
+						bindings[pygame.key.key_code(name)] = actionName
+				except Exception as e:
+						logger.warning("inputHandler", "Unknown key {name} in keybindings, ignored: {exception}".format(name=name, exception=e))
+		keyboardMap = bindings
+		actionTable.clear()
+		return True
+
+def compileAction(key, mod):
+		"""Builds the action name of a key and modifiers combination."""
+		ret = keyboardMap.get(key, pygame.key.name(key))
+		if ret is None or ret == "":
+				return None
+		for modifier, prefix in modifierPrefixes:
+				if mod & modifier:
+						ret = prefix + ret
+		return ret
+
 def action(event):
 		"""Maps the given keyboard event (or joystick) to an action.)."""
 
-		global keyboardMap
 		global lastKeyPressed
-		
-		ret = keyboardMap.get(event.key, pygame.key.name(event.key))
+
+		key = (event.key, event.mod & modifierMask)
+		try:
+				ret = actionTable[key]
+		except KeyError:
+				ret = compileAction(event.key, key[1])
+				actionTable[key] = ret
 		if ret is not None:
-				if event.mod & pygame.KMOD_SHIFT:
-						ret = "shift_%s" % ret
-				if event.mod & pygame.KMOD_CTRL:
-						ret = "control_%s" % ret
-				if event.mod & pygame.KMOD_ALT:
-						ret = "alt_%s" % ret
-				if event.mod & pygame.KMOD_META:
-						ret = "windows_%s" % ret
 				lastKeyPressed = ret if event.type == pygame.KEYDOWN else None
-				return ret
-		return None
+		return ret
 
 
 def getLastKeyPressed():
@@ -0,0 +1,113 @@
+"""
+loader
+
+This module runs the startup loading work (opening sounds, parsing scene files) on a bounded pool
+of threads, and reports the overall progress through speech while the engine loads.
+"""
+
+# *-* coding: utf8 *-*
+
+import concurrent.futures
+import time
+
+import constants
+import gameconfig
+import logger
+import speech
+
+# Global loader instance
+_INSTANCE = None
+
+
+class Loader():
+    """Thread pool counting the loaded items against the expected total."""
+
+    def __init__(self, config):
+        self.workers = gameconfig.get_value(config, "workers", int, {"defaultValue": constants.LOADING_WORKERS, "minValue": 1})
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="loader")
+        self.total = 0
+        self.done = 0
+        self.reported = 0
+        self.start = time.perf_counter()
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "loader"
+
+    def expect(self, count):
+        """Adds count items to the expected total."""
+        self.total += count
+
+    def map(self, function, items):
+        """Calls function on each item concurrently. Returns a (result, exception) tuple per item,
+in the order of items."""
+        futures = {}
+        for index, item in enumerate(items):
+            futures[self.pool.submit(function, item)] = index
+        results = [None] * len(futures)
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results[futures[future]] = (future.result(), None)
+            except Exception as ex:
+                results[futures[future]] = (None, ex)
+            self.advance()
+        return results
+
+    def advance(self):
+        """Counts a loaded item, speaking the progress at each step."""
+        self.done += 1
+        if self.total == 0:
+            return
+        percent = min(100, self.done * 100 // self.total)
+        if percent >= self.reported + constants.LOADING_PROGRESS_STEP:
+            self.reported = percent - percent % constants.LOADING_PROGRESS_STEP
+            speech.speak("{percent}%".format(percent=self.reported))
+
+    def terminate(self):
+        """Stops the worker threads."""
+        self.pool.shutdown()
+        logger.info(self, "{count} items loaded in {duration:.3f}s by {workers} workers".format(
+            count=self.done, duration=time.perf_counter() - self.start, workers=self.workers))
+
+
+def initialize(config):
+    """Initializes the loader."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        try:
+            _INSTANCE = Loader(config)
+        except Exception as ex:
+            logger.exception("loader", "Failed to initialize the loader", ex)
+            return False
+    return True
+
+def expect(count):
+    """Adds count items to the expected total."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.expect(count)
+
+def map(function, items):
+    """Calls function on each item, concurrently if the loader is running. Returns a (result,
+exception) tuple per item."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        return _INSTANCE.map(function, items)
+    results = []
+    for item in items:
+        try:
+            results.append((function(item), None))
+        except Exception as ex:
+            results.append((None, ex))
+    return results
+
+def terminate():
+    """Stops the loader once loading is over."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.terminate()
+    _INSTANCE = None
@@ -1,11 +1,13 @@
 # *-* coding: utf-8 *
 
 import io
-import pygame
 import sys
+import time
 import traceback
 
+import clock
 import event_manager
+import profiler
 
 
 """Log Categories defines, for each component, the level we want to log."""
@@ -24,7 +26,7 @@ class Logger(object):
 
   def __init__(self, file=None):
     event_manager.add_listener(self)
-    self.ticks = pygame.time.get_ticks()
+    self.ticks = clock.get_ticks()
     if file is not None:
       self.logFile = file
     try:
@@ -65,12 +67,16 @@ class Logger(object):
     logLevel = _logComponents.get(systemName, 30)
     if logLevel < level:
       return
+    if profiler.ENABLED:
+      start = time.perf_counter()
     try:
-      self.logIO.write(bytes("{ticks} {system} {category}: {message}\r\n".format(ticks=pygame.time.get_ticks() - self.ticks, system=systemName, category=category, message=message), 'utf-8'))
+      self.logIO.write(bytes("{ticks} {system} {category}: {message}\r\n".format(ticks=clock.get_ticks() - self.ticks, system=systemName, category=category, message=message), 'utf-8'))
       # self.logIO.flush()
     except Exception as e:
       print("Log failed: {system} {category}: {message}. Caused by {exception}".format(system=systemName, category=category, message=message, exception=e))
       return False
+    if profiler.ENABLED:
+      profiler.record("logging", time.perf_counter() - start)
     return True
 
   def getLogName(self):
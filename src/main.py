@@ -3,15 +3,38 @@
 Main program
 """
 
+import argparse
 import traceback
 
+import constants
 import core
+import hot_reload
+import replay
 import speech
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Audio Game Engine")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without display, sound device nor screen reader, on a virtual clock")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="exit after this many seconds of game time")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="game time elapsed per second of real time; up to %d simulation steps "
+                             "times SPEED are run per frame, a slower machine drops the others" % constants.MAX_SIMULATION_STEPS)
+    parser.add_argument("--record", metavar="FILE", help="record the input session to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="replay the input session of FILE")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write dispatched events, sound and speech calls to FILE")
+    parser.add_argument("--profile", action="store_true",
+                        help="enable the frame profiler from the start")
+    parser.add_argument("--hot-reload", action="store_true",
+                        help="apply changes made to the scene files while the game runs")
+    args = parser.parse_args()
+    replay.configure(args.record, args.replay, args.trace)
+    hot_reload.configure(args.hot_reload)
     try:
-        core.initialize()
+        core.initialize(args.headless, args.duration, args.speed, args.profile)
         core.run()
     except KeyboardInterrupt:
         speech.terminate()
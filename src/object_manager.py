@@ -43,6 +43,12 @@ class ObjectManager(object):
 		self.objects[name] = o
 		return o
 
+	def remove(self, obj):
+		"""Removes the given object, which no longer receives events."""
+		if self.objects.get(obj.name, None) is obj:
+			del self.objects[obj.name]
+		event_manager.unsubscribe(obj)
+
 	def get(self, name):
 		o = self.objects.get(name, None)
 		if o is None:
@@ -86,6 +92,12 @@ def addObject(config):
 		return False
 		
 
+def removeObject(obj):
+	global _instance
+
+	if _instance is not None:
+		_instance.remove(obj)
+
 def getObject(name):
 	global _instance
 
@@ -18,7 +18,6 @@ class Object:
 	def __init__(self, name, config):
 		self.name = name
 		self.logName = "Object(%s)" %(self.name)
-		event_manager.add_listener(self)
 		self.position = gameconfig.get_value(config, "position", list, {"elements": 2})
 		self.size = gameconfig.get_value(config, "size", list, {"elements": 2})
 		self.signalSound = "signal-sound"
@@ -195,6 +194,8 @@ i.e when using this object."""
 		self.hitScene = gameconfig.get_value(config, "hit-scene", str, {"defaultValue": None})
 		self.hitSound = gameconfig.get_value(config, "hit-sound", str)
 		self.interactDistance = 0
+		# only hits on this very NPC are of interest.
+		event_manager.subscribe(self, [event_manager.OBJECT_HIT], source=self)
 		
 
 	def onInteract(self, scene, player, onPurpose=False):
@@ -228,13 +229,23 @@ i.e when using this object."""
 
 						
 class Enemy(Object):
-	"""Defines an opponent that can move and attack the player."""
+	"""Defines an opponent that can move and attack the player. Enemies are run by the ai_manager."""
 	health = 100
+	state = constants.ENEMY_STATE_IDLE
 	
 	def __init__(self, name, config):
 		super().__init__(name, config)
 		self.health = gameconfig.get_value(config, "health", int, {"minValue": 1,
 																															"defaultValue": constants.ENEMY_DEFAULT_HEALTH})
 		self.signalSound = "enemy-signal-sound"
+		self.damage = gameconfig.get_value(config, "damage", int, {"minValue": 0, "defaultValue": constants.ENEMY_DEFAULT_DAMAGE})
+		self.perceptionDistance = gameconfig.get_value(config, "perception-distance", float, {"defaultValue": constants.ENEMY_PERCEPTION_DISTANCE})
+		self.attackDistance = gameconfig.get_value(config, "attack-distance", float, {"defaultValue": constants.ENEMY_ATTACK_DISTANCE})
+		self.moveInterval = gameconfig.get_value(config, "move-interval", int, {"minValue": 1, "defaultValue": constants.ENEMY_MOVE_INTERVAL})
+		self.attackInterval = gameconfig.get_value(config, "attack-interval", int, {"minValue": 1, "defaultValue": constants.ENEMY_ATTACK_INTERVAL})
+		self.state = constants.ENEMY_STATE_IDLE
+		# game ticks from which the enemy may move or attack again.
+		self.nextMove = 0
+		self.nextAttack = 0
 		
 
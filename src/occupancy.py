@@ -0,0 +1,223 @@
+"""
+occupancy
+
+This module keeps, for each map region, which cells can be walked on. Walls and obstacles are
+stored one byte per cell; cells covered by an object (according to its position and size) point
+to that object. Checking whether a character may enter a cell is then a constant-time lookup.
+Objects moving on their own (agents) are told apart, so that paths can be planned through them.
+
+The region border is a wall, except where region-links lead to other regions; scenes may add
+walls and obstacles as lists of [x1, y1, x2, y2] rectangles, bounds included, which makes
+non-rectangular regions possible.
+
+Large world maps use a ChunkedOccupancyGrid instead, which only keeps the walls and obstacles of
+the chunks currently loaded.
+"""
+
+# *-* coding: utf8 *-*
+
+import math
+
+# cell values
+FREE = 0
+WALL = 1
+OBSTACLE = 2
+
+
+class OccupancyGrid():
+    """Cells of a width x height region, from (0, 0) to (width, height) included."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.cells = bytearray(self.stride * (height + 1))
+        # cell index -> objects covering it; id(obj) -> cell indexes covered by obj.
+        self.objects = {}
+        self.footprints = {}
+        self.agents = set()
+        # incremented on every change, so that users can tell when cached results are stale;
+        # layout_version only changes with walls and obstacles.
+        self.version = 0
+        self.layout_version = 0
+        self.fill([0, 0, width, 0], WALL)
+        self.fill([0, height, width, height], WALL)
+        self.fill([0, 0, 0, height], WALL)
+        self.fill([width, 0, width, height], WALL)
+
+    def get_index(self, x, y):
+        """Returns the index of a cell, or None if it is outside the region."""
+        x = int(x)
+        y = int(y)
+        if x < 0 or y < 0 or x > self.width or y > self.height:
+            return None
+        return y * self.stride + x
+
+    def fill(self, rect, value):
+        """Sets every cell of the [x1, y1, x2, y2] rectangle (bounds included) to value."""
+        x1 = max(0, int(min(rect[0], rect[2])))
+        x2 = min(self.width, int(max(rect[0], rect[2])))
+        y1 = max(0, int(min(rect[1], rect[3])))
+        y2 = min(self.height, int(max(rect[1], rect[3])))
+        if x1 > x2:
+            return
+        row = bytes([value]) * (x2 - x1 + 1)
+        for y in range(y1, y2 + 1):
+            start = y * self.stride + x1
+            self.cells[start:start + len(row)] = row
+        self.version += 1
+        self.layout_version += 1
+
+    def get(self, position):
+        """Returns the value of the cell at position; outside the region is a wall."""
+        index = self.get_index(position[0], position[1])
+        if index is None:
+            return WALL
+        return self.cells[index]
+
+    def get_object(self, position):
+        """Returns the object covering the cell at position, if any."""
+        index = self.get_index(position[0], position[1])
+        objects = self.objects.get(index, None)
+        if objects is None:
+            return None
+        return objects[0]
+
+    def is_free(self, position):
+        """Returns whether a character may enter the cell at position."""
+        index = self.get_index(position[0], position[1])
+        return index is not None and self.get(position) == FREE and index not in self.objects
+
+    def is_passable(self, position):
+        """Returns whether a path may go through the cell at position: it is free, or only taken
+by agents which will have moved by then."""
+        index = self.get_index(position[0], position[1])
+        if index is None or self.get(position) != FREE:
+            return False
+        for obj in self.objects.get(index, ()):
+            if id(obj) not in self.agents:
+                return False
+        return True
+
+    def get_footprint(self, obj):
+        """Returns the indexes of the cells covered by an object: the cells strictly closer to its
+position than its size, on both axes."""
+        position = obj.getPosition()
+        size = obj.getSize()
+        if size is None:
+            size = (1, 1)
+        footprint = []
+        for y in range(math.floor(position[1] - size[1]) + 1, math.ceil(position[1] + size[1])):
+            for x in range(math.floor(position[0] - size[0]) + 1, math.ceil(position[0] + size[0])):
+                index = self.get_index(x, y)
+                if index is not None:
+                    footprint.append(index)
+        return footprint
+
+    def add_object(self, obj, agent=False):
+        """Marks the cells covered by an object; agents are objects moving on their own."""
+        footprint = self.get_footprint(obj)
+        self.footprints[id(obj)] = footprint
+        if agent:
+            self.agents.add(id(obj))
+        for index in footprint:
+            self.objects.setdefault(index, []).append(obj)
+        self.version += 1
+
+    def remove_object(self, obj):
+        """Frees the cells covered by an object."""
+        footprint = self.footprints.pop(id(obj), None)
+        if footprint is None:
+            return False
+        self.agents.discard(id(obj))
+        for index in footprint:
+            objects = self.objects[index]
+            objects.remove(obj)
+            if len(objects) == 0:
+                del self.objects[index]
+        self.version += 1
+        return True
+
+    def move_object(self, obj):
+        """Updates the cells covered by an object after its position changed."""
+        agent = id(obj) in self.agents
+        self.remove_object(obj)
+        self.add_object(obj, agent)
+
+
+class ChunkedOccupancyGrid(OccupancyGrid):
+    """Occupancy of a large region split into square chunks. Walls and obstacles are only stored
+for the loaded chunks, cells of other chunks being walls; objects are tracked region-wide."""
+
+    def __init__(self, width, height, chunk_size):
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.chunk_size = chunk_size
+        # (x, y) chunk -> chunk_size * chunk_size cells.
+        self.chunks = {}
+        self.objects = {}
+        self.footprints = {}
+        self.agents = set()
+        self.version = 0
+        self.layout_version = 0
+
+    def get_chunk(self, position):
+        """Returns the chunk holding the given position."""
+        return (int(position[0]) // self.chunk_size, int(position[1]) // self.chunk_size)
+
+    def load_chunk(self, chunk, layers):
+        """Adds the cells of a chunk: the region border is a wall, then each (rect, value) layer is
+applied in order."""
+        self.chunks[chunk] = bytearray(self.chunk_size * self.chunk_size)
+        self.fill_chunk(chunk, [0, 0, self.width, 0], WALL)
+        self.fill_chunk(chunk, [0, self.height, self.width, self.height], WALL)
+        self.fill_chunk(chunk, [0, 0, 0, self.height], WALL)
+        self.fill_chunk(chunk, [self.width, 0, self.width, self.height], WALL)
+        for rect, value in layers:
+            self.fill_chunk(chunk, rect, value)
+        self.version += 1
+        self.layout_version += 1
+
+    def unload_chunk(self, chunk):
+        """Drops the cells of a chunk, which become walls."""
+        if self.chunks.pop(chunk, None) is not None:
+            self.version += 1
+            self.layout_version += 1
+
+    def fill_chunk(self, chunk, rect, value):
+        """Sets the cells of the [x1, y1, x2, y2] rectangle lying in the given chunk to value."""
+        cells = self.chunks.get(chunk, None)
+        if cells is None:
+            return
+        size = self.chunk_size
+        left = chunk[0] * size
+        bottom = chunk[1] * size
+        x1 = max(left, int(min(rect[0], rect[2])))
+        x2 = min(left + size - 1, self.width, int(max(rect[0], rect[2])))
+        y1 = max(bottom, int(min(rect[1], rect[3])))
+        y2 = min(bottom + size - 1, self.height, int(max(rect[1], rect[3])))
+        if x1 > x2 or y1 > y2:
+            return
+        row = bytes([value]) * (x2 - x1 + 1)
+        for y in range(y1, y2 + 1):
+            start = (y - bottom) * size + x1 - left
+            cells[start:start + len(row)] = row
+        self.version += 1
+        self.layout_version += 1
+
+    def fill(self, rect, value):
+        """Sets every loaded cell of the [x1, y1, x2, y2] rectangle to value."""
+        for chunk in self.chunks:
+            self.fill_chunk(chunk, rect, value)
+
+    def get(self, position):
+        """Returns the value of the cell at position; outside the loaded chunks is a wall."""
+        x = int(position[0])
+        y = int(position[1])
+        if x < 0 or y < 0 or x > self.width or y > self.height:
+            return WALL
+        cells = self.chunks.get((x // self.chunk_size, y // self.chunk_size), None)
+        if cells is None:
+            return WALL
+        return cells[(y % self.chunk_size) * self.chunk_size + x % self.chunk_size]
@@ -0,0 +1,213 @@
+"""
+pathfinding
+
+This module finds paths across the occupancy grid of map regions (see occupancy), for characters
+walking in the four directions. Paths are searched with A* and cached per region and (start, goal)
+pair, so that many agents can ask for their path every tick:
+- a cached path is returned as is while the grid did not change;
+- when objects moved, the cached path is only checked again, and searched anew if it is blocked;
+  agents (see occupancy) do not block paths, they are expected to have moved when reached;
+- a cached path towards the same goal passing through the start cell is reused from there, so
+  agents walking along their path, following each other or chasing the player share most of
+  their searches;
+- when walls or obstacles change (or chunks of a world map are streamed), the paths of the region
+  are dropped.
+"""
+
+# *-* coding: utf8 *-*
+
+import collections
+import heapq
+
+import constants
+import gameconfig
+import logger
+import occupancy
+
+NEIGHBOURS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+# Global pathfinder instance
+_INSTANCE = None
+
+
+class CachedPath():
+    """A path, from its start cell to its goal cell included, as found for a grid version."""
+
+    def __init__(self, cells, version):
+        self.cells = cells
+        self.steps = {cell: index for index, cell in enumerate(cells)}
+        self.version = version
+
+
+class RegionPaths():
+    """Paths cached for the occupancy grid of a region."""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.layout_version = grid.layout_version
+        self.paths = collections.OrderedDict()
+        # goal -> {cell: cached path towards goal going through cell}.
+        self.by_goal = {}
+
+
+class Pathfinder():
+    """Finds and caches paths."""
+
+    def __init__(self, config):
+        self.cache_size = gameconfig.get_value(config, "cache-size", int, {"defaultValue": constants.PATHFINDING_CACHE_SIZE, "minValue": 1})
+        self.max_nodes = gameconfig.get_value(config, "max-nodes", int, {"defaultValue": constants.PATHFINDING_MAX_NODES, "minValue": 1})
+        self.regions = {}
+        self.hits = 0
+        self.reused = 0
+        self.searches = 0
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "pathfinding"
+
+    def get_region(self, region, grid):
+        """Returns the paths cached for a region, dropping them if its layout changed."""
+        paths = self.regions.get(region, None)
+        if paths is None or paths.grid is not grid or paths.layout_version != grid.layout_version:
+            paths = RegionPaths(grid)
+            self.regions[region] = paths
+        return paths
+
+    def find_path(self, region, grid, start, goal):
+        """Returns the cells to walk through from start (excluded) to goal (included), or None if
+goal cannot be reached."""
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        paths = self.get_region(region, grid)
+        key = (start, goal)
+        cached = paths.paths.get(key, None)
+        if cached is not None and self.check(grid, cached, 0, goal):
+            paths.paths.move_to_end(key)
+            self.hits += 1
+            return cached.cells[1:]
+        cached = paths.by_goal.get(goal, {}).get(start, None)
+        if cached is not None:
+            index = cached.steps[start]
+            if self.check(grid, cached, index, goal):
+                self.reused += 1
+                return cached.cells[index + 1:]
+        self.searches += 1
+        cells = self.search(grid, start, goal)
+        if cells is None:
+            return None
+        cached = CachedPath(cells, grid.version)
+        previous = paths.paths.pop(key, None)
+        if previous is not None:
+            self.drop(paths, previous)
+        paths.paths[key] = cached
+        through = paths.by_goal.setdefault(goal, {})
+        for cell in cells:
+            through[cell] = cached
+        if len(paths.paths) > self.cache_size:
+            _, dropped = paths.paths.popitem(last=False)
+            self.drop(paths, dropped)
+        return cells[1:]
+
+    def drop(self, paths, cached):
+        """Removes a cached path from the cells it goes through."""
+        goal = cached.cells[-1]
+        through = paths.by_goal.get(goal, None)
+        if through is None:
+            return
+        for cell in cached.cells:
+            if through.get(cell, None) is cached:
+                del through[cell]
+        if len(through) == 0:
+            del paths.by_goal[goal]
+
+    def check(self, grid, cached, index, goal):
+        """Returns whether a cached path can still be walked from its index-th cell."""
+        if cached.version == grid.version:
+            return True
+        for cell in cached.cells[index + 1:]:
+            if cell != goal and grid.is_passable(cell) is False:
+                return False
+        if index == 0:
+            cached.version = grid.version
+        return True
+
+    def search(self, grid, start, goal):
+        """A* search from start to goal; the goal cell may be occupied by an object (the target
+itself), not by a wall or an obstacle."""
+        if start == goal:
+            return [start]
+        if grid.get(goal) != occupancy.FREE:
+            return None
+        heap = [(abs(goal[0] - start[0]) + abs(goal[1] - start[1]), 0, start)]
+        costs = {start: 0}
+        previous = {start: None}
+        expanded = 0
+        while len(heap) > 0:
+            _, cost, cell = heapq.heappop(heap)
+            if cell == goal:
+                cells = []
+                while cell is not None:
+                    cells.append(cell)
+                    cell = previous[cell]
+                cells.reverse()
+                return cells
+            if cost > costs[cell]:
+                continue
+            expanded += 1
+            if expanded > self.max_nodes:
+                logger.debug(self, "No path from {start} to {goal} within {count} cells".format(start=start, goal=goal, count=self.max_nodes))
+                return None
+            cost += 1
+            for dx, dy in NEIGHBOURS:
+                neighbour = (cell[0] + dx, cell[1] + dy)
+                if neighbour != goal and grid.is_passable(neighbour) is False:
+                    continue
+                if cost < costs.get(neighbour, cost + 1):
+                    costs[neighbour] = cost
+                    previous[neighbour] = cell
+                    heapq.heappush(heap, (cost + abs(goal[0] - neighbour[0]) + abs(goal[1] - neighbour[1]), cost, neighbour))
+        return None
+
+    def forget(self, region):
+        """Drops the paths cached for a region."""
+        self.regions.pop(region, None)
+
+    def log_statistics(self):
+        """Writes the cache statistics to the log file."""
+        logger.info(self, "{hits} cached paths, {reused} reused, {searches} searches".format(
+            hits=self.hits, reused=self.reused, searches=self.searches))
+
+
+def initialize(config):
+    """Initializes the pathfinder."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        try:
+            _INSTANCE = Pathfinder(config)
+        except Exception as ex:
+            logger.exception("pathfinding", "Failed to initialize the pathfinder", ex)
+            return False
+    return True
+
+def find_path(region, grid, start, goal):
+    """Returns the cells to walk through from start to goal in the given region, or None."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        return None
+    return _INSTANCE.find_path(region, grid, start, goal)
+
+def forget(region):
+    """Drops the paths cached for a region."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.forget(region)
+
+def log_statistics():
+    """Writes the cache statistics to the log file."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.log_statistics()
@@ -5,6 +5,7 @@ import core
 import gameconfig
 import logger
 import event_manager
+import timer_manager
 from objects import Object
 
 class Player(Object):
@@ -18,6 +19,7 @@ class Player(Object):
     maxMagic = None
     maxHealth = None
     direction = constants.DIRECTION_NORTH
+    staminaTimer = None
 
     def __init__(self, name, config):
         super().__init__(name, config)
@@ -26,7 +28,7 @@ class Player(Object):
         self.maxMagic = gameconfig.get_value(config, "magic", int, {})
         self.maxStamina = gameconfig.get_value(config, "stamina", int, {"minValue": 1})
         self.maxDistance = gameconfig.get_value(config, "max-distance", float, {"defaultValue": 5})
-        self.halth = self.maxHealth
+        self.health = self.maxHealth
         self.magic = 0
         self.staminaRecoveryTime = gameconfig.get_value(config, "stamina-recovery-time", int, {"defaultValue": constants.CHARACTER_STAMINA_RECOVERY_TIME})
         self.staminaDecrement = gameconfig.get_value(config, "stamina-decrement", int, {"defaultValue": 1})
@@ -108,6 +110,17 @@ class Player(Object):
         pass # nothing to do here.
     def event_did_character_move(self, evt):
         self.stamina -= self.staminaDecrement
+        self.startStaminaRecovery()
+
+    def event_character_attacked(self, evt):
+        if evt.target is not self or self.health <= 0:
+            return
+        self.health = max(0, self.health - evt.damage)
+        logger.info(self, "Attacked by {attacker}: health {health}".format(attacker=evt.attacker, health=self.health))
+        event_manager.post(event_manager.CHARACTER_ATTRIBUTE_CHANGE, {"attribute": "health",
+                                                                      "value": self.health})
+        if self.health == 0:
+            event_manager.post(event_manager.CHARACTER_DIED, {"obj": self})
         
          
     def event_character_spawn(self, evt):
@@ -120,17 +133,24 @@ class Player(Object):
                 
                                         
 
-    def event_scene_interval_tick(self, evt):
-        if self.stamina == self.maxStamina:
-            return True
+    def startStaminaRecovery(self):
+        """Schedules stamina recovery, unless it is already running or stamina is full."""
+        if self.staminaTimer is not None or self.stamina >= self.maxStamina:
+            return
+        self.staminaTicks = core.get_current_ticks()
+        self.staminaTimer = timer_manager.call_every(self.staminaRecoveryTime, self.recoverStamina)
+
+    def recoverStamina(self):
+        """Called every staminaRecoveryTime milliseconds until stamina is recovered."""
         delta = core.get_current_ticks() - self.staminaTicks
-        if delta > self.staminaRecoveryTime:
-            self.stamina += self.staminaIncrement
-            logger.info(self, "Recovering stamina {s}%, delta+{delta}".format(s=(self.stamina / self.maxStamina * 100), delta=delta))
-            self.staminaTicks = core.get_current_ticks()
+        self.stamina += self.staminaIncrement
+        logger.info(self, "Recovering stamina {s}%, delta+{delta}".format(s=(self.stamina / self.maxStamina * 100), delta=delta))
+        self.staminaTicks = core.get_current_ticks()
         if self.stamina >= self.maxStamina:
             logger.info(self, "Stamina recovered")
             self.stamina = self.maxStamina
+            self.staminaTimer.cancel()
+            self.staminaTimer = None
 
     
     def event_walk_start(self, evt):
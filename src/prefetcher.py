@@ -0,0 +1,226 @@
+"""
+prefetcher
+
+This module creates, ahead of time, the map regions the player may walk into next. Starting from
+the active scene, it follows the region-link graph up to a configurable depth and, on a worker
+thread, reads and parses the configuration of the linked scenes. The scenes are then built from
+these configurations on the main thread, one per poll, and handed over to the scene manager which
+creates the objects placed in them, so that crossing a region border does not stall the frame.
+Opening music streams and updating the audio bookkeeping is left to the main thread.
+"""
+
+# *-* coding: utf8 *-*
+
+import os
+import queue
+import threading
+
+import audio
+import constants
+import gameconfig
+import logger
+import timer_manager
+
+# Global prefetcher instance
+_INSTANCE = None
+
+
+class Prefetcher():
+    """Reads the configuration of the scenes linked to the active one on a worker thread."""
+
+    def __init__(self, config):
+        self.depth = gameconfig.get_value(config, "depth", int, {"defaultValue": constants.PREFETCH_DEPTH, "minValue": 0})
+        # the memory cap is given in kilobytes.
+        self.memory_cap = gameconfig.get_value(config, "memory-cap", int, {"defaultValue": constants.PREFETCH_MEMORY_CAP, "minValue": 0}) * 1024
+        self.memory_used = 0
+        self.generation = 0
+        self.building = None
+        self.ready = {}
+        self.condition = threading.Condition()
+        self.jobs = queue.Queue()
+        self.worker = None
+        if self.depth > 0:
+            self.worker = threading.Thread(target=self.run, name="prefetcher", daemon=True)
+            self.worker.start()
+            self.timer = timer_manager.call_every(constants.PREFETCH_POLL_INTERVAL, self.update)
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "prefetcher"
+
+    def schedule(self, my_scene):
+        """Prefetches the regions linked to the given scene, dropping any pending prefetch."""
+        if self.worker is None:
+            return
+        links = getattr(my_scene, "regionLinks", None)
+        if links is None:
+            return
+        with self.condition:
+            self.generation += 1
+            generation = self.generation
+        self.jobs.put((generation, my_scene.name, get_link_targets(links)))
+
+    def run(self):
+        """Worker thread: walks the region-link graph breadth first, reading unknown scenes."""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            generation, root, targets = job
+            self.memory_used = 0
+            visited = set([root])
+            level = targets
+            for depth in range(self.depth):
+                next_level = []
+                for name in level:
+                    if generation != self.generation:
+                        # the player moved on: a newer job is waiting.
+                        break
+                    if name in visited:
+                        continue
+                    visited.add(name)
+                    links = self.prefetch(name)
+                    if links is not None:
+                        next_level.extend(get_link_targets(links))
+                level = next_level
+
+    def prefetch(self, name):
+        """Reads the configuration of the given scene if needed. Returns its region-links, or None
+to stop walking this way."""
+        import scene_manager
+
+        my_scene = scene_manager.get_created_scene(name)
+        if my_scene is not None:
+            return getattr(my_scene, "regionLinks", None)
+        with self.condition:
+            config = self.ready.get(name, None)
+        if config is not None:
+            return config.get("region-links", None)
+        entry = scene_manager.get_manifest_entry(name)
+        if entry is None:
+            logger.warning(self, "Region link to unknown scene {name}".format(name=name))
+            return None
+        with self.condition:
+            self.building = name
+        try:
+            config = scene_manager.get_scene_config(entry)
+        finally:
+            with self.condition:
+                self.building = None
+                self.condition.notify_all()
+        if config is None:
+            return None
+        cost = self.estimate_cost(config)
+        if self.memory_used + cost > self.memory_cap:
+            logger.debug(self, "Not prefetching {name}: memory cap reached".format(name=name))
+            return None
+        with self.condition:
+            self.ready[name] = config
+        self.memory_used += cost
+        logger.debug(self, "Prefetched {name} ({cost} bytes)".format(name=name, cost=cost))
+        return config.get("region-links", None)
+
+    def estimate_cost(self, config):
+        """Returns the size of the music files the given scene configuration would open."""
+        cost = 0
+        for music in config.get("musics", []):
+            if audio.isMusicLoaded(music.get("name", None)):
+                continue
+            try:
+                cost += os.path.getsize(os.path.join("data", "musics", music.get("file", "")))
+            except OSError:
+                pass
+        return cost
+
+    def take(self, name):
+        """Builds the prefetched scene of the given name, waiting for its configuration if it is
+being read. Main thread only."""
+        import scene_manager
+
+        with self.condition:
+            while self.building == name:
+                self.condition.wait()
+            config = self.ready.pop(name, None)
+        if config is None:
+            return None
+        return scene_manager.create_scene(config)
+
+    def discard(self, name):
+        """Drops the prefetched scene of the given name, if any."""
+        with self.condition:
+            while self.building == name:
+                self.condition.wait()
+            self.ready.pop(name, None)
+
+    def update(self):
+        """Builds one prefetched scene and hands it over to the scene manager, which creates its
+objects. Scenes are built one per poll to spread their cost over several frames."""
+        import scene_manager
+
+        with self.condition:
+            if len(self.ready) == 0:
+                return
+            name = next(iter(self.ready))
+            config = self.ready.pop(name)
+        if scene_manager.get_created_scene(name) is not None:
+            return
+        my_scene = scene_manager.create_scene(config)
+        if my_scene is not None:
+            scene_manager.add_prefetched_scene(my_scene)
+
+    def terminate(self):
+        """Stops the worker thread."""
+        if self.worker is None:
+            return
+        timer_manager.cancel(self.timer)
+        self.generation += 1
+        self.jobs.put(None)
+        self.worker.join()
+        self.worker = None
+
+
+def get_link_targets(links):
+    """Returns the scene names the given region-links lead to."""
+    return [link.get("link", "").split(".")[0] for link in links]
+
+def initialize(config):
+    """Initializes the prefetcher."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        try:
+            _INSTANCE = Prefetcher(config)
+        except Exception as ex:
+            logger.exception("prefetcher", "Failed to initialize the prefetcher", ex)
+            return False
+    return True
+
+def schedule(my_scene):
+    """Prefetches the regions linked to the given scene."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.schedule(my_scene)
+
+def take(name):
+    """Returns the prefetched scene of the given name, if any."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        return None
+    return _INSTANCE.take(name)
+
+def discard(name):
+    """Drops the prefetched scene of the given name, if any."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.discard(name)
+
+def terminate():
+    """Stops the prefetcher."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.terminate()
+    _INSTANCE = None
@@ -0,0 +1,200 @@
+"""
+profiler
+
+This module measures how each frame of the main loop splits its time between subsystems (input,
+event dispatching, timers, audio, speech, logging) and between event handlers. Timings go into
+fixed-size histograms, and the breakdown of the slowest frames is kept to be dumped as an indented,
+flame-style report. Profiling is off by default and can be toggled at runtime.
+"""
+
+# *-* coding: utf8 *-*
+
+import heapq
+import time
+
+import constants
+
+# Fast check for callers: nothing is measured while this is False.
+ENABLED = False
+
+_INSTANCE = None
+
+
+class Histogram():
+    """Distribution of durations in power-of-two microsecond buckets: bucket i holds durations
+from 2^(i-1) (included) to 2^i microseconds."""
+
+    def __init__(self):
+        self.buckets = [0] * constants.PROFILER_HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        """Records a duration, in seconds."""
+        index = min(int(duration * 1000000).bit_length(), len(self.buckets) - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, value):
+        """Returns the upper bound (in seconds) of the bucket holding the given percentile."""
+        threshold = self.count * value / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= threshold and count > 0:
+                return (1 << index) / 1000000
+        return self.max
+
+
+class Profiler():
+    """Collects per-section histograms and the breakdown of the slowest frames."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clears every measure."""
+        self.sections = {}
+        self.frames = 0
+        self.slowest = []
+        self.entries = []
+        self.depth = 0
+        self.frame_start = None
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "profiler"
+
+    def begin_frame(self):
+        """Starts measuring a frame."""
+        self.entries = []
+        self.depth = 0
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Ends the current frame, keeping its breakdown if it is among the slowest ones."""
+        if self.frame_start is None:
+            return
+        duration = time.perf_counter() - self.frame_start
+        self.frame_start = None
+        self.frames += 1
+        self.record("frame", duration)
+        frame = (duration, self.frames, self.entries)
+        if len(self.slowest) < constants.PROFILER_SLOWEST_FRAMES:
+            heapq.heappush(self.slowest, frame)
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, frame)
+
+    def start(self):
+        """Starts measuring a nested section; returns the value to give to stop()."""
+        self.depth += 1
+        return time.perf_counter()
+
+    def stop(self, name, start):
+        """Ends the section started by start(), recording its duration under the given name."""
+        duration = time.perf_counter() - start
+        self.depth -= 1
+        self.record(name, duration)
+        if self.frame_start is not None:
+            # entries are appended when sections end: the report sorts them back by start time.
+            self.entries.append((start, self.depth, name, duration))
+
+    def record(self, name, duration):
+        """Adds a duration (in seconds) to the histogram of the given section."""
+        histogram = self.sections.get(name, None)
+        if histogram is None:
+            histogram = Histogram()
+            self.sections[name] = histogram
+        histogram.add(duration)
+
+    def report(self):
+        """Returns the report as a list of lines."""
+        lines = ["{frames} frames profiled".format(frames=self.frames)]
+        lines.append("{name:<60} {count:>8} {avg:>9} {p50:>9} {p99:>9} {max:>9}".format(
+            name="section", count="count", avg="avg(ms)", p50="p50(ms)", p99="p99(ms)", max="max(ms)"))
+        for name, histogram in sorted(self.sections.items(), key=lambda item: -item[1].total):
+            lines.append("{name:<60} {count:>8} {avg:>9.3f} {p50:>9.3f} {p99:>9.3f} {max:>9.3f}".format(
+                name=name, count=histogram.count, avg=histogram.total / histogram.count * 1000,
+                p50=histogram.percentile(50) * 1000, p99=histogram.percentile(99) * 1000,
+                max=histogram.max * 1000))
+        for duration, index, entries in sorted(self.slowest, reverse=True):
+            lines.append("frame {index}: {duration:.3f}ms".format(index=index, duration=duration * 1000))
+            for start, depth, name, section_duration in sorted(entries, key=lambda entry: (entry[0], entry[1])):
+                lines.append("{indent}{name} {duration:.3f}ms".format(
+                    indent="  " * (depth + 1), name=name, duration=section_duration * 1000))
+        return lines
+
+
+def _get_instance():
+    """Returns the profiler, creating it if needed."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        _INSTANCE = Profiler()
+    return _INSTANCE
+
+def enable():
+    """Starts profiling."""
+    global ENABLED
+
+    _get_instance()
+    ENABLED = True
+
+def disable():
+    """Stops profiling; collected measures are kept until reset()."""
+    global ENABLED
+
+    ENABLED = False
+
+def toggle():
+    """Toggles profiling. Returns whether profiling is now enabled."""
+    if ENABLED:
+        disable()
+    else:
+        enable()
+    return ENABLED
+
+def reset():
+    """Clears collected measures."""
+    _get_instance().reset()
+
+def begin_frame():
+    """Starts measuring a frame."""
+    _INSTANCE.begin_frame()
+
+def end_frame():
+    """Ends the current frame."""
+    _INSTANCE.end_frame()
+
+def start():
+    """Starts measuring a section; returns the value to give to stop()."""
+    return _INSTANCE.start()
+
+def stop(name, start):
+    """Ends a section started by start()."""
+    _INSTANCE.stop(name, start)
+
+def record(name, duration):
+    """Adds a duration (in seconds) to the given section, outside of the frame breakdown."""
+    _INSTANCE.record(name, duration)
+
+def dump(file=constants.PROFILER_REPORT_FILE):
+    """Writes the report to the log and to the given file."""
+    import logger
+
+    if _INSTANCE is None or _INSTANCE.frames == 0:
+        return False
+    lines = _INSTANCE.report()
+    for line in lines:
+        logger.info(_INSTANCE, line)
+    try:
+        with open(file, "w", encoding="utf-8") as report:
+            report.write("\n".join(lines) + "\n")
+    except Exception as ex:
+        logger.error(_INSTANCE, "Failed to write {file}: {exception}".format(file=file, exception=ex))
+        return False
+    return True
@@ -0,0 +1,233 @@
+"""
+replay
+
+This module records the player's input into a session file, replays such a session
+deterministically and traces what the engine does meanwhile (dispatched events, sounds and speech),
+so that the same session can be compared across builds.
+
+A session file contains JSON lines: a header holding the random seed and the start scene, followed
+by one line per key press or release, stamped with the game time (see core.get_current_ticks), and
+a last line marking the time the recording stopped.
+"""
+
+# *-* coding: utf8 *-*
+
+import json
+import random
+import sys
+
+import pygame
+
+import logger
+
+SESSION_VERSION = 1
+
+# Files configured from the command line, opened by initialize().
+_config = {"record": None, "replay": None, "trace": None}
+_recorder = None
+_replayer = None
+_tracer = None
+
+
+class Recorder():
+    """Writes key presses and releases to a session file."""
+
+    def __init__(self, file, seed, start_scene):
+        self.file = open(file, "w", encoding="utf-8")
+        self.count = 0
+        self.write({"version": SESSION_VERSION, "seed": seed, "start-scene": start_scene})
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "Recorder"
+
+    def write(self, entry):
+        """Writes a line to the session file."""
+        self.file.write(json.dumps(entry) + "\n")
+
+    def record(self, tick, event, action, pressed):
+        """Records a key event and the action it was mapped to."""
+        self.write({"tick": tick, "type": "down" if pressed else "up", "key": event.key,
+                    "mod": event.mod, "action": action})
+        self.count += 1
+
+    def close(self, tick):
+        """Marks the end of the session and closes the session file."""
+        self.write({"tick": tick, "type": "end"})
+        logger.info(self, "{count} input events recorded".format(count=self.count))
+        self.file.close()
+
+
+class Replayer():
+    """Feeds the key events of a session file to the scene manager at their recorded game time."""
+
+    def __init__(self, file):
+        with open(file, encoding="utf-8") as session:
+            lines = [json.loads(line) for line in session if line.strip() != ""]
+        if len(lines) == 0 or lines[0].get("version", None) != SESSION_VERSION:
+            raise RuntimeError("{file} is not a session file".format(file=file))
+        self.header = lines[0]
+        self.inputs = lines[1:]
+        self.index = 0
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "Replayer"
+
+    def get_seed(self):
+        """Returns the random seed used by the recorded session."""
+        return self.header["seed"]
+
+    def update(self, now):
+        """Replays every input recorded up to the given game time. Returns False once the session
+is over."""
+        import scene_manager
+
+        while self.index < len(self.inputs) and self.inputs[self.index]["tick"] <= now:
+            entry = self.inputs[self.index]
+            self.index += 1
+            if entry["type"] == "end":
+                self.index = len(self.inputs)
+                break
+            pressed = entry["type"] == "down"
+            event = pygame.event.Event(pygame.KEYDOWN if pressed else pygame.KEYUP,
+                                       key=entry["key"], mod=entry["mod"])
+            if pressed:
+                scene_manager.on_key_down(event)
+            else:
+                scene_manager.on_key_up(event)
+        return self.index < len(self.inputs)
+
+
+class Tracer():
+    """Writes dispatched events, sound and speech calls to a trace file."""
+
+    def __init__(self, file):
+        self.file = open(file, "w", encoding="utf-8")
+        self.counts = {}
+        self.blocks = sys.getallocatedblocks()
+        self.install()
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "Tracer"
+
+    def install(self):
+        """Wraps the sound and speech module functions so that their calls are traced."""
+        import audio
+        import event_manager
+        import speech
+
+        event_manager.set_trace(self.on_event)
+        for module, name in [(audio, "play"), (audio, "playMusic"), (audio, "stopMusic"),
+                             (speech, "speak"), (speech, "cancelSpeech")]:
+            setattr(module, name, self.wrap(module.__name__, name, getattr(module, name)))
+
+    def wrap(self, category, name, function):
+        """Returns function, tracing its calls."""
+        def traced(*args, **kwargs):
+            self.trace(category, name, ", ".join([repr(arg) for arg in args]
+                                                 + ["%s=%r" % item for item in kwargs.items()]))
+            return function(*args, **kwargs)
+        return traced
+
+    def on_event(self, event):
+        """Traces a dispatched event."""
+        import event_manager
+
+        self.trace("event", event_manager.EVENT_NAMES.get(event.type, str(event.type)), repr(event.data))
+
+    def trace(self, category, name, details):
+        """Writes a trace line, stamped with the game time."""
+        import core
+
+        key = "%s.%s" % (category, name)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.file.write("{tick} {key} {details}\n".format(tick=core.get_current_ticks(), key=key, details=details))
+
+    def close(self):
+        """Writes the summary (call counts, frame times, event statistics) and closes the trace."""
+        import core
+        import event_manager
+
+        self.file.write("# summary\n")
+        for key, count in sorted(self.counts.items()):
+            self.file.write("# {key}: {count}\n".format(key=key, count=count))
+        self.file.write("# frames: {stats}\n".format(stats=json.dumps(core.get_frame_statistics())))
+        stats = event_manager.get_statistics()
+        self.file.write("# dispatched: {count}, queue high-water mark: {hw}\n".format(
+            count=stats["dispatched"], hw=stats["high_water"]))
+        self.file.write("# allocated blocks: {start} at start, {end} at exit\n".format(
+            start=self.blocks, end=sys.getallocatedblocks()))
+        event_manager.set_trace(None)
+        self.file.close()
+
+
+def configure(record=None, replay=None, trace=None):
+    """Sets the session file to record to or to replay, and the trace file."""
+    _config["record"] = record
+    _config["replay"] = replay
+    _config["trace"] = trace
+
+def initialize(start_scene):
+    """Opens the configured files and seeds the random generator used by scenes, either with the
+seed of the replayed session or with a new one."""
+    global _recorder
+    global _replayer
+    global _tracer
+    import scene
+
+    seed = random.randrange(2 ** 32)
+    try:
+        if _config["replay"] is not None:
+            _replayer = Replayer(_config["replay"])
+            seed = _replayer.get_seed()
+            logger.info(_replayer, "Replaying {file}, seed {seed}".format(file=_config["replay"], seed=seed))
+        if _config["record"] is not None:
+            _recorder = Recorder(_config["record"], seed, start_scene)
+            logger.info(_recorder, "Recording to {file}, seed {seed}".format(file=_config["record"], seed=seed))
+        if _config["trace"] is not None:
+            _tracer = Tracer(_config["trace"])
+    except Exception as ex:
+        logger.exception("replay", "Failed to initialize session replay", ex)
+        return False
+    scene.seed_random(seed)
+    return True
+
+def record(event, action, pressed):
+    """Records a key event, if recording."""
+    if _recorder is not None:
+        import core
+
+        _recorder.record(core.get_current_ticks(), event, action, pressed)
+
+def is_recording():
+    """Returns whether a session is being recorded."""
+    return _recorder is not None
+
+def is_replaying():
+    """Returns whether a session is being replayed."""
+    return _replayer is not None
+
+def update(now):
+    """Replays the inputs due at the given game time. Returns False once the replayed session is
+over."""
+    if _replayer is None:
+        return True
+    return _replayer.update(now)
+
+def terminate():
+    """Closes the session and trace files."""
+    global _recorder
+    global _replayer
+    global _tracer
+
+    if _recorder is not None:
+        import core
+
+        _recorder.close(core.get_current_ticks())
+    if _tracer is not None:
+        _tracer.close()
+    _recorder = None
+    _replayer = None
+    _tracer = None
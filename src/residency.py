@@ -0,0 +1,161 @@
+"""
+residency
+
+This module bounds the memory used by created scenes. It keeps the scenes in least recently visited
+order along with an estimate of their cost (their Python objects, the objects placed in them), and
+adds the memory FMOD reports for the loaded music streams. When the total goes over the configured
+budget, the scenes prefetched but not visited yet are unloaded first, oldest first, then the least
+recently visited scenes that are not in use: they release their objects and their musics, shared
+musics being freed only once no scene uses them anymore. Unloaded scenes are created again from the
+scene manifest when the player comes back. Prefetching a scene never unloads a visited one.
+"""
+
+# *-* coding: utf8 *-*
+
+import collections
+import sys
+
+import audio
+import constants
+import gameconfig
+import logger
+
+# Global residency manager instance
+_INSTANCE = None
+
+
+class ResidencyManager():
+    """Tracks created scenes in least recently visited order."""
+
+    def __init__(self, config):
+        # the budget is given in kilobytes.
+        self.budget = gameconfig.get_value(config, "memory-budget", int, {"defaultValue": constants.RESIDENCY_MEMORY_BUDGET, "minValue": 0}) * 1024
+        self.scenes = collections.OrderedDict()
+        # scenes created by the prefetcher and not visited yet, oldest first.
+        self.prefetched = collections.OrderedDict()
+        self.evicted = 0
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "residency"
+
+    def touch(self, my_scene):
+        """Marks the given scene as the most recently visited one, then enforces the budget."""
+        self.prefetched.pop(my_scene.name, None)
+        self.scenes[my_scene.name] = estimate_scene_size(my_scene)
+        self.scenes.move_to_end(my_scene.name)
+        self.enforce()
+
+    def add_prefetched(self, my_scene):
+        """Tracks a scene created ahead of time, then makes room for it among the other prefetched
+scenes only."""
+        if my_scene.name in self.scenes:
+            return
+        self.prefetched[my_scene.name] = estimate_scene_size(my_scene)
+        self.prefetched.move_to_end(my_scene.name)
+        self.enforce(False)
+
+    def forget(self, name):
+        """Stops tracking the given scene."""
+        self.scenes.pop(name, None)
+        self.prefetched.pop(name, None)
+
+    def get_memory_used(self):
+        """Returns the estimated memory used by the tracked scenes and the loaded musics, in bytes."""
+        return sum(self.scenes.values()) + sum(self.prefetched.values()) + audio.getMusicMemory()
+
+    def enforce(self, visited=True):
+        """Unloads the prefetched scenes, then the least recently visited ones if visited is True,
+until the memory used fits in the budget."""
+        import scene_manager
+
+        if self.budget == 0:
+            return
+        used = self.get_memory_used()
+        if used <= self.budget:
+            return
+        candidates = [(self.prefetched, name) for name in self.prefetched]
+        if visited:
+            candidates.extend([(self.scenes, name) for name in self.scenes])
+        for scenes, name in candidates:
+            if scene_manager.is_scene_in_use(name):
+                continue
+            logger.info(self, "Unloading {name} ({used} bytes used, budget {budget})".format(name=name, used=used, budget=self.budget))
+            scenes.pop(name)
+            scene_manager.unload_scene(name)
+            self.evicted += 1
+            used = self.get_memory_used()
+            if used <= self.budget:
+                return
+        if visited:
+            logger.warning(self, "{used} bytes used by scenes in use, over the budget of {budget}".format(used=used, budget=self.budget))
+
+
+def estimate_size(value, seen=None):
+    """Returns the size of the given configuration value (dicts, lists and scalars), in bytes.
+Other objects are only counted once, shallowly."""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key, seen) + estimate_size(item, seen)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item, seen)
+    return size
+
+def estimate_scene_size(my_scene):
+    """Returns the size of a scene: its attributes, its configuration and its objects."""
+    seen = set([id(my_scene)])
+    size = sys.getsizeof(my_scene) + estimate_size(vars(my_scene), seen)
+    get_objects = getattr(my_scene, "getObjects", None)
+    if get_objects is not None:
+        # objects themselves are counted along with the scene attributes.
+        for obj in get_objects():
+            size += estimate_size(vars(obj), seen)
+    return size
+
+def initialize(config):
+    """Initializes the residency manager."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        try:
+            _INSTANCE = ResidencyManager(config)
+        except Exception as ex:
+            logger.exception("residency", "Failed to initialize the residency manager", ex)
+            return False
+    return True
+
+def touch(my_scene):
+    """Marks the given scene as visited."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.touch(my_scene)
+
+def add_prefetched(my_scene):
+    """Tracks a scene created ahead of time, not visited yet."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.add_prefetched(my_scene)
+
+def forget(name):
+    """Stops tracking the given scene."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.forget(name)
+
+def get_memory_used():
+    """Returns the estimated memory used by scenes, in bytes."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        return 0
+    return _INSTANCE.get_memory_used()
@@ -1,7 +1,9 @@
 # *-* coding: utf-8 *-*
 
+import ai_manager
 import constants
 import core
+import echo
 import event_manager
 import inputHandler
 import speech
@@ -9,7 +11,31 @@ import logger
 import audio
 import gameconfig
 
+import concurrent.futures
 import math
+import random
+
+import objects
+import occupancy
+import pathfinding
+import spatial_index
+
+# Names of the directions a path goes to, spoken when guiding the player.
+DIRECTION_NAMES = {
+    (0, 1): "le nord",
+    (0, -1): "le sud",
+    (1, 0): "l'est",
+    (-1, 0): "l'ouest"
+}
+
+# Random generator used by scenes, seeded by seed_random() so that sessions can be replayed.
+_random = random.Random()
+# Worker thread reading world map chunks ahead of time, see getChunkReader().
+_chunkReader = None
+
+def seed_random(seed):
+    """Seeds the random generator used by scenes."""
+    _random.seed(seed)
 
 class Scene():
     """Defines a scene representing a particular in-game behavior."""
@@ -38,10 +64,13 @@ class Scene():
             self.nextScene = gameconfig.get_value(config, "nextScene", str, {"mandatory": False, "defaultValue": ""})
             
             self.musics = gameconfig.get_value(config, "musics", list, {"defaultValue": []})
+            self.loadedMusics = []
             for music in self.musics:
                 music["scene"] = self
                 if audio.loadMusic(music) is False:
                     logger.warning(self, "Music {name} not loaded".format(name=music.get("name", "unknown")))
+                else:
+                    self.loadedMusics.append(music["name"])
                     
 
     def __repr__(self):
@@ -103,6 +132,58 @@ class Scene():
 
     def get_musics(self):
         return self.musics
+
+    def prefetch(self):
+        """Called on the main thread when this scene was built ahead of time, before its first
+        activation."""
+        pass
+
+    def reload(self, config):
+        """Applies a modified configuration to this scene, keeping its state (focus, playing
+        musics)."""
+        speechName = gameconfig.get_value(config, "speech-name", str, {"defaultValue": self.name})
+        speechDescription = gameconfig.get_value(config, "speech-description", str, {"mandatory": False, "defaultValue": ""})
+        nextScene = gameconfig.get_value(config, "nextScene", str, {"mandatory": False, "defaultValue": ""})
+        musics = gameconfig.get_value(config, "musics", list, {"defaultValue": []})
+        self.config = config
+        self.activateSound = config.get("enterSound", None)
+        self.deactivateSound = config.get("leaveSound", None)
+        self.links = config.get("links", {})
+        self.speechName = speechName
+        self.speechDescription = speechDescription
+        self.nextScene = nextScene
+        self.reloadMusics(musics)
+
+    def reloadMusics(self, musics):
+        """Loads the musics added to this scene and releases the removed ones; the others keep
+        playing."""
+        previous = set(self.loadedMusics)
+        loaded = []
+        for music in musics:
+            music["scene"] = self
+            name = music.get("name", None)
+            if name in previous:
+                previous.discard(name)
+                loaded.append(name)
+                continue
+            if audio.loadMusic(music) is False:
+                logger.warning(self, "Music {name} not loaded".format(name=name))
+                continue
+            loaded.append(name)
+            if self.focused:
+                audio.playMusic(name)
+        for name in previous:
+            if self.focused:
+                audio.stopMusic(name)
+            audio.releaseMusic(name)
+        self.musics = musics
+        self.loadedMusics = loaded
+
+    def unload(self):
+        """Releases the resources of this scene before it is dropped."""
+        for name in getattr(self, "loadedMusics", []):
+            audio.releaseMusic(name)
+        self.loadedMusics = []
         
 
 
@@ -122,6 +203,18 @@ Note: This event is not called when the scene is not active.
                 msg = "Invalid interval value {value}; has to be integer, minimum is {minValue}".format(value=self._interval, minValue=constants.SCENE_MININUM_INTERVAL)
                 logger.error(self, msg)
                 raise RuntimeError(msg)
+    def reload(self, config):
+        interval = config.get("interval", None)
+        if interval is None or isinstance(interval, int) is False or interval < constants.SCENE_MININUM_INTERVAL:
+            raise RuntimeError("Invalid interval value {value}; has to be integer, minimum is {minValue}".format(value=interval, minValue=constants.SCENE_MININUM_INTERVAL))
+        super().reload(config)
+        # a new interval is used from the next activation.
+        self._interval = interval
+
+    def get_interval(self):
+        """Returns the interval, in milliseconds"""
+        return self._interval
+
     def set_next_tick(self, tick):
         """Updates the next tick"""
         self._next_tick = tick
@@ -132,9 +225,9 @@ Note: This event is not called when the scene is not active.
 
     def activate(self, silent=False, params=None):
         super().activate(silent, params)
-        event_manager.post(event_manager.SCENE_INTERVAL_ACTIVATE, {"scene": self})
+        event_manager.post(event_manager.SCENE_INTERVAL_ACTIVATE, event_manager.SceneData(self))
     def deactivate(self, silent=False):
-        event_manager.post(event_manager.SCENE_INTERVAL_DEACTIVATE, {"scene": self})
+        event_manager.post(event_manager.SCENE_INTERVAL_DEACTIVATE, event_manager.SceneData(self))
         super().deactivate(silent)
         
 class MenuScene(Scene):
@@ -184,6 +277,27 @@ possible to implement option selection."""
         self.cancelSound = config.get('cancel-sound', None)
         self.cancelSoundVolume = config.get('cancel-sound-volume', 0.8)
         self.useStereo = config.get('use-stereo', True)
+
+    def reload(self, config):
+        choices = config.get("choices", None)
+        if choices is None or len(choices) == 0:
+            raise RuntimeError("No menu items provided.")
+        super().reload(config)
+        self.choices = choices
+        self.default = config.get('default-choice', 0)
+        if self.default <= 0 or self.default > len(self.choices):
+            self.default = 0
+        self.idx = min(self.idx, len(self.choices) - 1)
+        self.selectedIdx = min(self.selectedIdx, len(self.choices) - 1)
+        self.speakTitle = config.get("speak-title", True)
+        self.title = config.get('title', self.title)
+        self.selectSound = config.get('select-sound', None)
+        self.selectSoundVolume = config.get("select-sound-volume", constants.AUDIO_FX_VOLUME)
+        self.validateSound = config.get('validate-sound', None)
+        self.validateSoundVolume = config.get('validate-sound-volume', constants.AUDIO_FX_VOLUME)
+        self.cancelSound = config.get('cancel-sound', None)
+        self.cancelSoundVolume = config.get('cancel-sound-volume', 0.8)
+        self.useStereo = config.get('use-stereo', True)
         
                 
 
@@ -282,6 +396,16 @@ class StoryTextScene(IntervalScene):
         
         if len(self.story) == 0:
             raise RuntimeError("StoryText scene with empty story")
+
+    def reload(self, config):
+        story = config.get('story', [])
+        if len(story) == 0:
+            raise RuntimeError("StoryText scene with empty story")
+        super().reload(config)
+        self.story = story
+        self.messageWriteSound = config.get('message-write-sound', None)
+        self.messageWriteSoundVolume = config.get('message-write-sound-volume', 0.8)
+        self.idx = min(getattr(self, "idx", 0), len(self.story) - 1)
         
     def activate(self, silent=False, params=None):
         self.idx = 0
@@ -359,9 +483,12 @@ class MapRegionScene(IntervalScene):
         self.player = scene_manager.get_player()
         self.height = gameconfig.get_value(config, "height", int, {"minValue": 1})
         self.width = gameconfig.get_value(config, "width", int, {"minValue": 1})
-        self.regionLinks = gameconfig.get_value(config, "region-links", list, {"elements": 1})
+        self.regionLinks = gameconfig.get_value(config, "region-links", list, {"elements": 1, "defaultValue": []})
+        self.linkCells, self.entryPositions = self.compileRegionLinks(self.regionLinks, self.width, self.height)
         self.objectConfigs = gameconfig.get_value(config, "objects", list, {"defaultValue": []})
         self.walkSounds = gameconfig.get_value(config, "walking", list, {"elements": 1, "defaultValue": []})
+        self.walls = gameconfig.get_value(config, "walls", list, {"defaultValue": []})
+        self.obstacles = gameconfig.get_value(config, "obstacles", list, {"defaultValue": []})
         cameraModeStr = gameconfig.get_value(config, "default-camera-mode", str, {"defaultValue": "top"})
         if cameraModeStr not in ["top", "subjective"]:
             raise RuntimeError("The camera mode has to be set either to 'top' or 'subjective'.")
@@ -373,32 +500,227 @@ class MapRegionScene(IntervalScene):
             raise RuntimeError("Unknown camera mode {mode}".format(mode=cameraModeStr))
         
         self.objects = []
+        self.enemies = []
+        self.objectIndex = spatial_index.SpatialIndex(self.width, self.height)
+        self.occupancy = self.buildOccupancy()
+        self.objectsLoaded = False
         
     def getLogName(self):
         return "MapRegionScene(%s)" % self.name
 
-    def loadObjects(self):
+    def prefetch(self):
+        if self.loadObjects() is False:
+            logger.warning(self, "Some objects failed to load")
+
+    def reload(self, config):
+        config["interval"] = 40
+        height = gameconfig.get_value(config, "height", int, {"minValue": 1})
+        width = gameconfig.get_value(config, "width", int, {"minValue": 1})
+        regionLinks = gameconfig.get_value(config, "region-links", list, {"elements": 1, "defaultValue": []})
+        objectConfigs = gameconfig.get_value(config, "objects", list, {"defaultValue": []})
+        walkSounds = gameconfig.get_value(config, "walking", list, {"elements": 1, "defaultValue": []})
+        walls = gameconfig.get_value(config, "walls", list, {"defaultValue": []})
+        obstacles = gameconfig.get_value(config, "obstacles", list, {"defaultValue": []})
+        linkCells, entryPositions = self.compileRegionLinks(regionLinks, width, height)
+        super().reload(config)
+        self.height = height
+        self.width = width
+        self.regionLinks = regionLinks
+        self.linkCells = linkCells
+        self.entryPositions = entryPositions
+        self.walkSounds = walkSounds
+        self.walls = walls
+        self.obstacles = obstacles
+        previousConfigs = self.objectConfigs
+        self.objectConfigs = objectConfigs
+        if self.objectIndex.width != width or self.objectIndex.height != height:
+            self.objectIndex = spatial_index.SpatialIndex(width, height)
+            self.objectIndex.rebuild(self.objects)
+        self.occupancy = self.buildOccupancy()
+        for obj in self.objects:
+            self.occupancy.add_object(obj, isinstance(obj, objects.Enemy))
+        if self.playerPosition is not None:
+            # the player stays where they are, unless the region shrank.
+            self.playerPosition = [max(1, min(self.playerPosition[0], self.width - 1)),
+                                   max(1, min(self.playerPosition[1], self.height - 1))]
+        if self.objectsLoaded:
+            self.reloadObjects(previousConfigs)
+
+    def reloadObjects(self, previousConfigs):
+        """Applies the changes between previousConfigs and the current object configurations:
+        moved objects are moved, removed ones are dropped, added and modified ones are created."""
+        import object_manager
+        previous = {}
+        for objConfig in previousConfigs:
+            previous[objConfig.get("name", None)] = objConfig
+        current = {}
+        for obj in self.objects:
+            current[obj.name] = obj
+        objects = []
+        for objConfig in self.objectConfigs:
+            name = objConfig.get("name", None)
+            obj = current.pop(name, None)
+            if obj is not None:
+                oldConfig = previous.get(name, {})
+                if oldConfig == objConfig:
+                    objects.append(obj)
+                    continue
+                if dict(oldConfig, position=None) == dict(objConfig, position=None) and self.isInside(objConfig.get("position", None)):
+                    logger.info(self, "{name} moved to {pos}".format(name=name, pos=objConfig["position"]))
+                    self.moveObject(obj, objConfig["position"])
+                    objects.append(obj)
+                    continue
+                self.unindexObject(obj)
+                object_manager.removeObject(obj)
+            obj = self.createObject(objConfig)
+            if obj:
+                objects.append(obj)
+                self.indexObject(obj)
+        for obj in current.values():
+            logger.info(self, "{name} removed".format(name=obj.name))
+            self.unindexObject(obj)
+            object_manager.removeObject(obj)
+        self.objects = objects
+
+    def compileRegionLinks(self, regionLinks, width, height):
+        """Returns the (x, y) -> (scene, entry) lookup of the cells leading to other regions, and
+        the position the player spawns at when entering through each region-link."""
+        linkCells = {}
+        entryPositions = {}
+        for region in regionLinks:
+            pos = gameconfig.get_value(region, "position", list, {"elements": 4, "mandatory": True})
+            target = parseRegionLink(region)
+            for x in range(min(pos[0], pos[2]), max(pos[0], pos[2]) + 1):
+                for y in range(min(pos[1], pos[3]), max(pos[1], pos[3]) + 1):
+                    linkCells[(x, y)] = target
+            name = region.get("name", None)
+            if name is None:
+                continue
+            if pos[0] == pos[2]:
+                entryPositions[name] = [pos[0] + 1 if pos[0] == 0 else width - 2, pos[1] + int((pos[3] - pos[1]) / 2)]
+            elif pos[1] == pos[3]:
+                entryPositions[name] = [pos[0] + int((pos[2] - pos[0]) / 2), pos[1] + 1 if pos[1] == 0 else height - 2]
+            else:
+                entryPositions[name] = [int(width / 2), int(height / 2)]
+        return linkCells, entryPositions
+
+    def buildOccupancy(self):
+        """Builds the occupancy grid of this region from its walls and obstacles, region-links
+        being carved into the walls."""
+        grid = occupancy.OccupancyGrid(self.width, self.height)
+        for rect in self.walls:
+            grid.fill(rect, occupancy.WALL)
+        for rect in self.obstacles:
+            grid.fill(rect, occupancy.OBSTACLE)
+        for region in self.regionLinks:
+            grid.fill(gameconfig.get_value(region, "position", list, {"elements": 4}), occupancy.FREE)
+        return grid
+
+    def indexObject(self, obj):
+        """Adds an object of this scene to the spatial index and the occupancy grid."""
+        self.objectIndex.insert(obj)
+        agent = isinstance(obj, objects.Enemy)
+        self.occupancy.add_object(obj, agent)
+        if agent:
+            self.enemies.append(obj)
+
+    def unindexObject(self, obj):
+        """Removes an object of this scene from the spatial index and the occupancy grid."""
+        self.objectIndex.remove(obj)
+        self.occupancy.remove_object(obj)
+        if obj in self.enemies:
+            self.enemies.remove(obj)
+
+    def getEnemies(self):
+        """Returns the enemies of this scene, run by the ai_manager while it is active."""
+        return self.enemies
+
+    def findPath(self, start, goal):
+        """Returns the cells to walk through from start to goal in this region, or None if goal
+        cannot be reached."""
+        return pathfinding.find_path(self.name, self.occupancy, start, goal)
+
+    def getExitPath(self):
+        """Returns the name of the nearest region-link the player can walk to, and the path
+        leading to it."""
+        best = None
+        for region in self.regionLinks:
+            pos = gameconfig.get_value(region, "position", list, {"elements": 4})
+            goal = [pos[0] + int((pos[2] - pos[0]) / 2), pos[1] + int((pos[3] - pos[1]) / 2)]
+            path = self.findPath(self.playerPosition, goal)
+            if path is not None and len(path) > 0 and (best is None or len(path) < len(best[1])):
+                best = (region.get("name", None) or region.get("link", ""), path)
+        return best
+
+    def moveObject(self, obj, position):
+        """Moves an object of this scene to the given position."""
+        self.objectIndex.move(obj, position)
+        self.occupancy.move_object(obj)
+
+    def getNearestObjects(self, position, count=1):
+        """Returns the count objects nearest to position, as (distance, object) tuples."""
+        return self.objectIndex.nearest(position, count)
+
+    def getObjectsWithin(self, position, radius):
+        """Returns the objects at most radius away from position, as (distance, object) tuples,
+        nearest first."""
+        return self.objectIndex.within_radius(position, radius)
+
+    def isInside(self, position):
+        """Returns whether the given position is a valid position within this scene."""
+        if position is None or isinstance(position, list) is False or len(position) != 2:
+            return False
+        return position[0] > 0 and position[0] < self.width and position[1] > 0 and position[1] < self.height
+
+    def unload(self):
         import object_manager
+        for obj in self.objects:
+            object_manager.removeObject(obj)
+        self.objects = []
+        self.enemies = []
+        self.objectIndex.clear()
+        self.occupancy = self.buildOccupancy()
+        self.objectsLoaded = False
+        pathfinding.forget(self.name)
+        ai_manager.deactivate(self)
+        super().unload()
+
+    def loadObjects(self):
+        if self.objectsLoaded:
+            return True
+        self.objectsLoaded = True
         ret = True
         for objConfig in self.objectConfigs:
-            obj = object_manager.addObject(objConfig)
+            obj = self.createObject(objConfig)
             if obj is False:
                 ret = False
                 continue
             if obj is None:
                 continue
-            objPos = obj.getPosition()
-            if objPos is None or isinstance(objPos, list) is False or len(objPos) != 2:
-                logger.error(self, "Object({name}) has no position".format(name=obj.name))
-                continue
-            if objPos[0] <= 0 or objPos[0] >= self.width or objPos[1] <= 0 or objPos[1] >= self.height:
-                logger.error(self, "Object({name}, {pos}) position is outside this scene.".format(name=obj.name, pos=objPos))
-                continue
-            logger.info(self, "{cls}({name}) added to the scene".format(cls=obj.__class__.__name__, name=obj.name))
             self.objects.append(obj)
+            self.indexObject(obj)
         if ret is False:
             logger.error(self, "Some objects failed to load.")
         return ret
+
+    def createObject(self, objConfig):
+        """Creates an object of this scene. Returns False if it failed to load, None if its
+        position is invalid."""
+        import object_manager
+        obj = object_manager.addObject(objConfig)
+        if obj is False or obj is None:
+            return obj
+        objPos = obj.getPosition()
+        if objPos is None or isinstance(objPos, list) is False or len(objPos) != 2:
+            logger.error(self, "Object({name}) has no position".format(name=obj.name))
+            object_manager.removeObject(obj)
+            return None
+        if self.isInside(objPos) is False:
+            logger.error(self, "Object({name}, {pos}) position is outside this scene.".format(name=obj.name, pos=objPos))
+            object_manager.removeObject(obj)
+            return None
+        logger.info(self, "{cls}({name}) added to the scene".format(cls=obj.__class__.__name__, name=obj.name))
+        return obj
         
     def getObjects(self):
         return self.objects
@@ -415,25 +737,27 @@ class MapRegionScene(IntervalScene):
         if params is not None:
             enter = params.get('enter', None)
             if enter is not None:
-                for region in self.regionLinks:
-                    if region.get("name", None) == enter:
-                        pos = gameconfig.get_value(region, "position", list, {"elements": 4})
-                        msg = "Entering {name} {enter}: {pos}".format(name=self.name, enter=enter, pos=pos)
-                        logger.debug(self, msg)
-                        speech.speak(msg)
-                        if pos[0] == pos[2]:
-                            self.playerPosition = [pos[0] + 1 if pos[0] == 0 else self.width - 2, pos[1] + int((pos[3] - pos[1]) / 2)]
-                        elif pos[1] == pos[3]:
-                            self.playerPosition = [pos[0] + int((pos[2] - pos[0]) / 2), pos[1] + 1 if pos[1] == 0 else self.height - 2]
-                        else:
-                            self.playerPosition = [int(self.width / 2), int(self.height / 2)]
+                pos = self.entryPositions.get(enter, None)
+                if pos is not None:
+                    msg = "Entering {name} {enter}: {pos}".format(name=self.name, enter=enter, pos=pos)
+                    logger.debug(self, msg)
+                    speech.speak(msg)
+                    self.playerPosition = pos.copy()
+                else:
+                    logger.error(self, "No region-link named {enter}, spawning in the middle.".format(enter=enter))
+                    self.playerPosition = [int(self.width / 2), int(self.height / 2)]
             else:
                 logger.info(self, "No enter specified, spawning in the middle.")
                 self.playerPosition = [int(self.width / 2), int(self.height / 2)]
         else:
             logger.info(self, "No params specified, spawning in the middle.")
             self.playerPosition = [int(self.width / 2), int(self.height / 2)]
-        event_manager.post(event_manager.CHARACTER_SPAWN, {"scene": self, "position": self.playerPosition})
+        event_manager.post(event_manager.CHARACTER_SPAWN, event_manager.CharacterSpawnData(self, self.playerPosition))
+        ai_manager.activate(self)
+
+    def deactivate(self, silent=False):
+        ai_manager.deactivate(self)
+        super().deactivate(silent)
 
     def describe(self):
         self.speechDescription = " ({position})".format(position=self.playerPosition)
@@ -442,6 +766,14 @@ class MapRegionScene(IntervalScene):
         super().describe()
     def event_will_scene_stack(self, evt):
         self.stopMoving()
+        # enemies wait while another scene (such as a menu) is stacked on top of this one.
+        ai_manager.deactivate(self)
+
+    def event_did_scene_unstack(self, evt):
+        import scene_manager
+
+        if self.focused and scene_manager.get_active_scene() is self:
+            ai_manager.activate(self)
     
 
     def input_press_tab(self):
@@ -450,9 +782,7 @@ class MapRegionScene(IntervalScene):
             speech.speak("Mode subjectif")
             self.curAngle = 80
             event_manager.post(event_manager.AUDIO_CAMERA_CHANGE, {"cameraMode": self.cameraMode})
-            event_manager.post(event_manager.AUDIO_RENDER, {"scene": self,
-                                                                                                        "listener": self.playerPosition,
-                                                                                                        "directionVector": [0.0, 1.0]})
+            event_manager.post(event_manager.AUDIO_RENDER, event_manager.AudioRenderData(self, self.playerPosition, [0.0, 1.0]))
                                                 
                             
         elif self.cameraMode == constants.CAMERA_SUBJECTIVE:
@@ -468,6 +798,23 @@ class MapRegionScene(IntervalScene):
     def input_press_action(self):
         self.onAction()
 
+    def input_press_g(self):
+        """Tells the player the way to the nearest exit of this region."""
+        exitPath = self.getExitPath()
+        if exitPath is None:
+            speech.speak("Aucune sortie accessible")
+            return
+        name, path = exitPath
+        # the first straight part of the path.
+        dx = path[0][0] - self.playerPosition[0]
+        dy = path[0][1] - self.playerPosition[1]
+        count = 1
+        while count < len(path) and path[count][0] - path[count - 1][0] == dx and path[count][1] - path[count - 1][1] == dy:
+            count += 1
+        speech.speak("Sortie {name} à {total} pas: {count} pas vers {direction}".format(
+            name=name, total=len(path), count=count, direction=DIRECTION_NAMES[(dx, dy)]))
+        audio.play(constants.AUDIO_MESSAGE_SOUND, constants.AUDIO_FX_VOLUME, dx * 0.8, pitch=audio.computePitch(0.7, 1.3, dy * 5))
+
     def input_press_quit(self):
         import scene_manager
 
@@ -536,7 +883,7 @@ class MapRegionScene(IntervalScene):
             self.isWalking = True
         if direction is not None:
             self.direction = direction
-        event_manager.post(event_manager.CHARACTER_MOVE, {"direction": self.direction, "type": "run" if running is True else "walk"})
+        event_manager.post(event_manager.CHARACTER_MOVE, event_manager.CharacterMoveData(self.direction, "run" if running is True else "walk"))
         self.playerMoveTicks = core.get_current_ticks()
 
     def stopMoving(self):
@@ -563,24 +910,17 @@ class MapRegionScene(IntervalScene):
             newPos[0] += 1
         elif direction == constants.DIRECTION_WEST:
             newPos[0] -= 1
-        if newPos[0] == 0 or newPos[0] == self.width or newPos[1] == 0 or newPos[1] == self.height:
+        cell = self.occupancy.get(newPos)
+        if cell == occupancy.WALL:
             event_manager.post(event_manager.CHARACTER_HIT, {"type": "wall"})
             return False
-        import object_manager
-
-        objs = object_manager.getNearestObjects(newPos, self.player, self.objects)
-        if objs is not None and len(objs) > 0:
-            distance,obj = objs[0]
-            pos = obj.getPosition()
-            size = obj.getSize()
-            if newPos[0] > pos[0] - size[0] and newPos[0] < pos[0] + size[0] and newPos[1] > pos[1] - size[1] and newPos[1] < pos[1] + size[1]:
-                event_manager.post(event_manager.OBJECT_HIT,
-                                   {"character": self.player,
-                                    "obj": obj})
-                return False
-            
-            
-            
+        if cell == occupancy.OBSTACLE:
+            event_manager.post(event_manager.CHARACTER_HIT, {"type": "obstacle"})
+            return False
+        obj = self.occupancy.get_object(newPos)
+        if obj is not None:
+            event_manager.post(event_manager.OBJECT_HIT, event_manager.ObjectHitData(self.player, obj))
+            return False
         return True # we can move this character in the desired direction.
     
     def event_character_move(self, evt):
@@ -600,25 +940,20 @@ class MapRegionScene(IntervalScene):
             newPos[0] -= 1
             
         # let's see if there is a link to another region
-        
-        for region in self.regionLinks:
-            pos = gameconfig.get_value(region, "position", list, {"elements": 4})
-            if (newPos[0] == pos[0] and newPos[1] >= pos[1] and newPos[1] <= pos[3]) \
-                 or (newPos[1] == pos[1] and newPos[0] >= pos[0] and newPos[0] <= pos[2]):
-                scene,enter = region.get("link", "").split(".")
-                self.nextScene = scene
-                leaveCurrentScene(params={"enter": enter})
-                return
-        if newPos[0] == 0 or newPos[0] == self.width or newPos[1] == 0 or newPos[1] == self.height:
-            return # this is a wall
+        link = self.linkCells.get((newPos[0], newPos[1]), None)
+        if link is not None:
+            self.nextScene, enter = link
+            leaveCurrentScene(params={"enter": enter})
+            return
+        if self.occupancy.get(newPos) != occupancy.FREE:
+            return # this is a wall or an obstacle
 
         # If we reach this nothing prevents us to walk this way                
         self.playerPosition = newPos
         
         # now, let's see what's on this new position
 
-        import object_manager
-        objs = object_manager.getNearestObjects(self.playerPosition, self.player, self.objects)
+        objs = self.getNearestObjects(self.playerPosition)
         if objs is not None and len(objs) > 0:
             distance,obj = objs[0] # takes the nearest object
             logger.info(self, "{name} at {distance}".format(name=obj, distance=distance))
@@ -652,42 +987,31 @@ class MapRegionScene(IntervalScene):
             if shouldUpdateListener:
                 dirX = math.cos(self.curAngle * constants.DEF_ANGLE)
                 dirY = math.sin(self.curAngle * constants.DEF_ANGLE)
-                event_manager.post(event_manager.AUDIO_RENDER, {"scene": self,
-                                                                                                            "listener": self.playerPosition,
-                                                                                                            "directionVector": [dirX, dirY]})
+                event_manager.post(event_manager.AUDIO_RENDER, event_manager.AudioRenderData(self, self.playerPosition, [dirX, dirY]))
                 
         if (self.isWalking and core.get_current_ticks() - self.playerMoveTicks > constants.HERO_WALK_TIME) or (self.isRunning and core.get_current_ticks() - self.playerMoveTicks > constants.HERO_RUN_TIME):
             self.onWalk(self.isRunning)
         if core.get_current_ticks() - self.objectEchoTick > constants.OBJECT_ECHO_TIME:
-            import object_manager
-            objs = object_manager.getNearestObjects(self.playerPosition, self.player, self.objects)
-            for distance,obj in objs:
-                diffY = obj.position[1] - self.playerPosition[1]
-                if diffY > 5:
-                    diffY = 5
-                elif diffY < -5:
-                    diffY = -5
-                diffX = (obj.position[0] - self.playerPosition[0]) / 100 * 8
-                if diffX <= -0.8:
-                    diffX = -0.8
-                elif diffX >= 0.8:
-                    diffX = 0.8
-                volume = (constants.AUDIO_FX_VOLUME - (distance / self.player.getMaxDistance()) if distance <= self.player.getMaxDistance() else 0)
-                if volume <= 0:
-                    return
-                # logger.info(self, "Nearest object {obj} at {distance}, vol={volume}, pitch={pitch}, pan={pan}".format(obj=obj, distance=distance, pitch=diffY, pan=diffX, volume=volume))
-                if self.cameraMode == constants.CAMERA_TOP:
-                    audio.play(obj.getSignalSound(), volume, diffX, pitch=audio.computePitch(0.7, 1.3, diffY))
+            if self.cameraMode == constants.CAMERA_TOP:
+                self.playObjectEchoes()
             self.objectEchoTick = core.get_current_ticks()
             if self.cameraMode == constants.CAMERA_SUBJECTIVE:
-                event_manager.post(event_manager.AUDIO_PLAY_3D, {"scene": self})
-                
-            
+                event_manager.post(event_manager.AUDIO_PLAY_3D, event_manager.SceneData(self))
+
+    def playObjectEchoes(self):
+        """Plays the signal sound of every object the player can hear."""
+        maxDistance = self.player.getMaxDistance()
+        # farther objects are not audible.
+        radius = echo.get_audible_radius(maxDistance)
+        x, y = self.playerPosition
+        objs = self.objectIndex.in_box(x - radius, y - radius, x + radius, y + radius)
+        for obj, volume, pan, pitch in echo.compute(self.playerPosition, objs, maxDistance):
+            audio.play(obj.getSignalSound(), volume, pan, pitch=pitch)
+
     def getGroundTypeSound(self):
-        import random
         if self.walkSounds is None or len(self.walkSounds) == 0:
             return
-        idx = random.randint(0, len(self.walkSounds) - 1)
+        idx = _random.randint(0, len(self.walkSounds) - 1)
         ret = [self.walkSounds[idx], constants.AUDIO_FX_VOLUME]
         return ret
         
@@ -696,16 +1020,237 @@ class MapRegionScene(IntervalScene):
     def get_next_scene(self):
         return self.nextScene
     def onAction(self):
-        import object_manager
-        
-        objs = object_manager.getNearestObjects(self.playerPosition, self.player, self.objects)
+        objs = self.getNearestObjects(self.playerPosition)
         if len(objs) > 0:
             distance,obj = objs[0]
             if obj is not None:
                 if distance <= obj.getInteractionDistance():
                     if obj.onInteract(self, self.player, True) is True:
                         self.stopMoving()
-    
+
+
+class WorldChunk():
+    """A loaded chunk of a world map, with the objects and musics it created."""
+
+    def __init__(self, position, config):
+        self.position = position
+        self.walls = gameconfig.get_value(config, "walls", list, {"defaultValue": []})
+        self.obstacles = gameconfig.get_value(config, "obstacles", list, {"defaultValue": []})
+        self.objectConfigs = gameconfig.get_value(config, "objects", list, {"defaultValue": []})
+        self.musicConfigs = gameconfig.get_value(config, "musics", list, {"defaultValue": []})
+        self.objects = []
+        self.musics = []
+        self.musicsLoaded = False
+
+    def __repr__(self):
+        return "WorldChunk({x}, {y})".format(x=self.position[0], y=self.position[1])
+
+
+class WorldMapScene(MapRegionScene):
+    """A map region too large to be loaded at once. The region is split into square chunks of
+    chunk-size cells, stored as data/chunks/<chunks>/<x>_<y>.json files which may hold objects,
+    walls, obstacles and musics. Only the chunks within view-distance of the player's are loaded;
+    they are streamed in and out as the player moves. The files of the next ring of chunks are read
+    ahead of time on a worker thread, so that crossing a chunk border only applies configurations
+    already parsed; chunk musics are opened on the next intervals, one chunk at a time.
+    """
+    def __init__(self, name, config):
+        self.chunkSize = gameconfig.get_value(config, "chunk-size", int, {"minValue": 1, "defaultValue": constants.WORLD_CHUNK_SIZE})
+        self.chunksDirectory = gameconfig.get_value(config, "chunks", str, {"defaultValue": name})
+        self.viewDistance = gameconfig.get_value(config, "view-distance", int, {"minValue": 1, "defaultValue": constants.WORLD_VIEW_DISTANCE})
+        self.chunks = {}
+        # chunk position -> future of its configuration, read ahead of time.
+        self.chunkReads = {}
+        self.playerChunk = None
+        super().__init__(name, config)
+
+    def getLogName(self):
+        return "WorldMapScene(%s)" % self.name
+
+    def reload(self, config):
+        chunkSize = gameconfig.get_value(config, "chunk-size", int, {"minValue": 1, "defaultValue": constants.WORLD_CHUNK_SIZE})
+        chunksDirectory = gameconfig.get_value(config, "chunks", str, {"defaultValue": self.name})
+        viewDistance = gameconfig.get_value(config, "view-distance", int, {"minValue": 1, "defaultValue": constants.WORLD_VIEW_DISTANCE})
+        # chunks are read again from their files, with the new settings.
+        self.unloadChunks()
+        self.chunkSize = chunkSize
+        self.chunksDirectory = chunksDirectory
+        self.viewDistance = viewDistance
+        super().reload(config)
+        if self.focused:
+            self.updateChunks()
+
+    def buildOccupancy(self):
+        grid = occupancy.ChunkedOccupancyGrid(self.width, self.height, self.chunkSize)
+        for chunk in self.chunks.values():
+            grid.load_chunk(chunk.position, self.getChunkLayers(chunk))
+        return grid
+
+    def getChunkLayers(self, chunk):
+        """Returns the (rect, value) layers making up the occupancy of a chunk: walls and obstacles
+        of the region and of the chunk, region-links being carved into them."""
+        layers = [(rect, occupancy.WALL) for rect in self.walls + chunk.walls]
+        layers += [(rect, occupancy.OBSTACLE) for rect in self.obstacles + chunk.obstacles]
+        layers += [(gameconfig.get_value(region, "position", list, {"elements": 4}), occupancy.FREE) for region in self.regionLinks]
+        return layers
+
+    def getObjects(self):
+        objects = list(self.objects)
+        for chunk in self.chunks.values():
+            objects.extend(chunk.objects)
+        return objects
+
+    def updateChunks(self):
+        """Loads the chunks around the player and unloads the ones they moved away from."""
+        if self.playerPosition is None:
+            return
+        x, y = self.occupancy.get_chunk(self.playerPosition)
+        if (x, y) == self.playerChunk:
+            self.applyChunkReads()
+            return
+        self.playerChunk = (x, y)
+        # chunks are kept one chunk further than they are loaded, so that walking along a chunk
+        # border does not load and unload them over and over.
+        for position in list(self.chunks.keys()):
+            if max(abs(position[0] - x), abs(position[1] - y)) > self.viewDistance + 1:
+                self.unloadChunk(position)
+        for position in list(self.chunkReads.keys()):
+            if max(abs(position[0] - x), abs(position[1] - y)) > self.viewDistance + 1:
+                self.chunkReads.pop(position).cancel()
+        lastX = self.width // self.chunkSize
+        lastY = self.height // self.chunkSize
+        # the player's chunk is needed right away; the other ones are applied once read, see
+        # applyChunkReads, and are walls until then.
+        if (x, y) not in self.chunks:
+            self.loadChunk((x, y), self.readChunk((x, y)))
+        # the chunks the player may walk into next are read in the background.
+        distance = self.viewDistance + 1
+        for chunkY in range(max(0, y - distance), min(lastY, y + distance) + 1):
+            for chunkX in range(max(0, x - distance), min(lastX, x + distance) + 1):
+                position = (chunkX, chunkY)
+                if position not in self.chunks and position not in self.chunkReads:
+                    self.chunkReads[position] = getChunkReader().submit(gameconfig.load_chunk_configuration, self.chunksDirectory, chunkX, chunkY)
+        self.applyChunkReads()
+
+    def applyChunkReads(self):
+        """Loads the chunks within view-distance whose configuration was read in the background,
+        without waiting for the ones still being read."""
+        if self.playerChunk is None:
+            return
+        x, y = self.playerChunk
+        for position, future in list(self.chunkReads.items()):
+            if future.done() and max(abs(position[0] - x), abs(position[1] - y)) <= self.viewDistance:
+                del self.chunkReads[position]
+                self.loadChunk(position, future.result())
+
+    def readChunk(self, position):
+        """Returns the configuration of a chunk, read ahead of time if possible, waiting for it if
+        it is being read."""
+        future = self.chunkReads.pop(position, None)
+        if future is not None and future.cancel() is False:
+            # already read, or being read.
+            return future.result()
+        return gameconfig.load_chunk_configuration(self.chunksDirectory, position[0], position[1])
+
+    def loadChunk(self, position, config):
+        """Loads a chunk from its configuration: its cells and objects. Its musics are opened later,
+        see loadChunkMusics."""
+        if config is None:
+            # broken chunks are walled off.
+            config = {"walls": [[position[0] * self.chunkSize, position[1] * self.chunkSize,
+                                 (position[0] + 1) * self.chunkSize - 1, (position[1] + 1) * self.chunkSize - 1]]}
+        try:
+            chunk = WorldChunk(position, config)
+        except Exception as ex:
+            logger.error(self, "Invalid chunk {position}: {exception}".format(position=position, exception=ex))
+            chunk = WorldChunk(position, {})
+        self.chunks[position] = chunk
+        self.occupancy.load_chunk(position, self.getChunkLayers(chunk))
+        for objConfig in chunk.objectConfigs:
+            obj = self.createObject(objConfig)
+            if obj:
+                chunk.objects.append(obj)
+                self.indexObject(obj)
+        logger.debug(self, "{chunk} loaded: {count} objects".format(chunk=chunk, count=len(chunk.objects)))
+
+    def loadChunkMusics(self):
+        """Opens the musics of one loaded chunk whose musics are not opened yet, the player's first.
+        Returns False once every loaded chunk has its musics."""
+        chunk = self.chunks.get(self.playerChunk, None)
+        if chunk is None or chunk.musicsLoaded:
+            chunk = next((chunk for chunk in self.chunks.values() if chunk.musicsLoaded is False), None)
+        if chunk is None:
+            return False
+        chunk.musicsLoaded = True
+        for music in chunk.musicConfigs:
+            music["scene"] = self
+            if audio.loadMusic(music) is False:
+                logger.warning(self, "Music {name} not loaded".format(name=music.get("name", "unknown")))
+                continue
+            chunk.musics.append(music["name"])
+            if self.focused:
+                audio.playMusic(music["name"])
+        return True
+
+    def unloadChunk(self, position):
+        """Unloads a chunk, releasing its objects and musics."""
+        import object_manager
+        chunk = self.chunks.pop(position, None)
+        if chunk is None:
+            return
+        for obj in chunk.objects:
+            self.unindexObject(obj)
+            object_manager.removeObject(obj)
+        for name in chunk.musics:
+            if self.focused:
+                audio.stopMusic(name)
+            audio.releaseMusic(name)
+        self.occupancy.unload_chunk(position)
+        logger.debug(self, "{chunk} unloaded".format(chunk=chunk))
+
+    def unloadChunks(self):
+        """Unloads every chunk."""
+        for position in list(self.chunks.keys()):
+            self.unloadChunk(position)
+        for future in self.chunkReads.values():
+            future.cancel()
+        self.chunkReads = {}
+        self.playerChunk = None
+
+    def unload(self):
+        self.unloadChunks()
+        super().unload()
+
+    def activate(self, silent=False, params=None):
+        super().activate(silent, params)
+        self.playerChunk = None
+        self.updateChunks()
+
+    def event_character_move(self, evt):
+        super().event_character_move(evt)
+        self.updateChunks()
+
+    def event_interval(self):
+        super().event_interval()
+        self.applyChunkReads()
+        self.loadChunkMusics()
+
+def getChunkReader():
+    """Returns the worker thread reading world map chunks ahead of time."""
+    global _chunkReader
+
+    if _chunkReader is None:
+        _chunkReader = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunks")
+    return _chunkReader
+
+def parseRegionLink(region):
+    """Returns the (scene, entry) a region-link leads to, from its "scene.entry" link."""
+    link = gameconfig.get_value(region, "link", str, {"mandatory": True})
+    parts = link.split(".")
+    if len(parts) != 2 or parts[0] == "" or parts[1] == "":
+        raise RuntimeError("Invalid region-link {link}, expected \"scene.entry\"".format(link=link))
+    return (parts[0], parts[1])
+
 def leaveCurrentScene(params=None):
         event_manager.post(event_manager.LEAVE_CURRENT_SCENE, {"params": params})
 
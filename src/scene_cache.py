@@ -0,0 +1,218 @@
+"""
+scene_cache
+
+This module keeps the parsed and validated content of the engine configuration (age.json) and of
+the scene files (data/scenes/*.json) in a single binary cache file, so that starting the engine
+does not parse every JSON file again. The cache is read in one go through a memory map; each entry
+is keyed by the modification time, size and SHA-1 hash of its source file, and only files that
+changed since the cache was written are parsed again.
+
+The cache can be built ahead of time by running this module from the game directory:
+    python3 src/scene_cache.py
+"""
+
+# *-* coding: utf8 *-*
+
+import glob
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import threading
+
+import constants
+import logger
+
+CACHE_VERSION = 1
+
+# Global scene cache instance
+_INSTANCE = None
+
+
+class SceneCache():
+    """Maps source file paths to (mtime, size, sha1, compiled content) entries. Contents are kept
+marshalled, so that each caller gets its own copy and may modify it freely. Files are read from
+several threads (loader, prefetcher, hot reload), so entries are only accessed under a lock."""
+
+    def __init__(self, file):
+        self.file = file
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "scene_cache"
+
+    def load(self):
+        """Reads the cache file. A missing or outdated cache is simply ignored."""
+        try:
+            with open(self.file, "rb") as cache_file:
+                with mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    cache = marshal.loads(data)
+        except (OSError, ValueError, EOFError, TypeError) as ex:
+            logger.info(self, "No usable cache in {file}: {exception}".format(file=self.file, exception=ex))
+            return False
+        if not isinstance(cache, dict) or cache.get("version", None) != CACHE_VERSION:
+            logger.info(self, "Ignoring {file}: outdated format".format(file=self.file))
+            return False
+        self.entries = cache["files"]
+        logger.debug(self, "{count} files cached".format(count=len(self.entries)))
+        return True
+
+    def save(self):
+        """Writes the cache file if any entry changed since it was read."""
+        with self.lock:
+            if self.dirty is False:
+                return True
+            entries = dict(self.entries)
+            self.dirty = False
+        temp_file = self.file + ".tmp"
+        try:
+            with open(temp_file, "wb") as cache_file:
+                marshal.dump({"version": CACHE_VERSION, "files": entries}, cache_file)
+            os.replace(temp_file, self.file)
+        except OSError as ex:
+            logger.error(self, "Failed to write {file}: {exception}".format(file=self.file, exception=ex))
+            with self.lock:
+                self.dirty = True
+            return False
+        logger.info(self, "{count} files written to {file}".format(count=len(entries), file=self.file))
+        return True
+
+    def load_json(self, path):
+        """Returns the content of the given JSON file, from the cache if the file did not change."""
+        key = os.path.relpath(path)
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.hits += 1
+                return marshal.loads(entry[3])
+        # files are read and parsed outside of the lock, so that threads do not wait for each other.
+        with open(path, "rb") as source:
+            data = source.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is not None and entry[2] == digest:
+            # touched but not modified.
+            with self.lock:
+                self.hits += 1
+                self.dirty = True
+                self.entries[key] = (stat.st_mtime_ns, stat.st_size, digest, entry[3])
+            return marshal.loads(entry[3])
+        content = json.loads(data)
+        validate(key, content)
+        compiled = marshal.dumps(content)
+        with self.lock:
+            self.misses += 1
+            self.dirty = True
+            self.entries[key] = (stat.st_mtime_ns, stat.st_size, digest, compiled)
+        return marshal.loads(compiled)
+
+
+# scene properties holding lists of JSON objects -> string properties each of them needs.
+SCENE_LISTS = {
+    "objects": ("name", "type"),
+    "region-links": ("link",),
+    "musics": ("name", "file"),
+}
+# scene properties holding lists of [x1, y1, x2, y2] rectangles.
+SCENE_RECTS = ("walls", "obstacles")
+
+
+def validate(path, content):
+    """Checks the structure of a configuration or scene file, raising a ValueError if invalid: each
+scene needs a name and a type, and the objects, region-links, musics, walls and obstacles it
+lists need the properties the engine reads from them."""
+    if not isinstance(content, dict):
+        raise ValueError("{path}: a JSON object is expected".format(path=path))
+    if os.path.dirname(path) != os.path.join("data", "scenes"):
+        return
+    scenes = content.get("scenes", [content])
+    if not isinstance(scenes, list):
+        raise ValueError("{path}: \"scenes\" has to be a list".format(path=path))
+    for index, scene in enumerate(scenes):
+        if not isinstance(scene, dict):
+            raise ValueError("{path}: scene #{index} is not a JSON object".format(path=path, index=index))
+        for key in ("name", "type"):
+            if not isinstance(scene.get(key, None), str):
+                raise ValueError("{path}: scene #{index} has no \"{key}\" property".format(path=path, index=index, key=key))
+        where = "{path}: scene {name}".format(path=path, name=scene["name"])
+        for key, properties in SCENE_LISTS.items():
+            for item_index, item in enumerate(get_list(where, scene, key)):
+                if not isinstance(item, dict):
+                    raise ValueError("{where}: {key} #{index} is not a JSON object".format(where=where, key=key, index=item_index))
+                for property in properties:
+                    if not isinstance(item.get(property, None), str):
+                        raise ValueError("{where}: {key} #{index} has no \"{property}\" property".format(
+                            where=where, key=key, index=item_index, property=property))
+        for link in get_list(where, scene, "region-links"):
+            parts = link["link"].split(".")
+            if len(parts) != 2 or parts[0] == "" or parts[1] == "":
+                raise ValueError("{where}: invalid region-link {link}, expected \"scene.entry\"".format(where=where, link=link["link"]))
+            check_rect(where, "region-links", link.get("position", None))
+        for key in SCENE_RECTS:
+            for rect in get_list(where, scene, key):
+                check_rect(where, key, rect)
+
+def get_list(where, scene, key):
+    """Returns the list held by a scene property, an empty one if it is missing."""
+    value = scene.get(key, [])
+    if not isinstance(value, list):
+        raise ValueError("{where}: \"{key}\" has to be a list".format(where=where, key=key))
+    return value
+
+def check_rect(where, key, rect):
+    """Checks that rect is an [x1, y1, x2, y2] rectangle."""
+    if not isinstance(rect, list) or len(rect) != 4 \
+       or not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in rect):
+        raise ValueError("{where}: {key} expects [x1, y1, x2, y2] rectangles, not {rect}".format(where=where, key=key, rect=rect))
+
+def initialize(file=constants.SCENE_CACHE_FILE):
+    """Initializes the scene cache, reading the cache file."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        _INSTANCE = SceneCache(file)
+        _INSTANCE.load()
+    return True
+
+def load_json(path):
+    """Returns the content of the given JSON file, through the cache if it is initialized."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        with open(path, "rb") as source:
+            return json.loads(source.read())
+    return _INSTANCE.load_json(path)
+
+def save():
+    """Writes the cache file if needed."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        return False
+    logger.info(_INSTANCE, "{hits} files read from the cache, {misses} parsed".format(hits=_INSTANCE.hits, misses=_INSTANCE.misses))
+    return _INSTANCE.save()
+
+def build(config_file="age.json"):
+    """Compiles the engine configuration and every scene file into the cache."""
+    initialize()
+    failed = 0
+    for path in [config_file] + sorted(glob.glob(os.path.join("data", "scenes", "*.json"))):
+        try:
+            load_json(path)
+        except Exception as ex:
+            logger.error(_INSTANCE, "Failed to compile {path}: {exception}".format(path=path, exception=ex))
+            failed += 1
+    save()
+    return failed == 0
+
+
+if __name__ == '__main__':
+    logger.initialize()
+    if build() is False:
+        print("Some files failed to compile: check the log file for more details.")
@@ -2,6 +2,9 @@
 scene_manager
 
 This modules handles the scene life-time.
+
+At startup, only a manifest of the scenes is built: names, types and the file each scene is defined
+in. Scene objects (and the musics they open) are created the first time they are loaded or stacked.
 """
 
 # *-* coding: utf8 *-*
@@ -12,20 +15,41 @@ import re
 import pygame
 
 import constants
+import core
 import gameconfig
 import logger
 import audio
 import inputHandler
 import event_manager
+import loader
 import speech
 import player
+import prefetcher
+import replay
+import residency
 import scene
+import timer_manager
 
 # scene types map from string to real objects.
 
 # Global scene manager instance
 _INSTANCE = None
 
+
+class SceneManifestEntry():
+    """Describes a scene that is not created yet: either a Python module from src/scenes, or a
+    scene from a JSON file under data/scenes."""
+
+    def __init__(self, name, scene_type, file, module=None):
+        self.name = name
+        self.type = scene_type
+        self.file = file
+        self.module = module
+
+    def __repr__(self):
+        return "SceneManifestEntry({name}, {type}, {file})".format(name=self.name, type=self.type, file=self.file)
+
+
 class SceneManager():
     """
     This object is responsible for loading, unloading, and managing scenes.
@@ -33,11 +57,16 @@ class SceneManager():
     _sceneTypesMap = {
         "menu": scene.MenuScene,
         "storytext": scene.StoryTextScene,
-        "mapregion": scene.MapRegionScene
+        "mapregion": scene.MapRegionScene,
+        "worldmap": scene.WorldMapScene
     }
     _scenes = {}
-    _intervalScenes = []
+    _manifest = {}
+    _actionTables = {}
+    _intervalTimers = {}
     _active_scene = None
+    # the scene left for the active one, which may still fade out or be returned to.
+    _parent_scene = None
     _player = None
     _stack = []
 
@@ -88,24 +117,212 @@ class SceneManager():
         self._scenes[name] = obj
         logger.debug(self, f"Registered scene {name}")
 
+    def add_manifest_entry(self, entry):
+        """Records a scene to be created on its first use."""
+        if entry.name is None or entry.name == "":
+            raise RuntimeError("A scene must have a \"name\" property.")
+        if entry.module is None and self._sceneTypesMap.get(entry.type, None) is None:
+            raise RuntimeError("Scene type {type} is not known.".format(type=entry.type))
+        if entry.name in self._manifest:
+            raise RuntimeError("Scene {name} defined in {file} is already defined in {other}".format(
+                name=entry.name, file=entry.file, other=self._manifest[entry.name].file))
+        self._manifest[entry.name] = entry
+
+    def add_prefetched_scene(self, my_scene):
+        """Adds a scene built ahead of time by the prefetcher and creates its objects."""
+        self.add_scene(my_scene.name, my_scene)
+        my_scene.prefetch()
+        residency.add_prefetched(my_scene)
+
+    def is_scene_in_use(self, name):
+        """Returns whether the given scene is active, stacked or the parent of the active one."""
+        if self._active_scene is not None and self._active_scene.name == name:
+            return True
+        if self._parent_scene is not None and self._parent_scene.name == name:
+            return True
+        for my_scene in self._stack:
+            if my_scene.name == name:
+                return True
+        return False
+
+    def unload_scene(self, name):
+        """Drops the given scene object and releases its resources. It is created again from the
+        manifest on its next use."""
+        my_scene = self._scenes.pop(name, None)
+        if my_scene is None:
+            return False
+        residency.forget(name)
+        if self._parent_scene is my_scene:
+            self._parent_scene = None
+        try:
+            my_scene.unload()
+        except Exception as ex:
+            logger.exception(self, f"Failed to unload scene {name}", ex)
+        logger.debug(self, f"Unloaded scene {name}")
+        return True
+
+    def reload_scene_file(self, file, configs):
+        """Applies the new content of a scene file: created scenes are updated in place, added
+        scenes are registered and removed ones are dropped. Returns the number of scenes that
+        failed to reload."""
+        failed = 0
+        names = set()
+        for config in configs:
+            name = config.get("name", None)
+            names.add(name)
+            prefetcher.discard(name)
+            entry = self._manifest.get(name, None)
+            if entry is None:
+                try:
+                    self.add_manifest_entry(SceneManifestEntry(name, config.get("type", None), file))
+                    logger.info(self, f"Scene {name} added")
+                except Exception as ex:
+                    logger.error(self, "Failed to register scene {name}: {exception}".format(name=name, exception=ex))
+                    failed += 1
+                continue
+            if entry.file != file:
+                logger.error(self, "Scene {name} is already defined in {file}".format(name=name, file=entry.file))
+                failed += 1
+                continue
+            if entry.type != config.get("type", None):
+                if self.is_scene_in_use(name):
+                    logger.error(self, f"Cannot change the type of scene {name} while it is in use")
+                    failed += 1
+                    continue
+                # created again with its new type on its next use.
+                self.unload_scene(name)
+                entry.type = config.get("type", None)
+                continue
+            my_scene = self._scenes.get(name, None)
+            if my_scene is None:
+                continue
+            try:
+                my_scene.reload(config)
+                logger.info(self, f"Scene {name} reloaded")
+            except Exception as ex:
+                logger.exception(self, f"Failed to reload scene {name}", ex)
+                failed += 1
+        for name, entry in list(self._manifest.items()):
+            if entry.file == file and name not in names and self.is_scene_in_use(name) is False:
+                logger.info(self, f"Scene {name} removed")
+                self.unload_scene(name)
+                del self._manifest[name]
+        return failed + self.check_region_links(configs)
+
+    def check_region_links(self, configs):
+        """Checks that the region-links of the given scene configurations lead to known scenes and
+        entries. Returns the number of broken links."""
+        broken = 0
+        targets = {}
+        for config in configs:
+            if config is None or config.get("type", None) not in ("mapregion", "worldmap"):
+                continue
+            name = config.get("name", None)
+            for region in config.get("region-links", None) or []:
+                try:
+                    target, enter = scene.parseRegionLink(region)
+                except Exception as ex:
+                    logger.error(self, "Scene {name}: {exception}".format(name=name, exception=ex))
+                    broken += 1
+                    continue
+                entry = self._manifest.get(target, None)
+                if entry is None:
+                    logger.error(self, "Scene {name}: region-link to unknown scene {target}".format(name=name, target=target))
+                    broken += 1
+                    continue
+                if entry.type not in ("mapregion", "worldmap"):
+                    continue
+                if target not in targets:
+                    target_config = self.get_scene_config(entry)
+                    targets[target] = [link.get("name", None) for link in (target_config or {}).get("region-links", None) or []]
+                if enter not in targets[target]:
+                    logger.error(self, "Scene {name}: region-link to unknown entry {target}.{enter}".format(name=name, target=target, enter=enter))
+                    broken += 1
+        return broken
+
+    def get_created_scene(self, name):
+        """Returns the scene object of the given name if it has already been created."""
+        return self._scenes.get(name, None)
+
+    def get_manifest_entry(self, name):
+        """Returns the manifest entry of the given scene name."""
+        return self._manifest.get(name, None)
+
+    def get_scene(self, name):
+        """Returns the scene object of the given name, creating it from the manifest on first use."""
+        my_scene = self._scenes.get(name, None)
+        if my_scene is not None:
+            return my_scene
+        entry = self._manifest.get(name, None)
+        if entry is None:
+            return None
+        my_scene = prefetcher.take(name)
+        if my_scene is not None:
+            self.add_prefetched_scene(my_scene)
+            return my_scene
+        my_scene = self.materialize(entry)
+        if my_scene is not None:
+            self.add_scene(name, my_scene)
+        return my_scene
+
+    def get_scene_config(self, entry):
+        """Reads the configuration of the scene described by the given manifest entry."""
+        if entry.module is not None:
+            return gameconfig.get_scene_configuration(entry.name)
+        json_config_list = gameconfig.load_scene_configuration(entry.file)
+        if json_config_list is None:
+            logger.error(self, "Failed to load scene {name} from {file}".format(name=entry.name, file=entry.file))
+            return None
+        for json_config in json_config_list:
+            if json_config is not None and json_config.get("name", None) == entry.name:
+                return json_config
+        logger.error(self, "Scene {name} is no longer defined in {file}".format(name=entry.name, file=entry.file))
+        return None
+
+    def materialize(self, entry):
+        """Creates the scene object described by the given manifest entry."""
+        logger.debug(self, "Materializing {entry}".format(entry=entry))
+        config = self.get_scene_config(entry)
+        if entry.module is not None:
+            try:
+                module = __import__("scenes.%s" % entry.module, globals(), locals(), ("scenes"))
+                return module.Scene(entry.name, config)
+            except Exception as ex:
+                logger.exception(self, f"Failed to instanciate scene {entry.name}", ex)
+                return None
+        if config is None:
+            return None
+        return self.create_scene(config)
+
+    def get_scene_names(self):
+        """Returns the names of every known scene, created or not."""
+        return list(self._manifest.keys())
+
     def load(self, scene_name, silent_entering=False, silent_leaving=False, params=None):
         """
         Loads the given scene name and make it readyfor activation.
         """
-        my_scene = self._scenes.get(scene_name, None)
+        my_scene = self.get_scene(scene_name)
         if my_scene is None:
             logger.error(self, f"Scene {scene_name} not found")
             audio.play(constants.AUDIO_ERROR_SOUND)
             return False
+        previous_scene = self._active_scene
         if self._active_scene is not None:
             self._active_scene.deactivate(silent_leaving)
             if params is None:
                 params = {}
             params["__parent"] = self._active_scene
+            self._parent_scene = self._active_scene
             event_manager.post(event_manager.LEAVE_SCENE,
                                {"scene": self._active_scene, "nextScene": my_scene})
         self._active_scene = my_scene
         my_scene.activate(silent_entering, params)
+        if previous_scene is None:
+            residency.touch(my_scene)
+        # otherwise, the memory budget is enforced once the scene left is handled, see
+        # event_did_leave_scene.
+        prefetcher.schedule(my_scene)
         # key = inputHandler.getLastKeyPressed()
         # if key is not None:
         # self.execute("input_press_%s" % key)
@@ -113,7 +330,7 @@ class SceneManager():
 
     def scene_exists(self, name):
         """Returns true if the given scene exists, false otherwise."""
-        if self._scenes.get(name, None) is not None:
+        if self._scenes.get(name, None) is not None or name in self._manifest:
             return True
         return False
 
@@ -122,14 +339,14 @@ class SceneManager():
         When stacked, the previously active scene is still considered partially active, but do not
         receive events anymore. Its musics and/or akbiant sounds are still mlayed however.
         """
-        my_scene = self._scenes.get(name, None)
+        my_scene = self.get_scene(name)
         if my_scene is None:
             return False
         if my_scene.name == self._active_scene.name \
            or (len(self._stack) >= 1 and self._stack[-1].name == my_scene.name):
             logger.error(self, f"Cannot stack {my_scene.name} on top of itself")
             return False
-        event_manager.post(event_manager.SCENE_STACK, {"scene": my_scene})
+        event_manager.post(event_manager.SCENE_STACK, event_manager.SceneData(my_scene))
         return True
 
     def leave(self, silent_leaving=False, params=None):
@@ -173,6 +390,13 @@ class SceneManager():
         if self._active_scene is None:
             event_manager.post(event_manager.QUIT_GAME)
 
+    def event_did_leave_scene(self, args):
+        """Enforces the memory budget once every listener handled the scene left (musics fading
+        out for instance)."""
+        next_scene = args.get("nextScene", None)
+        if next_scene is not None and self._scenes.get(next_scene.name, None) is next_scene:
+            residency.touch(next_scene)
+
 
     def event_quit_game(self, args):
         """Asked to quit the game."""
@@ -197,6 +421,7 @@ class SceneManager():
             return False
         self._stack.append(my_scene)
         my_scene.activate()
+        residency.touch(my_scene)
         return True
 
     def event_scene_unstack(self, evt):
@@ -214,44 +439,77 @@ class SceneManager():
         my_scene = event.get('scene', None)
         if my_scene is None:
             raise RuntimeError("Invalid call to event_scene_interval_activate without a target scene.")
-        my_scene.set_next_tick(pygame.time.get_ticks())
-        self._intervalScenes.append(my_scene)
+        if my_scene.name in self._intervalTimers:
+            return
+        interval = my_scene.get_interval()
+        my_scene.set_next_tick(core.get_current_ticks() + interval)
+        self._intervalTimers[my_scene.name] = timer_manager.call_every(interval, self.run_interval_scene, my_scene)
 
     def event_scene_interval_deactivate(self, event):
         """Deactivates the interval feature for the active scene."""
         my_scene = event.get('scene', None)
         if my_scene is None:
             raise RuntimeError("Invalid call to event_scene_interval_activate without a target scene.")
-        idx = 0
-        for interval_scene in self._intervalScenes:
-            if interval_scene.name == my_scene.name:
-                self._intervalScenes.pop(idx)
-                return
-            idx += 1
-        logger.error(self, f"Failed to remove scene from interval scenes: {my_scene.name}")
-
-    def event_scene_interval_tick(self, evt):
-        """A tick is received to be dispatched tothe active scene, if it implements intervals."""
-        now = evt.get('time', 0)
-        for interval_scene in self._intervalScenes:
-            if interval_scene.get_next_tick() <= now:
-                try:
-                    interval_scene.event_interval()
-                except Exception as ex:
-                    logger.exception(self, "Failed to execute {cls}.event_interval: {exception}".format(cls=interval_scene.__class__.__name__, exception=ex), ex)
-                interval_scene.set_next_tick(now)
+        timer = self._intervalTimers.pop(my_scene.name, None)
+        if timer is None:
+            logger.error(self, f"Failed to remove scene from interval scenes: {my_scene.name}")
+            return
+        timer.cancel()
+
+    def run_interval_scene(self, interval_scene):
+        """Executes the interval of the given scene, once its interval is elapsed."""
+        try:
+            interval_scene.event_interval()
+        except Exception as ex:
+            logger.exception(self, "Failed to execute {cls}.event_interval: {exception}".format(cls=interval_scene.__class__.__name__, exception=ex), ex)
+        interval_scene.set_next_tick(core.get_current_ticks() + interval_scene.get_interval())
     def on_key_down(self, event):
         """A key is pressed"""
         action = inputHandler.action(event)
         if action is None:
             return False
-        return self.execute(f"input_press_{action}")
+        replay.record(event, action, True)
+        return self.dispatch_input(action, True)
     def on_key_up(self, event):
         """Key has been released."""
         action = inputHandler.action(event)
         if action is None:
             return False
-        return self.execute(f"input_release_{action}")
+        replay.record(event, action, False)
+        return self.dispatch_input(action, False)
+    def get_action_table(self, cls):
+        """Returns the (action, pressed) -> input_press_/input_release_ method table of the given
+        class, built on first use."""
+        table = self._actionTables.get(cls, None)
+        if table is None:
+            table = {}
+            for script in dir(cls):
+                if script.startswith("input_press_"):
+                    table[(script[len("input_press_"):], True)] = getattr(cls, script)
+                elif script.startswith("input_release_"):
+                    table[(script[len("input_release_"):], False)] = getattr(cls, script)
+            self._actionTables[cls] = table
+        return table
+    def dispatch_input(self, action, pressed):
+        """Calls the handler of the given action, in the scene manager first, then in the active
+        scene."""
+        if len(self._stack) > 0:
+            obj_list = (self, self._stack[-1])
+        else:
+            obj_list = (self, self._active_scene)
+        for obj in obj_list:
+            cls = obj.__class__
+            handler = self.get_action_table(cls).get((action, pressed), None)
+            if handler is None:
+                continue
+            logger.debug(self, "Executing {name}.{script}".format(name=cls.__name__, script=handler.__name__))
+            try:
+                handler(obj)
+                return True
+            except Exception as ex:
+                logger.exception(self, "Failed to execute {name}.{script}: {exception}".format(name=cls.__name__, script=handler.__name__, exception=ex), ex)
+                return False
+        return False
     def execute(self, script, data=None, target=None):
         """Executes the given script within an object."""
         if target is None:
@@ -267,7 +525,7 @@ class SceneManager():
             cls = obj.__class__
             if method is not None:
                 try:
-                    logger.info(self, "Executing {name}.{script}".format(name=cls.__name__, script=script))
+                    logger.debug(self, "Executing {name}.{script}".format(name=cls.__name__, script=script))
                     if script.startswith('input'):
                         method()
                         return True
@@ -282,6 +540,22 @@ class SceneManager():
         """Invokes the load scene menu."""
         self.load("sceneloader")
 
+    def input_press_control_shift_p(self):
+        """Toggles the frame profiler."""
+        import profiler
+
+        if profiler.toggle():
+            speech.speak("Profiler on")
+        else:
+            speech.speak("Profiler off")
+
+    def input_press_control_shift_o(self):
+        """Dumps the frame profiler report."""
+        import profiler
+
+        if profiler.dump():
+            speech.speak("Profile written")
+
     def input_press_d(self):
         """Describe the curren scene."""
         my_scene = self.get_active_scene()
@@ -291,7 +565,7 @@ class SceneManager():
 
 
 def initialize():
-    """Initializes this component, loading all scenes."""
+    """Initializes this component, building the manifest of all scenes."""
     global _INSTANCE
 
     if _INSTANCE is None:
@@ -313,52 +587,56 @@ def initialize():
     for entry in my_dir:
         match = re.match(r"(^[^#]+.*)\.py$", entry.name)
         if match is not None and entry.name != 'scene.py':
-            logger.info(_INSTANCE, "Loading scene {name}".format(name=match.group(1)))
+            logger.debug(_INSTANCE, "Found scene {name}".format(name=match.group(1)))
             total_scenes += 1
             try:
-                module = __import__("scenes.%s" % match.group(1), globals(), locals(), ("scenes"))
-                obj = module.Scene(match.group(1), gameconfig.get_scene_configuration(match.group(1)))
-                if obj is not None:
-                    _INSTANCE.add_scene(match.group(1), obj)
-                    loaded_scenes += 1
+                _INSTANCE.add_manifest_entry(SceneManifestEntry(match.group(1), "module", entry.path,
+                                                                module=match.group(1)))
+                loaded_scenes += 1
             except Exception as ex:
-                logger.exception(_INSTANCE, f"Failed to instanciate scene {match.group(1)}", ex)
-
-
-    try:
-        my_dir = os.scandir(os.path.join(os.path.abspath("."), "data", "scenes"))
-    except Exception as ex:
-        logger.warning("scene_manager", "No user-defined scenes found.")
-    if my_dir is not None:
-        for entry in my_dir:
-            match = re.match(r"(^[^#]+.*)\.json$", entry.name)
-            if match is not None:
+                logger.error(_INSTANCE, "Failed to register scene {name}: {exception}".format(name=match.group(1), exception=ex))
+
+
+    # scene files are parsed concurrently, then registered in directory order.
+    files = list_scene_files()
+    configs = []
+    for file, (json_config_list, ex) in zip(files, loader.map(gameconfig.load_scene_configuration, files)):
+        if json_config_list is None:
+            logger.error("scene_manager", "Failed to load scene {name}".format(name=file))
+            continue
+        configs.extend(json_config_list)
+        for json_config in json_config_list:
+            total_scenes += 1
+            if json_config is not None:
                 try:
-                    json_config_list = gameconfig.load_scene_configuration(entry.name)
+                    _INSTANCE.add_manifest_entry(SceneManifestEntry(json_config.get("name", None),
+                                                                    json_config.get("type", None),
+                                                                    file))
                 except Exception as ex:
-                    json_config_list = None
-                if json_config_list is None:
-                    logger.error("scene_manager", "Failed to load scene {name}".format(name=entry.name))
+                    logger.error(_INSTANCE, "Failed to register scene {file}: {exception}".format(file=file, exception=ex))
                     continue
-                for json_config in json_config_list:
-                    total_scenes += 1
-                    if json_config is not None:
-                        try:
-                            obj = _INSTANCE.create_scene(json_config)
-                        except Exception as ex:
-                            logger.error(_INSTANCE, "Failed to create scene {file}: {exception}".format(file=entry.name, exception=ex))
-                            continue
-                        if obj is not None:
-                            _INSTANCE.add_scene(obj.name, obj)
-                            loaded_scenes += 1
+                loaded_scenes += 1
 
     if total_scenes > loaded_scenes:
         logger.error(_INSTANCE, "{count} scenes failed to load".format(count=total_scenes - loaded_scenes))
 
         return False
-    logger.info(_INSTANCE, "Loaded {count} scenes".format(count=loaded_scenes))
+    broken_links = _INSTANCE.check_region_links(configs)
+    if broken_links > 0:
+        logger.error(_INSTANCE, "{count} region-links are broken".format(count=broken_links))
+        return False
+    logger.info(_INSTANCE, "Found {count} scenes".format(count=loaded_scenes))
     return True
 
+def list_scene_files():
+    """Returns the names of the scene files found under data/scenes."""
+    try:
+        my_dir = os.scandir(os.path.join(os.path.abspath("."), "data", "scenes"))
+    except Exception as ex:
+        logger.warning("scene_manager", "No user-defined scenes found.")
+        return []
+    return [entry.name for entry in my_dir if re.match(r"(^[^#]+.*)\.json$", entry.name) is not None]
+
 def on_key_down(event):
     """Key ispressed."""
     global _INSTANCE
@@ -377,6 +655,66 @@ def load_scene(name):
 
     return _INSTANCE.load(name)
 
+def get_scene(name):
+    """Returns the given scene object, creating it if needed."""
+    global _INSTANCE
+
+    return _INSTANCE.get_scene(name)
+
+def get_scene_names():
+    """Returns the names of every known scene."""
+    global _INSTANCE
+
+    return _INSTANCE.get_scene_names()
+
+def reload_scene_file(file, configs):
+    """Applies the new content of a scene file to the known scenes."""
+    global _INSTANCE
+
+    return _INSTANCE.reload_scene_file(file, configs)
+
+def get_created_scene(name):
+    """Returns the given scene object if it has already been created."""
+    global _INSTANCE
+
+    return _INSTANCE.get_created_scene(name)
+
+def get_manifest_entry(name):
+    """Returns the manifest entry of the given scene name."""
+    global _INSTANCE
+
+    return _INSTANCE.get_manifest_entry(name)
+
+def get_scene_config(entry):
+    """Reads the configuration of the scene described by the given manifest entry."""
+    global _INSTANCE
+
+    return _INSTANCE.get_scene_config(entry)
+
+def create_scene(config):
+    """Creates a scene object from the given configuration, without registering it."""
+    global _INSTANCE
+
+    return _INSTANCE.create_scene(config)
+
+def is_scene_in_use(name):
+    """Returns whether the given scene is active or stacked."""
+    global _INSTANCE
+
+    return _INSTANCE.is_scene_in_use(name)
+
+def unload_scene(name):
+    """Drops the given scene object and releases its resources."""
+    global _INSTANCE
+
+    return _INSTANCE.unload_scene(name)
+
+def add_prefetched_scene(my_scene):
+    """Registers a scene built ahead of time."""
+    global _INSTANCE
+
+    _INSTANCE.add_prefetched_scene(my_scene)
+
 def scene_exists(name):
     """Returns true if scene exists, false otherwise."""
     global _INSTANCE
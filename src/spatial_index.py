@@ -0,0 +1,141 @@
+"""
+spatial_index
+
+This module indexes the objects of a map region on a uniform grid of square cells, so that finding
+the objects near a position only looks at the cells around it instead of every object of the
+region. Objects are indexed by their position (see Object.getPosition) and must be moved through
+the index when their position changes.
+"""
+
+# *-* coding: utf8 *-*
+
+import math
+
+import constants
+
+
+class SpatialIndex():
+    """Uniform grid over a width x height region."""
+
+    def __init__(self, width, height, cell_size=constants.SPATIAL_CELL_SIZE):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.columns = max(1, math.ceil(width / cell_size))
+        self.rows = max(1, math.ceil(height / cell_size))
+        self.cells = {}
+        # id(obj) -> cell the object is stored in.
+        self.locations = {}
+
+    def __len__(self):
+        return len(self.locations)
+
+    def get_cell(self, position):
+        """Returns the cell holding the given position, positions outside the region being
+clamped to its border cells."""
+        column = min(max(int(position[0] // self.cell_size), 0), self.columns - 1)
+        row = min(max(int(position[1] // self.cell_size), 0), self.rows - 1)
+        return (column, row)
+
+    def insert(self, obj):
+        """Adds an object at its current position."""
+        cell = self.get_cell(obj.getPosition())
+        self.cells.setdefault(cell, []).append(obj)
+        self.locations[id(obj)] = cell
+
+    def remove(self, obj):
+        """Removes an object."""
+        cell = self.locations.pop(id(obj), None)
+        if cell is None:
+            return False
+        objects = self.cells[cell]
+        objects.remove(obj)
+        if len(objects) == 0:
+            del self.cells[cell]
+        return True
+
+    def move(self, obj, position):
+        """Sets the position of an object, moving it to another cell if needed."""
+        obj.position = position
+        cell = self.get_cell(position)
+        previous = self.locations.get(id(obj), None)
+        if previous == cell:
+            return
+        if previous is not None:
+            self.remove(obj)
+        self.cells.setdefault(cell, []).append(obj)
+        self.locations[id(obj)] = cell
+
+    def clear(self):
+        """Removes every object."""
+        self.cells = {}
+        self.locations = {}
+
+    def rebuild(self, objects):
+        """Indexes the given objects only."""
+        self.clear()
+        for obj in objects:
+            self.insert(obj)
+
+    def ring(self, column, row, radius):
+        """Yields the objects of the cells at the given Chebyshev distance from a cell."""
+        if radius == 0:
+            yield from self.cells.get((column, row), ())
+            return
+        for x in range(column - radius, column + radius + 1):
+            yield from self.cells.get((x, row - radius), ())
+            yield from self.cells.get((x, row + radius), ())
+        for y in range(row - radius + 1, row + radius):
+            yield from self.cells.get((column - radius, y), ())
+            yield from self.cells.get((column + radius, y), ())
+
+    def nearest(self, position, count=1):
+        """Returns the count nearest objects as (distance, object) tuples, nearest first."""
+        if len(self.locations) == 0 or count <= 0:
+            return []
+        column, row = self.get_cell(position)
+        px = position[0]
+        py = position[1]
+        found = []
+        max_radius = max(self.columns, self.rows)
+        for radius in range(max_radius + 1):
+            for obj in self.ring(column, row, radius):
+                pos = obj.position
+                found.append((math.hypot(pos[0] - px, pos[1] - py), obj))
+            if len(found) >= count:
+                found.sort(key=lambda item: item[0])
+                # objects in further rings are more than radius cells away.
+                if found[count - 1][0] <= radius * self.cell_size:
+                    break
+        found.sort(key=lambda item: item[0])
+        return found[:count]
+
+    def within_radius(self, position, radius):
+        """Returns the objects at most radius away as (distance, object) tuples, nearest first."""
+        first = self.get_cell((position[0] - radius, position[1] - radius))
+        last = self.get_cell((position[0] + radius, position[1] + radius))
+        px = position[0]
+        py = position[1]
+        found = []
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                for obj in self.cells.get((x, y), ()):
+                    pos = obj.position
+                    distance = math.hypot(pos[0] - px, pos[1] - py)
+                    if distance <= radius:
+                        found.append((distance, obj))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def in_box(self, x1, y1, x2, y2):
+        """Returns the objects whose position is within the given box, bounds included."""
+        first = self.get_cell((x1, y1))
+        last = self.get_cell((x2, y2))
+        found = []
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                for obj in self.cells.get((x, y), ()):
+                    pos = obj.position
+                    if x1 <= pos[0] <= x2 and y1 <= pos[1] <= y2:
+                        found.append(obj)
+        return found
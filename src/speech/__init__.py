@@ -1,6 +1,7 @@
 # *-* coding: utf8 *-*
 import logger
 import platform
+import profiler
 
 
 class SpeechSupport(object):
@@ -27,10 +28,14 @@ class SpeechSupport(object):
 
 _instance = None
 
-def initialize():
+def initialize(headless=False):
         global _instance
         system = platform.system().lower()
         logger.info("speech", "Initialinzing (%s) ..." %(system))
+        if headless:
+                from . import null
+                _instance = null.NullSpeech()
+                return True
         if system == 'windows':
                 # try NVDA first
                 from . import nvda
@@ -61,7 +66,12 @@ def initialize():
 def speak(message):
 	global _instance
 	if _instance is not None:
-		_instance.speak(message)
+		if profiler.ENABLED:
+			start = profiler.start()
+			_instance.speak(message)
+			profiler.stop("speech", start)
+		else:
+			_instance.speak(message)
 
 def cancelSpeech():
 	global _instance
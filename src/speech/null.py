@@ -0,0 +1,24 @@
+# *-* coding: utf-8 *-*
+#
+# Null speech backend, used when running headless: messages are only written to the log file.
+#
+
+import logger
+import speech
+
+class NullSpeech(speech.SpeechSupport):
+        """Speech support that does not speak."""
+        messages = 0
+
+        def getLogName(self):
+                return "NullSpeech"
+
+        def speak(self, message):
+                self.messages += 1
+                logger.debug(self, message)
+
+        def cancelSpeech(self):
+                pass
+
+        def isActive(self):
+                return True
@@ -0,0 +1,143 @@
+"""
+timer_manager
+
+This module schedules one-shot and repeating timers against the game time (see
+core.get_current_ticks), so that components only run when they have some work to do instead of
+checking the time on every tick.
+"""
+
+# *-* coding: utf8 *-*
+
+import heapq
+import itertools
+
+import logger
+import profiler
+
+# Global timer manager instance
+_INSTANCE = None
+
+
+class Timer():
+    """A scheduled call. Repeating timers have a non-zero interval."""
+
+    def __init__(self, due, interval, callback, args):
+        self.due = due
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Prevents any further execution of this timer."""
+        self.cancelled = True
+
+    def is_active(self):
+        """Returns whether this timer will be executed again."""
+        return self.cancelled is False
+
+    def __repr__(self):
+        return "Timer({name}, due={due}, interval={interval})".format(
+            name=getattr(self.callback, "__qualname__", self.callback), due=self.due, interval=self.interval)
+
+
+class TimerManager():
+    """Keeps timers in a heap ordered by due time. Cancelled timers are dropped when they reach the
+top of the heap."""
+
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._now = 0
+
+    def get_log_name(self):
+        """Returns the name used for logging purposes."""
+        return "timer_manager"
+
+    def schedule(self, delay, interval, callback, args):
+        """Schedules callback(*args) in delay milliseconds, then every interval milliseconds if
+interval is not 0."""
+        timer = Timer(self._now + delay, interval, callback, args)
+        self._push(timer)
+        return timer
+
+    def _push(self, timer):
+        """Adds timer to the heap; the sequence number keeps timers due at the same time ordered."""
+        heapq.heappush(self._heap, (timer.due, next(self._sequence), timer))
+
+    def update(self, now):
+        """Executes every timer due at the given time."""
+        self._now = now
+        while len(self._heap) > 0 and self._heap[0][0] <= now:
+            due, sequence, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                continue
+            if timer.interval > 0:
+                # rescheduled before the call, so that the callback may cancel its own timer.
+                timer.due = due + timer.interval
+                if timer.due <= now:
+                    timer.due = now + timer.interval
+                self._push(timer)
+            else:
+                timer.cancelled = True
+            try:
+                if profiler.ENABLED:
+                    start = profiler.start()
+                    try:
+                        timer.callback(*timer.args)
+                    finally:
+                        profiler.stop(getattr(timer.callback, "__qualname__", "timer"), start)
+                else:
+                    timer.callback(*timer.args)
+            except Exception as ex:
+                logger.exception(self, "Failed to execute {timer}: {exception}".format(timer=timer, exception=ex), ex)
+
+    def get_time(self):
+        """Returns the game time of the latest update."""
+        return self._now
+
+    def count(self):
+        """Returns the number of scheduled timers, cancelled ones not yet dropped included."""
+        return len(self._heap)
+
+
+def initialize():
+    """Initializes the timer manager."""
+    global _INSTANCE
+
+    if _INSTANCE is None:
+        _INSTANCE = TimerManager()
+    return True
+
+def call_later(delay, callback, *args):
+    """Calls callback(*args) once, in delay milliseconds. Returns the Timer object."""
+    global _INSTANCE
+
+    return _INSTANCE.schedule(delay, 0, callback, args)
+
+def call_every(interval, callback, *args):
+    """Calls callback(*args) every interval milliseconds, the first time in interval milliseconds.
+Returns the Timer object."""
+    global _INSTANCE
+
+    if interval <= 0:
+        raise RuntimeError("A repeating timer needs a positive interval")
+    return _INSTANCE.schedule(interval, interval, callback, args)
+
+def cancel(timer):
+    """Cancels the given timer."""
+    if timer is not None:
+        timer.cancel()
+
+def update(now):
+    """Executes every timer due at the given game time."""
+    global _INSTANCE
+
+    if _INSTANCE is not None:
+        _INSTANCE.update(now)
+
+def get_time():
+    """Returns the game time of the latest update."""
+    global _INSTANCE
+
+    return _INSTANCE.get_time()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import gameconfig
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Lets gameconfig.get_value() read the given sections without loading age.json."""
+    monkeypatch.setattr(gameconfig, "_INSTANCE", gameconfig.GameConfig.__new__(gameconfig.GameConfig))
+
+
+class Thing():
+    """Minimal object, positioned like the objects of map regions."""
+
+    def __init__(self, position, size=None):
+        self.position = list(position)
+        self.size = size
+
+    def getPosition(self):
+        return self.position
+
+    def getSize(self):
+        return self.size
+
+    def __repr__(self):
+        return "Thing({position})".format(position=self.position)
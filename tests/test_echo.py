@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+pytest.importorskip("pygame")
+
+import constants
+import echo
+
+from conftest import Thing
+
+
+def test_inaudible_objects_are_dropped():
+    objects = [Thing((10, 10)), Thing((10, 17)), Thing((10, 19))]
+    echoes = echo.compute((10, 10), objects, 10)
+    assert [obj for obj, volume, pan, pitch in echoes] == objects[:2]
+    assert echoes[0][1] == pytest.approx(constants.AUDIO_FX_VOLUME)
+    assert echo.get_audible_radius(10) == pytest.approx(8)
+
+
+def test_echoes_are_sorted_nearest_first():
+    objects = [Thing((x, 0)) for x in (5, -1, 3, 2)]
+    echoes = echo.compute((0, 0), objects, 100)
+    assert [obj.position[0] for obj, volume, pan, pitch in echoes] == [-1, 2, 3, 5]
+    volumes = [volume for obj, volume, pan, pitch in echoes]
+    assert volumes == sorted(volumes, reverse=True)
+
+
+def test_pan_follows_the_horizontal_offset():
+    objects = [Thing((-50, 0)), Thing((-5, 0)), Thing((0, 1)), Thing((5, 0)), Thing((50, 0))]
+    pans = {obj.position[0]: pan for obj, volume, pan, pitch in echo.compute((0, 0), objects, 1000)}
+    assert pans == pytest.approx({-50: -0.8, -5: -0.4, 0: 0.0, 5: 0.4, 50: 0.8})
+
+
+def test_no_echo():
+    assert echo.compute((0, 0), [], 10) == []
+    assert echo.compute((0, 0), [Thing((0, 0))], 0) == []
+
+
+def test_numpy_matches_plain_python():
+    pytest.importorskip("numpy")
+    rng = random.Random(0)
+    objects = [Thing((rng.randint(0, 40), rng.randint(0, 40))) for i in range(200)]
+    expected = echo.compute_python((20, 20), objects, 25)
+    found = echo.compute_numpy((20, 20), objects, 25)
+    assert [obj for obj, volume, pan, pitch in found] == [obj for obj, volume, pan, pitch in expected]
+    for (obj, volume, pan, pitch), (_, expected_volume, expected_pan, expected_pitch) in zip(found, expected):
+        assert (volume, pan, pitch) == pytest.approx((expected_volume, expected_pan, expected_pitch))
@@ -0,0 +1,193 @@
+import time
+
+import pytest
+
+import event_manager
+
+
+class Recorder():
+    """Listener recording the events it receives."""
+
+    def __init__(self, delay=0):
+        self.received = []
+        self.delay = delay
+
+    def record(self, name, data):
+        self.received.append((name, data))
+        if self.delay > 0:
+            time.sleep(self.delay)
+
+    def event_character_move(self, data):
+        self.record("character_move", data)
+
+    def event_character_hit(self, data):
+        self.record("character_hit", data)
+
+    def event_scene_interval_tick(self, data):
+        self.record("scene_interval_tick", data)
+
+    def event_audio_render(self, data):
+        self.record("audio_render", data)
+
+
+@pytest.fixture
+def listener():
+    """A registered listener, the queue being empty before and after the test."""
+    drain()
+    event_manager.reset_statistics()
+    recorder = Recorder()
+    event_manager.add_listener(recorder)
+    yield recorder
+    event_manager.remove_listener(recorder)
+    event_manager.set_deterministic(False)
+    event_manager.EVENT_QUEUE.configure("strict")
+    drain()
+
+
+def drain():
+    while event_manager.EVENT_QUEUE.get() is not None:
+        pass
+    event_manager._PENDING.clear()
+
+
+def make_event(type, age=0.0):
+    event = event_manager._new_event(type, None, None, None)
+    event.time -= age
+    return event
+
+
+def lanes_of(queue):
+    ret = []
+    while True:
+        event = queue.get()
+        if event is None:
+            return ret
+        ret.append(event_manager.EVENT_LANES.get(event.type, event_manager.LANE_GAMEPLAY))
+
+
+def test_strict_lanes_serve_input_first():
+    queue = event_manager.EventQueue("strict", max_wait=0)
+    for type in (event_manager.SCENE_INTERVAL_TICK, event_manager.AUDIO_RENDER,
+                 event_manager.CHARACTER_HIT, event_manager.CHARACTER_MOVE):
+        queue.put(make_event(type))
+    assert lanes_of(queue) == [event_manager.LANE_INPUT, event_manager.LANE_GAMEPLAY,
+                               event_manager.LANE_AUDIO, event_manager.LANE_BACKGROUND]
+    assert queue.empty()
+
+
+def test_lanes_keep_posting_order():
+    queue = event_manager.EventQueue("strict", max_wait=0)
+    events = [make_event(event_manager.CHARACTER_HIT) for i in range(5)]
+    for event in events:
+        queue.put(event)
+    assert [queue.get() for event in events] == events
+
+
+def test_weighted_lanes_share_dispatches():
+    queue = event_manager.EventQueue("weighted", [2, 1, 1, 1], max_wait=0)
+    for i in range(4):
+        queue.put(make_event(event_manager.CHARACTER_MOVE))
+        queue.put(make_event(event_manager.CHARACTER_HIT))
+    input = event_manager.LANE_INPUT
+    gameplay = event_manager.LANE_GAMEPLAY
+    assert lanes_of(queue) == [input, input, gameplay, input, input, gameplay, gameplay, gameplay]
+
+
+def test_invalid_lane_configuration():
+    with pytest.raises(RuntimeError):
+        event_manager.EventQueue("fifo")
+    with pytest.raises(RuntimeError):
+        event_manager.EventQueue("weighted", [1, 1])
+    with pytest.raises(RuntimeError):
+        event_manager.EventQueue("weighted", [1, 0, 1, 1])
+
+
+def test_starved_lane_is_served_first():
+    queue = event_manager.EventQueue("strict", max_wait=5)
+    queue.put(make_event(event_manager.SCENE_INTERVAL_TICK, age=1.0))
+    queue.put(make_event(event_manager.CHARACTER_MOVE))
+    assert lanes_of(queue) == [event_manager.LANE_BACKGROUND, event_manager.LANE_INPUT]
+    stats = queue.get_lane_statistics()
+    assert stats["background"]["starved"] == 1
+    assert stats["input"] == {"posted": 1, "dispatched": 1, "high_water": 1, "starved": 0}
+
+
+def test_deterministic_queue_ignores_starvation():
+    queue = event_manager.EventQueue("strict", max_wait=5)
+    queue.deterministic = True
+    queue.put(make_event(event_manager.SCENE_INTERVAL_TICK, age=1.0))
+    queue.put(make_event(event_manager.CHARACTER_MOVE))
+    assert lanes_of(queue) == [event_manager.LANE_INPUT, event_manager.LANE_BACKGROUND]
+    assert queue.get_lane_statistics()["background"]["starved"] == 0
+
+
+def test_pump_event_budget(listener):
+    for i in range(5):
+        event_manager.post(event_manager.CHARACTER_HIT, {"index": i})
+    assert event_manager.pump(max_events=3, time_budget=0) == 3
+    assert event_manager.pump(max_events=3, time_budget=0) == 2
+    assert [data["index"] for name, data in listener.received] == [0, 1, 2, 3, 4]
+    assert event_manager.get_statistics()["budget_exhausted"] == 1
+
+
+def test_pump_time_budget(listener):
+    listener.delay = 0.005
+    for i in range(3):
+        event_manager.post(event_manager.CHARACTER_HIT, {"index": i})
+    assert event_manager.pump(max_events=0, time_budget=1) == 1
+    event_manager.set_deterministic(True)
+    assert event_manager.pump(max_events=0, time_budget=1) == 2
+
+
+def test_input_is_dispatched_before_queued_ticks(listener):
+    event_manager.EVENT_QUEUE.configure("strict", max_wait=0)
+    event_manager.post(event_manager.SCENE_INTERVAL_TICK, event_manager.TickData(10))
+    event_manager.post(event_manager.CHARACTER_MOVE, {"obj": None})
+    event_manager.pump(max_events=0, time_budget=0)
+    assert [name for name, data in listener.received] == ["character_move", "scene_interval_tick"]
+
+
+def test_pending_events_are_superseded(listener):
+    first = object()
+    second = object()
+    event_manager.post(event_manager.AUDIO_RENDER, {"scene": first, "position": 1})
+    event_manager.post(event_manager.AUDIO_RENDER, {"scene": second, "position": 2})
+    event_manager.post(event_manager.AUDIO_RENDER, {"scene": first, "position": 3})
+    assert event_manager.EVENT_QUEUE.qsize() == 2
+    event_manager.pump(max_events=0, time_budget=0)
+    assert [data["position"] for name, data in listener.received] == [3, 2]
+    assert event_manager.get_statistics()["coalesced"] == 1
+
+
+def test_events_are_queued_again_once_dispatched(listener):
+    event_manager.post(event_manager.SCENE_INTERVAL_TICK, event_manager.TickData(10))
+    event_manager.post(event_manager.SCENE_INTERVAL_TICK, event_manager.TickData(20))
+    event_manager.pump(max_events=0, time_budget=0)
+    event_manager.post(event_manager.SCENE_INTERVAL_TICK, event_manager.TickData(30))
+    event_manager.pump(max_events=0, time_budget=0)
+    assert [data["time"] for name, data in listener.received] == [20, 30]
+
+
+def test_targeted_and_other_events_are_not_coalesced(listener):
+    target = Recorder()
+    event_manager.post(event_manager.AUDIO_RENDER, {"scene": None}, target=target)
+    event_manager.post(event_manager.AUDIO_RENDER, {"scene": None}, target=target)
+    event_manager.post(event_manager.CHARACTER_HIT, {"index": 0})
+    event_manager.post(event_manager.CHARACTER_HIT, {"index": 1})
+    event_manager.pump(max_events=0, time_budget=0)
+    assert len(target.received) == 2
+    assert [data["index"] for name, data in listener.received] == [0, 1]
+
+
+def test_coalescing_can_be_declared_and_removed(listener):
+    event_manager.set_coalescing(event_manager.CHARACTER_HIT, "obj")
+    try:
+        event_manager.post(event_manager.CHARACTER_HIT, {"obj": 1, "index": 0})
+        event_manager.post(event_manager.CHARACTER_HIT, {"obj": 1, "index": 1})
+        event_manager.pump(max_events=0, time_budget=0)
+    finally:
+        event_manager.remove_coalescing(event_manager.CHARACTER_HIT)
+    event_manager.post(event_manager.CHARACTER_HIT, {"obj": 1, "index": 2})
+    event_manager.post(event_manager.CHARACTER_HIT, {"obj": 1, "index": 3})
+    event_manager.pump(max_events=0, time_budget=0)
+    assert [data["index"] for name, data in listener.received] == [1, 2, 3]
@@ -0,0 +1,91 @@
+import occupancy
+
+from conftest import Thing
+
+
+def test_region_border_is_a_wall():
+    grid = occupancy.OccupancyGrid(10, 5)
+    assert grid.get((0, 2)) == occupancy.WALL
+    assert grid.get((10, 2)) == occupancy.WALL
+    assert grid.get((4, 0)) == occupancy.WALL
+    assert grid.get((4, 5)) == occupancy.WALL
+    assert grid.get((4, 2)) == occupancy.FREE
+    assert grid.get((-1, 2)) == occupancy.WALL
+    assert grid.get((11, 2)) == occupancy.WALL
+    assert grid.is_free((4, 2))
+    assert grid.is_free((11, 2)) is False
+
+
+def test_fill_rectangles():
+    grid = occupancy.OccupancyGrid(10, 10)
+    version = grid.layout_version
+    grid.fill([6, 3, 2, 4], occupancy.OBSTACLE)
+    assert all(grid.get((x, y)) == occupancy.OBSTACLE for x in range(2, 7) for y in range(3, 5))
+    assert grid.get((1, 3)) == occupancy.FREE
+    assert grid.get((2, 5)) == occupancy.FREE
+    assert grid.layout_version == version + 1
+    # carving a region-link into the border.
+    grid.fill([0, 4, 0, 6], occupancy.FREE)
+    assert grid.get((0, 5)) == occupancy.FREE
+
+
+def test_objects_cover_their_footprint():
+    grid = occupancy.OccupancyGrid(20, 20)
+    obj = Thing((5, 5), size=(2, 1))
+    layout_version = grid.layout_version
+    grid.add_object(obj)
+    covered = set((x, y) for x in range(21) for y in range(21) if grid.get_object((x, y)) is obj)
+    assert covered == set([(4, 5), (5, 5), (6, 5)])
+    assert grid.is_free((5, 5)) is False
+    assert grid.layout_version == layout_version
+    grid.remove_object(obj)
+    assert grid.is_free((5, 5))
+    assert grid.remove_object(obj) is False
+
+
+def test_moving_objects():
+    grid = occupancy.OccupancyGrid(20, 20)
+    obj = Thing((5, 5))
+    grid.add_object(obj, agent=True)
+    version = grid.version
+    obj.position = [6, 5]
+    grid.move_object(obj)
+    assert grid.get_object((5, 5)) is None
+    assert grid.get_object((6, 5)) is obj
+    assert grid.version > version
+    assert id(obj) in grid.agents
+
+
+def test_agents_are_passable():
+    grid = occupancy.OccupancyGrid(20, 20)
+    agent = Thing((5, 5))
+    still = Thing((7, 5))
+    grid.add_object(agent, agent=True)
+    grid.add_object(still)
+    assert grid.is_free((5, 5)) is False
+    assert grid.is_passable((5, 5))
+    assert grid.is_passable((7, 5)) is False
+    # a cell shared by an agent and another object is blocked.
+    grid.add_object(Thing((5, 5)))
+    assert grid.is_passable((5, 5)) is False
+
+
+
+def test_chunked_grid_only_knows_loaded_chunks():
+    grid = occupancy.ChunkedOccupancyGrid(100, 100, 10)
+    assert grid.get_chunk((25, 37)) == (2, 3)
+    assert grid.get((25, 37)) == occupancy.WALL
+    grid.load_chunk((2, 3), [([20, 35, 22, 35], occupancy.OBSTACLE)])
+    assert grid.get((25, 37)) == occupancy.FREE
+    assert grid.get((21, 35)) == occupancy.OBSTACLE
+    assert grid.get((19, 35)) == occupancy.WALL
+    grid.load_chunk((0, 0), [])
+    assert grid.get((0, 5)) == occupancy.WALL
+    assert grid.get((5, 5)) == occupancy.FREE
+    layout_version = grid.layout_version
+    grid.unload_chunk((2, 3))
+    assert grid.get((25, 37)) == occupancy.WALL
+    assert grid.layout_version > layout_version
+    grid.fill([0, 0, 100, 100], occupancy.OBSTACLE)
+    assert grid.get((5, 5)) == occupancy.OBSTACLE
+    assert (2, 3) not in grid.chunks
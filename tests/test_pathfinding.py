@@ -0,0 +1,96 @@
+import occupancy
+import pathfinding
+
+from conftest import Thing
+
+
+def make_pathfinder(**config):
+    return pathfinding.Pathfinder(config)
+
+
+def test_cached_path_is_returned_while_the_grid_is_unchanged(config):
+    pathfinder = make_pathfinder()
+    grid = occupancy.OccupancyGrid(20, 20)
+    path = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    assert path[-1] == (12, 2)
+    assert len(path) == 10
+    assert pathfinder.find_path("region", grid, (2, 2), (12, 2)) == path
+    assert pathfinder.hits == 1
+    assert pathfinder.searches == 1
+
+
+def test_blocked_path_is_searched_again(config):
+    pathfinder = make_pathfinder()
+    grid = occupancy.OccupancyGrid(20, 20)
+    path = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    grid.add_object(Thing(path[4]))
+    detour = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    assert pathfinder.searches == 2
+    assert path[4] not in detour
+    assert detour[-1] == (12, 2)
+    assert all(grid.is_free(cell) for cell in detour)
+
+
+def test_agents_do_not_block_cached_paths(config):
+    pathfinder = make_pathfinder()
+    grid = occupancy.OccupancyGrid(20, 20)
+    path = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    grid.add_object(Thing(path[4]), agent=True)
+    assert pathfinder.find_path("region", grid, (2, 2), (12, 2)) == path
+    assert pathfinder.searches == 1
+    assert pathfinder.hits == 1
+
+
+def test_path_is_reused_from_a_cell_along_it(config):
+    pathfinder = make_pathfinder()
+    grid = occupancy.OccupancyGrid(20, 20)
+    path = pathfinder.find_path("region", grid, (2, 2), (12, 8))
+    assert pathfinder.find_path("region", grid, path[3], (12, 8)) == path[4:]
+    assert pathfinder.reused == 1
+    assert pathfinder.searches == 1
+
+
+def test_reused_path_is_checked_from_its_start_cell(config):
+    pathfinder = make_pathfinder()
+    grid = occupancy.OccupancyGrid(20, 20)
+    path = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    # an obstacle behind the new start does not matter, one ahead of it does.
+    grid.add_object(Thing(path[1]))
+    assert pathfinder.find_path("region", grid, path[3], (12, 2)) == path[4:]
+    grid.add_object(Thing(path[6]))
+    detour = pathfinder.find_path("region", grid, path[3], (12, 2))
+    assert path[6] not in detour
+    assert pathfinder.searches == 2
+
+
+def test_layout_change_drops_the_cached_paths(config):
+    pathfinder = make_pathfinder()
+    grid = occupancy.OccupancyGrid(20, 20)
+    path = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    cached = pathfinder.get_region("region", grid)
+    grid.fill([7, 0, 7, 10], occupancy.WALL)
+    detour = pathfinder.find_path("region", grid, (2, 2), (12, 2))
+    assert pathfinder.get_region("region", grid) is not cached
+    assert pathfinder.searches == 2
+    assert detour != path
+    assert all(grid.get(cell) == occupancy.FREE for cell in detour)
+    grid.fill([7, 0, 7, 20], occupancy.WALL)
+    assert pathfinder.find_path("region", grid, (2, 2), (12, 2)) is None
+
+
+def test_unreachable_goal(config):
+    pathfinder = make_pathfinder(**{"max-nodes": 50})
+    grid = occupancy.OccupancyGrid(20, 20)
+    assert pathfinder.find_path("region", grid, (2, 2), (0, 5)) is None
+    grid.fill([5, 0, 5, 20], occupancy.WALL)
+    assert pathfinder.find_path("region", grid, (2, 2), (12, 2)) is None
+
+
+def test_cache_size_is_bounded(config):
+    pathfinder = make_pathfinder(**{"cache-size": 2})
+    grid = occupancy.OccupancyGrid(20, 20)
+    for y in range(1, 6):
+        pathfinder.find_path("region", grid, (1, y), (15, y))
+    paths = pathfinder.get_region("region", grid)
+    assert len(paths.paths) == 2
+    assert set(paths.by_goal.keys()) == set([(15, 4), (15, 5)])
@@ -0,0 +1,78 @@
+import types
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+import replay
+import scene_manager
+
+
+def key_event(key, mod=0):
+    return types.SimpleNamespace(key=key, mod=mod)
+
+
+@pytest.fixture
+def session(tmp_path):
+    """A recorded session: up at 30ms, down at 10ms and 50ms, ending at 80ms."""
+    path = str(tmp_path / "session.jsonl")
+    recorder = replay.Recorder(path, 1234, "mainmenu")
+    recorder.record(10, key_event(pygame.K_UP), "up", True)
+    recorder.record(30, key_event(pygame.K_UP), "up", False)
+    recorder.record(50, key_event(pygame.K_RETURN, 1), "shift_action", True)
+    recorder.close(80)
+    return path
+
+
+class KeyLog(list):
+    """Keys fed to the scene manager, as (game time, pressed, key, mod) tuples."""
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0
+
+    def on_key(self, pressed, event):
+        self.append((self.now, pressed, event.key, event.mod))
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    ret = KeyLog()
+    monkeypatch.setattr(scene_manager, "on_key_down", lambda event: ret.on_key(True, event))
+    monkeypatch.setattr(scene_manager, "on_key_up", lambda event: ret.on_key(False, event))
+    return ret
+
+
+def play(replayer, keys, times):
+    """Updates the replayer at the given game times; returns the time it ended at, if it did."""
+    for now in times:
+        keys.now = now
+        if replayer.update(now) is False:
+            return now
+    return None
+
+
+def test_session_header(session):
+    replayer = replay.Replayer(session)
+    assert replayer.get_seed() == 1234
+    assert replayer.header["start-scene"] == "mainmenu"
+
+
+def test_inputs_are_replayed_at_their_game_time(session, keys):
+    assert play(replay.Replayer(session), keys, range(0, 200, 10)) == 80
+    assert keys == [(10, True, pygame.K_UP, 0), (30, False, pygame.K_UP, 0), (50, True, pygame.K_RETURN, 1)]
+
+
+def test_replay_does_not_depend_on_the_frame_rate(session, keys):
+    play(replay.Replayer(session), keys, range(0, 200, 10))
+    fine = [(pressed, key, mod) for now, pressed, key, mod in keys]
+    del keys[:]
+    assert play(replay.Replayer(session), keys, [5, 60, 100]) == 100
+    assert [(pressed, key, mod) for now, pressed, key, mod in keys] == fine
+
+
+def test_invalid_session(tmp_path):
+    path = tmp_path / "session.jsonl"
+    path.write_text('{"version": 0}\n')
+    with pytest.raises(RuntimeError):
+        replay.Replayer(str(path))
@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("pygame")
+
+import audio
+import residency
+import scene_manager
+
+
+class Region():
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def manager(config, monkeypatch):
+    """A residency manager whose scenes cost 100 bytes each, for a budget of 350 bytes; the scene
+named "current" is in use."""
+    unloaded = []
+    monkeypatch.setattr(audio, "getMusicMemory", lambda: 0)
+    monkeypatch.setattr(residency, "estimate_scene_size", lambda my_scene: 100)
+    monkeypatch.setattr(scene_manager, "is_scene_in_use", lambda name: name == "current")
+    monkeypatch.setattr(scene_manager, "unload_scene", unloaded.append)
+    ret = residency.ResidencyManager({"memory-budget": 1})
+    ret.budget = 350
+    ret.unloaded = unloaded
+    return ret
+
+
+def test_least_recently_visited_scenes_are_unloaded(manager):
+    for name in ("a", "b", "current", "c"):
+        manager.touch(Region(name))
+    assert manager.unloaded == ["a"]
+    manager.touch(Region("b"))
+    manager.touch(Region("d"))
+    assert manager.unloaded == ["a", "c"]
+    assert list(manager.scenes.keys()) == ["current", "b", "d"]
+    assert manager.get_memory_used() == 300
+
+
+def test_scenes_in_use_are_kept(manager):
+    manager.touch(Region("current"))
+    for name in ("a", "b", "c", "d"):
+        manager.touch(Region(name))
+    assert "current" not in manager.unloaded
+    assert "current" in manager.scenes
+
+
+def test_prefetched_scenes_are_unloaded_first(manager):
+    for name in ("a", "current"):
+        manager.touch(Region(name))
+    for name in ("p1", "p2", "p3"):
+        manager.add_prefetched(Region(name))
+    # prefetching never unloads visited scenes.
+    assert manager.unloaded == ["p1", "p2"]
+    assert list(manager.prefetched.keys()) == ["p3"]
+    manager.touch(Region("e"))
+    assert manager.unloaded == ["p1", "p2", "p3"]
+    assert list(manager.scenes.keys()) == ["a", "current", "e"]
+
+
+def test_visiting_a_prefetched_scene_promotes_it(manager):
+    manager.add_prefetched(Region("p"))
+    manager.touch(Region("p"))
+    assert list(manager.prefetched.keys()) == []
+    assert list(manager.scenes.keys()) == ["p"]
+    manager.add_prefetched(Region("p"))
+    assert list(manager.prefetched.keys()) == []
+
+
+def test_no_budget(manager):
+    manager.budget = 0
+    for name in ("a", "b", "c", "d", "e"):
+        manager.touch(Region(name))
+    assert manager.unloaded == []
+
+
+def test_estimate_size_counts_shared_values_once():
+    shared = {"name": "forest", "objects": [1, 2, 3]}
+    single = residency.estimate_size({"first": shared})
+    assert residency.estimate_size({"first": shared, "second": shared}) < single + residency.estimate_size(shared)
+    assert residency.estimate_size([shared, shared]) < 2 * residency.estimate_size(shared)
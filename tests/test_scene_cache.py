@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+
+import pytest
+
+import scene_cache
+
+
+SCENE = {
+    "name": "forest",
+    "type": "mapregion",
+    "objects": [{"name": "key", "type": "key", "position": [1, 1]}],
+    "region-links": [{"name": "north", "link": "field.south", "position": [0, 9, 5, 9]}],
+    "musics": [{"name": "ambiance", "file": "forest.ogg"}],
+    "walls": [[2, 2, 4, 2]],
+}
+
+
+@pytest.fixture
+def scenes(tmp_path, monkeypatch):
+    """Runs the test from a game directory holding a data/scenes/forest.json file."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "scenes"))
+    path = os.path.join("data", "scenes", "forest.json")
+    write(path, SCENE)
+    return path
+
+
+def write(path, content, mtime=None):
+    with open(path, "w") as file:
+        json.dump(content, file)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_unchanged_files_are_read_from_the_cache(scenes):
+    cache = scene_cache.SceneCache("scenes.cache")
+    assert cache.load_json(scenes) == SCENE
+    assert cache.load_json(scenes) == SCENE
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_callers_get_their_own_copy(scenes):
+    cache = scene_cache.SceneCache("scenes.cache")
+    cache.load_json(scenes)["objects"].clear()
+    assert cache.load_json(scenes) == SCENE
+
+
+def test_modified_files_are_parsed_again(scenes):
+    cache = scene_cache.SceneCache("scenes.cache")
+    cache.load_json(scenes)
+    modified = dict(SCENE, width=30)
+    write(scenes, modified, mtime=os.stat(scenes).st_mtime_ns + 10 ** 9)
+    assert cache.load_json(scenes) == modified
+    assert cache.misses == 2
+
+
+def test_touched_files_are_not_parsed_again(scenes):
+    cache = scene_cache.SceneCache("scenes.cache")
+    cache.load_json(scenes)
+    stat = os.stat(scenes)
+    os.utime(scenes, ns=(stat.st_mtime_ns + 10 ** 9, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load_json(scenes) == SCENE
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_file_round_trip(scenes):
+    cache = scene_cache.SceneCache("scenes.cache")
+    cache.load_json(scenes)
+    assert cache.save() is True
+    assert cache.dirty is False
+    cache = scene_cache.SceneCache("scenes.cache")
+    assert cache.load() is True
+    assert cache.load_json(scenes) == SCENE
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_outdated_cache_file_is_ignored(scenes):
+    with open("scenes.cache", "wb") as file:
+        file.write(b"not a cache")
+    cache = scene_cache.SceneCache("scenes.cache")
+    assert cache.load() is False
+    assert cache.load_json(scenes) == SCENE
+
+
+def test_concurrent_reads_and_saves(scenes):
+    paths = [scenes]
+    for index in range(20):
+        path = os.path.join("data", "scenes", "scene{index}.json".format(index=index))
+        write(path, dict(SCENE, name="scene{index}".format(index=index)))
+        paths.append(path)
+    cache = scene_cache.SceneCache("scenes.cache")
+    errors = []
+
+    def read():
+        try:
+            for path in paths * 5:
+                cache.load_json(path)
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=read) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        cache.save()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert cache.hits + cache.misses == 4 * 5 * len(paths)
+    assert cache.save() is True
+    cache = scene_cache.SceneCache("scenes.cache")
+    cache.load()
+    assert len(cache.entries) == len(paths)
+
+
+@pytest.mark.parametrize("scene", [
+    {"type": "mapregion"},
+    dict(SCENE, objects={"name": "key"}),
+    dict(SCENE, objects=[{"name": "key"}]),
+    dict(SCENE, objects=["key"]),
+    dict(SCENE, **{"region-links": [{"link": "field", "position": [0, 9, 5, 9]}]}),
+    dict(SCENE, **{"region-links": [{"link": "field.south"}]}),
+    dict(SCENE, musics=[{"name": "ambiance"}]),
+    dict(SCENE, walls=[[2, 2, 4]]),
+    dict(SCENE, obstacles=[[2, 2, 4, "2"]]),
+])
+def test_invalid_scenes_are_rejected(scene):
+    with pytest.raises(ValueError):
+        scene_cache.validate(os.path.join("data", "scenes", "forest.json"), {"scenes": [scene]})
+
+
+def test_only_scene_files_are_checked_as_scenes():
+    scene_cache.validate("age.json", {"objects": "not scenes"})
+    with pytest.raises(ValueError):
+        scene_cache.validate("age.json", [])
@@ -0,0 +1,88 @@
+import math
+import random
+
+import pytest
+
+import spatial_index
+
+from conftest import Thing
+
+
+def brute_force(objects, position, count):
+    found = sorted(math.hypot(obj.position[0] - position[0], obj.position[1] - position[1]) for obj in objects)
+    return found[:count]
+
+
+@pytest.mark.parametrize("cell_size", [1, 4, 16])
+def test_nearest_matches_brute_force(cell_size):
+    rng = random.Random(cell_size)
+    index = spatial_index.SpatialIndex(100, 60, cell_size)
+    objects = [Thing((rng.uniform(0, 100), rng.uniform(0, 60))) for i in range(200)]
+    for obj in objects:
+        index.insert(obj)
+    for i in range(100):
+        position = (rng.uniform(-10, 110), rng.uniform(-10, 70))
+        for count in (1, 3, 20, 250):
+            found = index.nearest(position, count)
+            assert [distance for distance, obj in found] == pytest.approx(brute_force(objects, position, count))
+            for distance, obj in found:
+                assert distance == pytest.approx(math.hypot(obj.position[0] - position[0], obj.position[1] - position[1]))
+
+
+def test_nearest_follows_moves_and_removals():
+    rng = random.Random(0)
+    index = spatial_index.SpatialIndex(50, 50, 5)
+    objects = [Thing((rng.randint(0, 50), rng.randint(0, 50))) for i in range(50)]
+    for obj in objects:
+        index.insert(obj)
+    for obj in objects[:10]:
+        index.move(obj, [rng.randint(0, 50), rng.randint(0, 50)])
+    for obj in objects[40:]:
+        index.remove(obj)
+    remaining = objects[:40]
+    for i in range(50):
+        position = (rng.uniform(0, 50), rng.uniform(0, 50))
+        found = index.nearest(position, 5)
+        assert [distance for distance, obj in found] == pytest.approx(brute_force(remaining, position, 5))
+        assert all(obj in remaining for distance, obj in found)
+
+
+def test_nearest_on_empty_index():
+    index = spatial_index.SpatialIndex(10, 10, 2)
+    assert index.nearest((5, 5), 3) == []
+    index.insert(Thing((1, 1)))
+    assert index.nearest((5, 5), 0) == []
+
+
+def test_radius_and_box_queries_match_brute_force():
+    rng = random.Random(1)
+    index = spatial_index.SpatialIndex(80, 80, 8)
+    objects = [Thing((rng.uniform(0, 80), rng.uniform(0, 80))) for i in range(300)]
+    for obj in objects:
+        index.insert(obj)
+    for i in range(50):
+        x = rng.uniform(-5, 85)
+        y = rng.uniform(-5, 85)
+        radius = rng.uniform(0, 30)
+        found = index.within_radius((x, y), radius)
+        expected = [obj for obj in objects if math.hypot(obj.position[0] - x, obj.position[1] - y) <= radius]
+        assert set(id(obj) for distance, obj in found) == set(id(obj) for obj in expected)
+        assert [distance for distance, obj in found] == sorted(distance for distance, obj in found)
+        x2 = x + rng.uniform(0, 40)
+        y2 = y + rng.uniform(0, 40)
+        expected = [obj for obj in objects if x <= obj.position[0] <= x2 and y <= obj.position[1] <= y2]
+        assert set(id(obj) for obj in index.in_box(x, y, x2, y2)) == set(id(obj) for obj in expected)
+
+
+def test_move_keeps_one_entry_per_object():
+    index = spatial_index.SpatialIndex(40, 40, 10)
+    obj = Thing((1, 1))
+    index.insert(obj)
+    index.move(obj, [35, 35])
+    index.move(obj, [36, 35])
+    assert len(index) == 1
+    assert index.in_box(0, 0, 20, 20) == []
+    assert index.in_box(30, 30, 40, 40) == [obj]
+    assert index.remove(obj) is True
+    assert index.remove(obj) is False
+    assert len(index) == 0
@@ -0,0 +1,71 @@
+import timer_manager
+
+
+def test_timers_run_in_due_order():
+    timers = timer_manager.TimerManager()
+    calls = []
+    timers.schedule(30, 0, calls.append, ("c",))
+    timers.schedule(10, 0, calls.append, ("a",))
+    timers.schedule(10, 0, calls.append, ("b",))
+    timers.update(9)
+    assert calls == []
+    timers.update(30)
+    assert calls == ["a", "b", "c"]
+    assert timers.count() == 0
+
+
+def test_repeating_timer():
+    timers = timer_manager.TimerManager()
+    calls = []
+    timer = timers.schedule(10, 10, lambda: calls.append(timers.get_time()), ())
+    for now in range(0, 45, 5):
+        timers.update(now)
+    assert calls == [10, 20, 30, 40]
+    assert timer.is_active()
+
+
+def test_late_repeating_timer_does_not_catch_up():
+    timers = timer_manager.TimerManager()
+    calls = []
+    timers.schedule(10, 10, lambda: calls.append(timers.get_time()), ())
+    timers.update(55)
+    timers.update(64)
+    timers.update(65)
+    assert calls == [55, 65]
+
+
+def test_cancelled_timers_are_dropped():
+    timers = timer_manager.TimerManager()
+    calls = []
+    once = timers.schedule(10, 0, calls.append, ("once",))
+    every = timers.schedule(10, 10, calls.append, ("every",))
+    once.cancel()
+    timers.update(10)
+    every.cancel()
+    timers.update(20)
+    assert calls == ["every"]
+    assert timers.count() == 0
+    assert once.is_active() is False
+
+
+def test_callback_may_cancel_its_own_timer():
+    timers = timer_manager.TimerManager()
+    calls = []
+
+    def callback():
+        calls.append(timers.get_time())
+        timer.cancel()
+
+    timer = timers.schedule(10, 10, callback, ())
+    timers.update(10)
+    timers.update(20)
+    assert calls == [10]
+
+
+def test_failing_callback_does_not_stop_other_timers():
+    timers = timer_manager.TimerManager()
+    calls = []
+    timers.schedule(10, 0, lambda: 1 / 0, ())
+    timers.schedule(10, 0, calls.append, ("ok",))
+    timers.update(10)
+    assert calls == ["ok"]